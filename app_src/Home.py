@@ -1,32 +1,13 @@
 import streamlit as st
 from streamlit_lottie import st_lottie
-import requests
-import os
-import yaml
+
+from utils.assets import LOTTIE_URLS, load_lottie
+from utils.config import correct_path
+from utils.startup import warm_up
 
 # Page config
 st.set_page_config(layout="wide", page_title="RainSense Australia | Smart Rainfall Forecasting")
 
-# Load Lottie Animation
-def load_lottieurl(url):
-    r = requests.get(url)
-    if r.status_code != 200:
-        return None
-    return r.json()
-
-
-# Safe config path
-def correct_path(path_type, name):
-    base_dir = os.path.dirname(os.path.abspath(__file__))
-    config_path = os.path.join(base_dir, "..", "configs", "paths.yaml")
-    with open(config_path, "r") as file:
-        config = yaml.safe_load(file)
-    
-    path = config[path_type][name]
-    full_path = os.path.join(base_dir, "..", path.replace("\\", "/"))
-    return full_path
-
-
 
 # Welcome and intro
 with st.container():
@@ -40,7 +21,7 @@ with st.container():
     
 
 # Load animation
-hero_animation = load_lottieurl("https://assets9.lottiefiles.com/packages/lf20_sk5h1kfn.json")
+hero_animation = load_lottie(LOTTIE_URLS["weather"])
 
 # Custom CSS
 st.markdown("""
@@ -130,5 +111,5 @@ for col, (title, desc) in zip(step_cols, steps):
         </div>
         """, unsafe_allow_html=True)
 
-
-
+# Prefetch what the other pages need, after this page has rendered
+warm_up()
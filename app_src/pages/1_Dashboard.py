@@ -1,14 +1,19 @@
 # EDA Page
 import streamlit as st
-import streamlit.components.v1 as components
-import pandas as pd
 import os
-import yaml
 import plotly.express as px
 import plotly.graph_objects as go
 from streamlit_lottie import st_lottie
-import requests
-import datetime
+
+from utils.assets import LOTTIE_URLS, load_css, load_lottie
+from utils.config import correct_path
+from utils.dashboard_data import DASHBOARD_COLUMNS, RowIndex, load_dashboard_data
+from utils.downsample import scatter_layers
+from utils.feedback import FeedbackStore
+from utils.figure_cache import FigureCache
+from utils.metrics import cached, span, start_exporter, watch
+from utils.rollups import RollupCube
+from utils.startup import warm_up
 
 
 # Page config
@@ -18,74 +23,76 @@ st.set_page_config(
     layout="wide"
 )
 
+# Stage timings and cache counters, when RAIN_METRICS is set
+start_exporter()
 
-def correct_path(path_type, name):
-    # Get the directory where the current script is located
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    
-    # Navigate to the configs folder
-    config_path = os.path.join(current_dir, "..", "..", "configs", "paths.yaml")
-    config_path = os.path.normpath(config_path)
-    
-    with open(config_path, "r") as file:
-        config = yaml.safe_load(file)
-
-    path = config[path_type][name]
-    full_path = os.path.join(current_dir, "..", "..", path.replace("\\", "/"))
-    return os.path.normpath(full_path)
-
-
-# Load CSS and animations
-@st.cache_data
-def load_css():
-    styles_path = correct_path("artifacts_paths", "styles_path")
-    with open(styles_path) as f:
-        st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
-
-@st.cache_data
-def load_lottie_url(url: str):
-    r = requests.get(url)
-    if r.status_code != 200:
-        return None
-    return r.json()
-
-
-def load_lottieurl(url: str):
-    r = requests.get(url)
-    if r.status_code != 200:
-        return None
-    return r.json()
-
-lottie_weather =  load_lottieurl("https://assets9.lottiefiles.com/packages/lf20_sk5h1kfn.json")
 
-
-# Load data
-@st.cache_data
+# Load data: one typed, memory-mapped copy shared by every session
+@cached(st.cache_resource)
 def load_data():
-    data_path = correct_path("data_paths", "cleaned_dashboard_data")
-    df = pd.read_csv(data_path)
+    df = load_dashboard_data(DASHBOARD_COLUMNS)
     if 'year' not in df.columns or 'month' not in df.columns:
         st.error("Columns 'year' and 'month' are required in your dataset.")
         st.stop()
     return df
 
+# Row offsets per (Location, year) and the sorted sidebar options
+@cached(st.cache_resource)
+def load_index():
+    return RowIndex(load_data())
+
+# Per-(Location, year, month) aggregates, built once and sliced by the charts below
+@cached(st.cache_resource)
+def load_cube():
+    return RollupCube(load_data())
+
+# Built figures shared by every session, keyed on (chart, locations, year_range)
+@cached(st.cache_resource)
+def figure_cache():
+    figures = FigureCache()
+    watch("figure_cache", figures)
+    return figures
+
+# Feedback store shared by every session
+@cached(st.cache_resource)
+def load_feedback_store():
+    store = FeedbackStore()
+    # Earlier versions appended to a CSV, which ended up at user_feedback.csv/user_feedback.csv
+    legacy_path = correct_path("data_paths", "feedback_data_path")
+    store.import_csv(legacy_path)
+    store.import_csv(os.path.join(legacy_path, "user_feedback.csv"))
+    return store
+
+# Above this many rows the temperature scatter is drawn from a density grid
+# with at most this many markers in total
+SCATTER_RAW_POINTS = 5000
+
+@cached(st.cache_data(max_entries=64))
+def temperature_scatter(selected, year_range):
+    # Points (raw or grid-binned) and a binned LOWESS trendline per location
+    frame = load_index().select(load_data(), selected, year_range)
+    return scatter_layers(frame, 'MaxTemp', 'MinTemp', SCATTER_RAW_POINTS)
+
 # Load external files and data
 df = load_data()
-load_css()
+data_index = load_index()
+cube = load_cube()
+figures = figure_cache()
+st.markdown(f"<style>{load_css()}</style>", unsafe_allow_html=True)
 
 # Sidebar filters
 with st.sidebar:
     st.title(" Filters")
     st.markdown("Customize the data views below:")
 
-    locations = sorted(df['Location'].unique())
+    locations = data_index.locations
     selected_locations = st.multiselect(
         "Select Locations",
         locations,
         default=["Sydney", "Melbourne", "Brisbane"]
     )
 
-    years = sorted(df['year'].unique())
+    years = data_index.years
     year_range = st.slider(
         "Select Year Range",
         min_value=int(min(years)),
@@ -101,12 +108,12 @@ with st.sidebar:
     </div>
     """, unsafe_allow_html=True)
 
-# Filter data
-filtered_df = df[
-    (df['Location'].isin(selected_locations)) &
-    (df['year'] >= year_range[0]) &
-    (df['year'] <= year_range[1])
-].copy()
+# Filter data: contiguous row slices of the sorted dataset, no full scan
+with span("dashboard.filter"):
+    filtered_df = data_index.select(df, selected_locations, year_range)
+
+# Figure cache key for the current filter state; selection order does not change the charts
+view = (tuple(sorted(selected_locations)), tuple(year_range))
 
 # Header
 st.markdown("""
@@ -122,29 +129,22 @@ st.markdown("---")
 with st.expander(" Geographic Distribution", expanded=True):
     st.subheader(" Rainfall & Weather Overview on Map")
 
-    lottie_map = load_lottie_url("https://assets3.lottiefiles.com/packages/lf20_jzviyhjn.json")
+    lottie_map = load_lottie(LOTTIE_URLS["map"])
     if lottie_map:
         st_lottie(lottie_map, height=120, key="mapIcon")
 
     if {'Latitude', 'Longitude'}.issubset(filtered_df.columns):
         if not filtered_df.empty:
-            location_df = filtered_df.dropna(subset=["Latitude", "Longitude"])
-
-            if not location_df.empty:
-                map_df = location_df.groupby('Location').agg({
-                    'Rainfall': 'mean',
-                    'MaxTemp': 'mean',
-                    'MinTemp': 'mean',
-                    'Sunshine': 'mean',
-                    'Humidity3pm': 'mean',
-                    'Latitude': 'first',
-                    'Longitude': 'first'
-                }).reset_index()
+            map_df = cube.location_means(
+                selected_locations, year_range,
+                ['Rainfall', 'MaxTemp', 'MinTemp', 'Sunshine', 'Humidity3pm']
+            ).dropna(subset=["Latitude", "Longitude"])
 
+            if not map_df.empty:
                 # Debug: 
                 st.write(" Map Data Sample:", map_df.head())
 
-                fig = px.scatter_mapbox(
+                fig = figures.get(("map",) + view, lambda: px.scatter_mapbox(
                     map_df,
                     lat="Latitude",
                     lon="Longitude",
@@ -165,9 +165,7 @@ with st.expander(" Geographic Distribution", expanded=True):
                     zoom=4,
                     size_max=40,
                     title=" Rainfall Intensity & Climate Patterns Across Australia"
-                )
-
-                fig.update_layout(margin={"r":0,"t":50,"l":0,"b":0}, height=600)
+                ).update_layout(margin={"r":0,"t":50,"l":0,"b":0}, height=600))
                 st.plotly_chart(fig, use_container_width=True)
             else:
                 st.warning(" No valid location data (Latitude/Longitude) after filtering.")
@@ -177,12 +175,12 @@ with st.expander(" Geographic Distribution", expanded=True):
         st.error(" Required columns 'Latitude' and 'Longitude' are missing in your dataset.")
 
 # Add weather-themed animation before charts
-lottie_weather = load_lottie_url("https://assets10.lottiefiles.com/packages/lf20_x62chJ.json")
+lottie_weather = load_lottie(LOTTIE_URLS["weather_intro"])
 if lottie_weather:
     st_lottie(lottie_weather, height=120, key="weather_intro")
 
 # Generate consistent color map
-locations = filtered_df['Location'].unique()
+locations = data_index.present(selected_locations, year_range)
 color_sequence = px.colors.qualitative.Plotly  # Or use other palettes
 color_map = {loc: color_sequence[i % len(color_sequence)] for i, loc in enumerate(locations)}
 
@@ -194,7 +192,9 @@ else:
     with st.expander("Rainfall Analysis", expanded=True):
         col1, col2 = st.columns([1, 2])
         with col1:
-            st_lottie(load_lottie_url("https://assets6.lottiefiles.com/packages/lf20_sk5h1kfn.json"), height=150, key="chart1")
+            lottie_rain = load_lottie(LOTTIE_URLS["rainfall"])
+            if lottie_rain:
+                st_lottie(lottie_rain, height=150, key="chart1")
             st.markdown("""
             <div class="info-card">
                 <h3>Rainfall Insights</h3>
@@ -204,23 +204,23 @@ else:
         with col2:
             tab1, tab2 = st.tabs([" By Location", " By Month"]) #tab3: " Rain Today vs Tomorrow"])
             with tab1:
-                fig = px.bar(
-                    filtered_df.groupby('Location')['Rainfall'].mean().reset_index(),
+                fig = figures.get(("bar",) + view, lambda: px.bar(
+                    cube.location_means(selected_locations, year_range, ['Rainfall'])[['Location', 'Rainfall']],
                     x='Location', y='Rainfall',
                     title="Average Rainfall by Location",
                     color='Location',
                     color_discrete_map=color_map
-                )
+                ))
                 st.plotly_chart(fig, use_container_width=True)
             with tab2:
-                fig = px.line(
-                    filtered_df.groupby(['month', 'Location'])['Rainfall'].mean().reset_index(),
+                fig = figures.get(("line",) + view, lambda: px.line(
+                    cube.monthly_means(selected_locations, year_range, 'Rainfall'),
                     x='month', y='Rainfall',
                     color='Location',
                     color_discrete_map=color_map,
                     title="Monthly Rainfall Trends",
                     labels={'month': 'Month', 'Rainfall': 'Average Rainfall (mm)'}
-                )
+                ))
                 st.plotly_chart(fig, use_container_width=True)
 
     st.markdown("---")
@@ -232,31 +232,54 @@ else:
     # with st.expander("Temperature Analysis"):
     col1, col2 = st.columns(2)
     with col1:
-        fig = px.scatter(
-            filtered_df,
-            x='MaxTemp', y='MinTemp',
-            color='Location',
-            title="Max vs Min Temperature",
-            trendline="lowess",
-            opacity=0.4,
-            color_discrete_map=color_map  
-        )
+        def temperature_scatter_figure():
+            points, trends, binned = temperature_scatter(view[0], year_range)
+            fig = px.scatter(
+                points,
+                x='MaxTemp', y='MinTemp',
+                color='Location',
+                size='count' if binned else None,
+                size_max=12,
+                hover_data={'count': binned},
+                title="Max vs Min Temperature",
+                opacity=0.4,
+                color_discrete_map=color_map  
+            )
+            for location, trend in trends.groupby('Location'):
+                fig.add_trace(go.Scatter(
+                    x=trend['MaxTemp'], y=trend['MinTemp'],
+                    mode='lines',
+                    line=dict(color=color_map.get(location)),
+                    name=f"{location} trend",
+                    showlegend=False
+                ))
+            return fig
+
+        fig = figures.get(("scatter",) + view, temperature_scatter_figure)
         st.plotly_chart(fig, use_container_width=True)
+        if data_index.count(selected_locations, year_range) > SCATTER_RAW_POINTS:
+            st.caption("Points are binned on a grid; marker size shows the number of days per cell.")
     with col2:
-        fig = go.Figure()
-        for location in filtered_df['Location'].unique():
-            fig.add_trace(go.Box(
-                y=filtered_df[filtered_df['Location'] == location]['MaxTemp'],
-                name=location,
-                marker=dict(color=color_map[location]),
-                boxpoints=False  
-            ))
+        def temperature_box_figure():
+            fig = go.Figure()
+            for box in cube.box_stats(selected_locations, year_range, 'MaxTemp').itertuples():
+                fig.add_trace(go.Box(
+                    q1=[box.q1], median=[box.median], q3=[box.q3],
+                    lowerfence=[box.lowerfence], upperfence=[box.upperfence],
+                    x=[box.Location],
+                    name=box.Location,
+                    marker=dict(color=color_map[box.Location]),
+                    boxpoints=False  
+                ))
+
+            fig.update_layout(
+                title="Temperature Distribution by Location",
+                showlegend=True,
+                legend_title="Location"
+            )
+            return fig
 
-        fig.update_layout(
-            title="Temperature Distribution by Location",
-            showlegend=True,
-            legend_title="Location"
-        )
+        fig = figures.get(("box",) + view, temperature_box_figure)
         st.plotly_chart(fig, use_container_width=True)
 
     st.markdown("---")
@@ -264,8 +287,8 @@ else:
     
     col1, col2 = st.columns(2)
     with col1:
-            fig = px.bar_polar(
-                filtered_df,
+            fig = figures.get(("polar",) + view, lambda: px.bar_polar(
+                cube.gust_direction_sums(selected_locations, year_range),
                 r="WindGustSpeed",
                 theta="WindGustDir",
                 color="Location",
@@ -273,23 +296,25 @@ else:
                 color_discrete_map=color_map,
                 start_angle=112,
                 template="presentation" # Other options include "plotly", "ggplot2", "seaborn", "simple_white", "none", 'xgridoff', 'presentation'.
-            )
+            ))
             st.plotly_chart(fig, use_container_width=True)
         
     with col2:
-        fig = px.histogram(
-            filtered_df,
+        fig = figures.get(("histogram",) + view, lambda: px.histogram(
+            cube.direction_rain_counts(selected_locations, year_range),
             x="WindDir3pm",
+            y="count",
+            histfunc="sum",
             color="RainTomorrow",
             title="Wind Direction at 3pm vs Rainfall Tomorrow",
             barmode="group"
-        )
+        ))
         st.plotly_chart(fig, use_container_width=True)
 
 # Data summary section
 st.markdown("---")
 # with st.expander(" Data Summary"):
-st.dataframe(filtered_df.describe())
+st.dataframe(cube.describe(selected_locations, year_range))
 
 st.markdown("---")
 st.header("We value your feedback!")
@@ -303,23 +328,12 @@ rating = st.slider("Rate your experience:", 1, 5)
 
 # Submit button
 if st.button("Submit Feedback"):
-    # Prepare feedback data
-    feedback_data = {
-        "timestamp": datetime.datetime.now().isoformat(),
-        "feedback": feedback,
-        "rating": rating
-    }
-    feedback_df = pd.DataFrame([feedback_data])
-
-    # Define feedback file path (inside the feedbackfolder in the data folder)
-    feedback_file = correct_path("data_paths", "feedback_data_path")
-    os.makedirs(feedback_file, exist_ok=True)
-    feedback_file = os.path.join(feedback_file, "user_feedback.csv")
-
-    # Append feedback to CSV
-    if os.path.exists(feedback_file):
-        feedback_df.to_csv(feedback_file, mode='a', header=False, index=False)
+    try:
+        load_feedback_store().add(feedback, rating)
+    except Exception as e:
+        st.error(f"Could not save your feedback: {str(e)}")
     else:
-        feedback_df.to_csv(feedback_file, mode='w', header=True, index=False)
+        st.success("Thank you for your feedback!")
 
-    st.success("Thank you for your feedback!")
\ No newline at end of file
+# Prefetch what the other pages need, after this page has rendered
+warm_up()
@@ -1,91 +1,54 @@
 import streamlit as st
 import pandas as pd
 import requests
-import joblib
-import yaml
-import os
 import datetime
 
+from utils.batch import build_batch_frame, month_timeline, predict_batch, score_frame
+from utils.bom import bom_url, day_is_final, fetch_data, prepare_data
+from utils.cascade import cascade_params, load_cascade
+from utils.feature_store import FeatureStore
+from utils.features import FEATURE_COLS, decode_row, feature_matrix
+from utils.metrics import cached, span, start_exporter, watch
+from utils.registry import default_registry
+from utils.result_cache import ResultCache
+from utils.startup import warm_up
+from utils.stations import location_id
 
 
-location_id = {
-    "Albury": "IDCJDW2002",
-    "BadgerysCreek": "IDCJDW2126",
-    "Cobar": "IDCJDW2050",
-    "CoffsHarbour": "IDCJDW2080",
-    "Moree": "IDCJDW2084",
-    "Newcastle": "IDCJDW2097",
-    "NorahHead": "IDCJDW2096",
-    "NorfolkIsland": "IDCJDW8002",
-    "Penrith": "IDCJDW2127",
-    "Richmond": "IDCJDW2128",
-    "Sydney": "IDCJDW2129",
-    "SydneyAirport": "IDCJDW2130",
-    "WaggaWagga": "IDCJDW2139",
-    "Williamtown": "IDCJDW2140",
-    "Wollongong": "IDCJDW2141",
-    "Canberra": "IDCJDW2801",
-    "Tuggeranong": "IDCJDW2802",
-    "Ballarat": "IDCJDW3033",
-    "Bendigo": "IDCJDW3008",
-    "Sale": "IDCJDW3035",
-    "MelbourneAirport": "IDCJDW3036",
-    "Melbourne": "IDCJDW3037",
-    "Mildura": "IDCJDW3038",
-    "Nhil": "IDCJDW3039",
-    "Portland": "IDCJDW3040",
-    "Watsonia": "IDCJDW3041",
-    "Dartmoor": "IDCJDW3042",
-    "Brisbane": "IDCJDW4019",
-    "Cairns": "IDCJDW4020",
-    "GoldCoast": "IDCJDW4021",
-    "Townsville": "IDCJDW4022",
-    "Adelaide": "IDCJDW5081",
-    "MountGambier": "IDCJDW5003",
-    "Nuriootpa": "IDCJDW5004",
-    "Woomera": "IDCJDW5005",
-    "Albany": "IDCJDW6111",
-    "Witchcliffe": "IDCJDW6112",
-    "PearceRAAF": "IDCJDW6113",
-    "PerthAirport": "IDCJDW6114",
-    "Perth": "IDCJDW6115",
-    "SalmonGums": "IDCJDW6116",
-    "Walpole": "IDCJDW6117",
-    "Hobart": "IDCJDW7021",
-    "Launceston": "IDCJDW7025",
-    "AliceSprings": "IDCJDW8019",
-    "Darwin": "IDCJDW8014",
-    "Katherine": "IDCJDW8021",
-    "Uluru": "IDCJDW8022"
-}
-
 # app title
 st.title("Rainfall Predictor")
 
-# load configuration paths
-@st.cache_data
-def correct_path(path_type, name):
-    # Get the directory where the current script is located
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    
-    # Navigate to the configs folder
-    config_path = os.path.join(current_dir, "..", "..", "configs", "paths.yaml")
-    config_path = os.path.normpath(config_path)
-    
-    with open(config_path, "r") as file:
-        config = yaml.safe_load(file)
-
-    path = config[path_type][name]
-    full_path = os.path.join(current_dir, "..", "..", path.replace("\\", "/"))
-    return os.path.normpath(full_path)
-
-
-# load the model
-@st.cache_resource
-def load_model():
-    model_path = correct_path("artifacts_paths", "xg_model_path")
-    model = joblib.load(model_path)
-    return model
+# Stage timings and cache counters, when RAIN_METRICS is set
+start_exporter()
+
+# current model version (lean scorer + file sha1), shared by every session; the registry
+# loads and warms it up once per process and swaps in a retrained file by itself
+def load_version():
+    return default_registry().get("xgboost")
+
+
+def load_scorer():
+    return load_version().scorer
+
+
+# nationwide batches go through the decision tree / XGBoost cascade when params.yaml enables it
+def load_batch_scorer():
+    if cascade_params()["enabled"]:
+        return load_cascade()
+    return load_scorer()
+
+
+@cached(st.cache_resource)
+def load_store():
+    return FeatureStore()
+
+
+# predictions shared across sessions, tagged with the model version that made them
+@cached(st.cache_resource)
+def load_result_cache():
+    cache = ResultCache()
+    watch("result_cache", cache)
+    return cache
 
 # user input
 # Calculate the minimum and maximum selectable dates
@@ -97,208 +60,192 @@ max_date = today
 # User input with date restrictions
 st.info("You can only select data from the **most recent 14 months**.")
 
-col1, col2 = st.columns(2)
-with col1:
-    selected_date = st.date_input("Select a date", value=today, min_value=min_date, max_value=max_date)
-with col2:
-    selected_location = st.selectbox("Select a location", list(location_id.keys()))
-
-selected_year = selected_date.strftime("%Y")
-selected_month = selected_date.strftime("%m")
-selected_day = selected_date.strftime("%d")
-
-
-# fetch data
-def fetch_data():
-    data_url = f"https://reg.bom.gov.au/climate/dwo/{selected_year}{selected_month}/text/{location_id[selected_location]}.{selected_year}{selected_month}.csv"
-    try:
-        response = requests.get(data_url, timeout=10)
-        response.raise_for_status()
-        
-        data_path = correct_path("dirs", "fetched_data")
-        os.makedirs(data_path, exist_ok=True)
-        file_path = os.path.join(data_path, f"{location_id[selected_location]}_{selected_year}{selected_month}.csv")
-        
-        with open(file_path, 'wb') as file:
-            file.write(response.content)
-        return True
-    except requests.exceptions.RequestException as e:
-        st.error(f"Failed to download data: {str(e)}")
-        st.write(data_url)
-        return False
-    except Exception as e:
-        st.error(f"Error processing data: {str(e)}")
-        return False
-
-
-def prepare_csv():
-    try:
-        data_path = os.path.join(correct_path("dirs", "fetched_data"), 
-                               f"{location_id[selected_location]}_{selected_year}{selected_month}.csv")
-        with open(data_path, 'r', encoding='latin1') as f:
-            lines = f.readlines()
-
-        # Find the index of the first empty line
-        for i, line in enumerate(lines):
-            if line.strip() == "":
-                break
-
-        # Keep everything after the empty line
-        cleaned_lines = lines[i+1:]
-
-        with open(data_path, 'w', encoding='latin1') as f:
-            f.writelines(cleaned_lines)
-        return True
-    except Exception as e:
-        st.error(f"Error preparing CSV: {str(e)}")
-        return False
-
-
-
-def prepare_data():
-    try:
-        data_path = os.path.join(correct_path("dirs", "fetched_data"), f"{location_id[selected_location]}_{selected_year}{selected_month}.csv")
-        df = pd.read_csv(data_path, encoding='latin1', on_bad_lines='warn')
-        df.drop(df.columns[0], axis=1, inplace=True)
-        df['Location'] = selected_location 
-        df.drop(columns=['Time of maximum wind gust'], inplace=True)
-
-        df.rename(mapper={
-            'Minimum temperature (°C)': 'MinTemp',
-            'Maximum temperature (°C)': 'MaxTemp',
-            'Rainfall (mm)': 'Rainfall',
-            'Evaporation (mm)': 'Evaporation',
-            'Sunshine (hours)': 'Sunshine',
-            'Direction of maximum wind gust ': 'WindGustDir',
-            'Speed of maximum wind gust (km/h)': 'WindGustSpeed',
-            '9am Temperature (°C)': 'Temp9am',
-            '9am relative humidity (%)': 'Humidity9am',
-            '9am cloud amount (oktas)': 'Cloud9am',
-            '9am wind direction': 'WindDir9am',
-            '9am wind speed (km/h)': 'WindSpeed9am',
-            '9am MSL pressure (hPa)': 'Pressure9am',
-            '3pm Temperature (°C)': 'Temp3pm',
-            '3pm relative humidity (%)': 'Humidity3pm',
-            '3pm cloud amount (oktas)': 'Cloud3pm',
-            '3pm wind direction': 'WindDir3pm',
-            '3pm wind speed (km/h)': 'WindSpeed3pm',
-            '3pm MSL pressure (hPa)': 'Pressure3pm',
-            'Location': 'Location',
-            'Date': 'Date'
-        }, axis=1, inplace=True)
-
-        df['RainToday'] = df['Rainfall'].apply(lambda x: 1 if pd.notnull(x) and x > 0 else 0)
-
-        # Add this before your feature engineering
-        numeric_cols = ['MinTemp', 'MaxTemp', 'Rainfall', 'Evaporation', 'Sunshine', 
-                'WindGustSpeed', 'WindSpeed9am', 'WindSpeed3pm', 'Humidity9am', 
-                'Humidity3pm', 'Pressure9am', 'Pressure3pm', 'Cloud9am', 
-                'Cloud3pm', 'Temp9am', 'Temp3pm']
-
-        for col in numeric_cols:
-            if col in df.columns:
-                df[col] = pd.to_numeric(df[col], errors='coerce')  # Convert to float, invalid→NaN
-                
-        # Convert Date column to datetime
-        df['Date'] = pd.to_datetime(df['Date'])
-
-        # Assuming 'data' is your DataFrame with a 'Date' column of datetime type
-        df['day'] = df['Date'].dt.day
-        df['month'] = df['Date'].dt.month
-        df['year'] = df['Date'].dt.year
-
-        # Create engineered features
-        df['WindSpeed9am'] = pd.to_numeric(df['WindSpeed9am'], errors='coerce')
-        df['TempDiff']      = df['MaxTemp'] - df['MinTemp']
-        df['WindSpeedAvg']  = df[['WindSpeed9am', 'WindSpeed3pm']].mean(axis=1)
-        df['HumidityDiff']  = df['Humidity3pm'] - df['Humidity9am']
-        df['PressureDiff']  = df['Pressure3pm'] - df['Pressure9am']
-        df['CloudCoverAvg'] = df[['Cloud9am', 'Cloud3pm']].mean(axis=1)
-        df['RainToday']     = (df['Rainfall']    > 0).astype(int)
-        df['WindGustDiff']  = df['WindGustSpeed'] - df['WindSpeedAvg']
-        df = df[['Date', 'Location', 'MinTemp', 'MaxTemp', 'Rainfall', 'Evaporation',
-             'Sunshine', 'WindGustDir', 'WindGustSpeed', 'WindDir9am', 'WindDir3pm',
-             'WindSpeed9am', 'WindSpeed3pm', 'Humidity9am', 'Humidity3pm',
-             'Pressure9am', 'Pressure3pm', 'Cloud9am', 'Cloud3pm', 'Temp9am',
-             'Temp3pm', 'RainToday', 'day', 'month', 'year', 'TempDiff', 
-             'WindSpeedAvg', 'HumidityDiff', 'PressureDiff', 'CloudCoverAvg',
-             'WindGustDiff']]
-        
-        df.drop(columns=['Date'], inplace=True)
-        
-        cat_cols = df.select_dtypes(include=['object']).columns
-        for col in cat_cols:
-            df[col] = df[col].astype('category')
-        return df
-    except Exception as e:
-        st.error(f"Error preparing data: {str(e)}")
-        return None
-
-
-# predection
-if st.button("Predict Rainfall"):
-    with st.spinner("Fetching weather data..."):
-        if not fetch_data():
-            st.stop()
-            
-    with st.spinner("Preparing data..."):
-        if not prepare_csv():
-            st.stop()
-            
-        test_df = prepare_data()
-        # st.dataframe(test_df)
-        if test_df is None:
-            st.stop()
-    try:
-        sample = test_df.iloc[int(selected_day) - 1]      
-    except Exception as e:
-        st.write("No data available for the selected date")  
-        st.stop()
-
-    try:
-        # sample = test_df.iloc[int(selected_day) - 1]
-        if sample.empty:
-            st.warning("No data available for the selected date")
-            st.stop()
-            
+mode = st.radio("Prediction mode", ["Single location", "Whole month", "All stations"], horizontal=True)
+
+if mode == "Single location":
+    col1, col2 = st.columns(2)
+    with col1:
+        selected_date = st.date_input("Select a date", value=today, min_value=min_date, max_value=max_date)
+    with col2:
+        selected_location = st.selectbox("Select a location", list(location_id.keys()))
+
+    selected_year = selected_date.strftime("%Y")
+    selected_month = selected_date.strftime("%m")
+
+    # predection
+    if st.button("Predict Rainfall"):
+        # Repeat queries are answered from the result cache, skipping the network and the model
+        cache = load_result_cache()
+        # One version for the lookup, the scoring and the cache entries, even if a retrain lands meanwhile
+        version = load_version()
+        result = cache.get(selected_location, selected_date, version.sha1)
+
+        if result is None:
+            # Rows for days BoM has finalised come straight from the feature store
+            store = load_store()
+            sample = store.lookup(selected_location, selected_date) if day_is_final(selected_date) else None
+
+            if sample is None:
+                with st.spinner("Fetching weather data..."):
+                    try:
+                        content = fetch_data(selected_location, selected_year, selected_month)
+                    except requests.exceptions.RequestException as e:
+                        st.error(f"Failed to download data: {str(e)}")
+                        st.write(bom_url(selected_location, selected_year, selected_month))
+                        st.stop()
+                    except Exception as e:
+                        st.error(f"Error processing data: {str(e)}")
+                        st.stop()
+
+                with st.spinner("Preparing data..."):
+                    try:
+                        test_df = prepare_data(content, selected_location)
+                        store.append(test_df)
+                    except Exception as e:
+                        st.error(f"Error preparing data: {str(e)}")
+                        st.stop()
+
+                # The month is fetched anyway, so score every day of it in one call and cache them all
+                try:
+                    with span("predict.score"):
+                        X, proba = score_frame(version.scorer, test_df)
+                    month = {
+                        date: cache.put(selected_location, date, version.sha1, p, x)
+                        for date, p, x in zip(test_df['Date'].dt.date, proba, X)
+                    }
+                except Exception as e:
+                    st.write(f"Prediction failed: {str(e)}")
+                    st.stop()
+
+                # Looked up by date: BoM months can have missing days, so row positions drift
+                result = month.get(selected_date)
+                if result is None:
+                    st.warning("No data available for the selected date")
+                    st.stop()
+
+            else:
+                try:
+                    X = feature_matrix(sample[FEATURE_COLS])
+                    with span("predict.score"):
+                        proba = version.scorer.predict_proba(X)[0]
+                    result = cache.put(selected_location, selected_date, version.sha1, proba, X[0])
+                except Exception as e:
+                    st.write(f"Prediction failed: {str(e)}")
+                    st.stop()
+
         with st.expander("Sample Features:"):
-            if isinstance(sample, pd.Series):
-                sample = sample.to_frame().T
-            
-            # displaying sample features
-            display_df = sample.copy()
-            cat_cols = display_df.select_dtypes(include=['category']).columns
-            for col in cat_cols:
-                display_df[col] = display_df[col].astype(str)
-
-            problem_columns = ['WindGustDir', 'WindDir9am', 'WindDir3pm']
-            display_df[problem_columns] = display_df[problem_columns].astype(str)
-            
-            # Prepare transposed dataframe with custom column names
-            transposed = sample.T.reset_index()
-            transposed.columns = ['Feature', 'Value']
+            # displaying sample features, one row per feature
+            features = decode_row(result.features)
+            transposed = pd.DataFrame({
+                'Feature': list(features),
+                'Value': [f"{v:.6g}" if isinstance(v, float) else str(v) for v in features.values()],
+            })
             st.dataframe(transposed, use_container_width=True)
-        
-        # prepare tha data for the model
-        cat_cols = sample.select_dtypes(include=['object'])
-        for col in cat_cols:
-            sample[col] = sample[col].astype('category')
-
-        model = load_model()
-        prediction_class = model.predict(sample)[0]
-        prediction_proba = model.predict_proba(sample)[0][1]
 
         st.subheader("Prediction Result")
-        if prediction_class == 1:
-            st.success(f"**Prediction:** Rain tomorrow\n\n**Confidence:** {prediction_proba:.2%}")
+        if result.rain_tomorrow == 1:
+            st.success(f"**Prediction:** Rain tomorrow\n\n**Confidence:** {result.probability:.2%}")
         else:
-            st.info(f"**Prediction:** No rain tomorrow\n\n**Confidence:** {(1 - prediction_proba):.2%}")
-            
-    except Exception as e:
-        st.write(f"Prediction failed: {str(e)}")
+            st.info(f"**Prediction:** No rain tomorrow\n\n**Confidence:** {(1 - result.probability):.2%}")
+
+elif mode == "Whole month":
+    # One station over a whole BoM month: one fetch, one model call, every day on a timeline
+    col1, col2 = st.columns(2)
+    with col1:
+        selected_date = st.date_input("Select a month (any day in it)", value=today,
+                                      min_value=min_date, max_value=max_date)
+    with col2:
+        selected_location = st.selectbox("Select a location", list(location_id.keys()))
+
+    selected_year = selected_date.strftime("%Y")
+    selected_month = selected_date.strftime("%m")
+
+    if st.button("Predict Month"):
+        with st.spinner("Fetching weather data..."):
+            try:
+                content = fetch_data(selected_location, selected_year, selected_month)
+            except requests.exceptions.RequestException as e:
+                st.error(f"Failed to download data: {str(e)}")
+                st.write(bom_url(selected_location, selected_year, selected_month))
+                st.stop()
+            except Exception as e:
+                st.error(f"Error processing data: {str(e)}")
+                st.stop()
+
+        with st.spinner("Preparing data..."):
+            try:
+                test_df = prepare_data(content, selected_location)
+                load_store().append(test_df)
+            except Exception as e:
+                st.error(f"Error preparing data: {str(e)}")
+                st.stop()
+
+        if test_df.empty:
+            st.warning("No data available for the selected month")
+            st.stop()
+
+        try:
+            with span("predict.score"):
+                timeline = month_timeline(load_scorer(), test_df)
+        except Exception as e:
+            st.error(f"Prediction failed: {str(e)}")
+            st.stop()
+
+        st.subheader(f"{selected_location}, {selected_date:%B %Y}")
+        st.line_chart(timeline.set_index('Date')['Probability'])
+        st.dataframe(timeline, use_container_width=True)
+        st.download_button(
+            "Download CSV",
+            timeline.to_csv(index=False).encode("utf-8"),
+            file_name=f"rain_forecast_{selected_location}_{selected_year}-{selected_month}.csv",
+            mime="text/csv"
+        )
+
+else:
+    # Nationwide batch: every station over a date range, scored in one model call
+    date_range = st.date_input("Select a date range", value=(today, today), min_value=min_date, max_value=max_date)
+    if isinstance(date_range, (tuple, list)) and len(date_range) == 2:
+        start_date, end_date = date_range
+    else:
+        start_date = end_date = date_range[0] if isinstance(date_range, (tuple, list)) else date_range
+
+    if st.button("Predict All Stations"):
+        with st.spinner(f"Fetching weather data for {len(location_id)} stations..."):
+            batch_df, failures = build_batch_frame(start_date, end_date, store=load_store())
+
+        if failures:
+            with st.expander(f"{len(failures)} station-months could not be loaded"):
+                st.dataframe(pd.DataFrame(failures, columns=['Location', 'year', 'month', 'Error']),
+                             use_container_width=True)
+
+        if batch_df.empty:
+            st.warning("No data available for the selected dates")
+            st.stop()
+
+        try:
+            scorer = load_batch_scorer()
+            results = predict_batch(scorer, batch_df)
+        except Exception as e:
+            st.error(f"Prediction failed: {str(e)}")
+            st.stop()
+
+        st.subheader("Forecast Sheet")
+        st.dataframe(results, use_container_width=True)
+        if hasattr(scorer, "counts"):
+            st.caption(f"{scorer.counts['tree']} of {len(results)} rows were answered by the decision tree, "
+                       f"{scorer.counts['xgboost']} by XGBoost.")
+        st.download_button(
+            "Download CSV",
+            results.to_csv(index=False).encode("utf-8"),
+            file_name=f"rain_forecast_{start_date}_{end_date}.csv",
+            mime="text/csv"
+        )
 
 st.markdown("---")
 st.markdown(
     "**Data Source:** Rainfall and weather data used in this application is collected from the [Bureau of Meteorology (BoM)](http://www.bom.gov.au/climate/data/).",
     unsafe_allow_html=True
-)
\ No newline at end of file
+)
+
+# Prefetch what the other pages need, after this page has rendered
+warm_up()
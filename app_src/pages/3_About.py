@@ -1,18 +1,14 @@
 import streamlit as st
 from streamlit_lottie import st_lottie
-import requests
+
+from utils.assets import LOTTIE_URLS, load_lottie
+from utils.startup import warm_up
 
 # -------------- Page Configuration --------------
 st.set_page_config(page_title="About This Project", layout="wide")
 
-# -------------- Load Animation from URL (.json only) --------------
-def load_lottieurl(url: str):
-    r = requests.get(url)
-    if r.status_code != 200:
-        return None
-    return r.json()
-
-lottie_weather =  load_lottieurl("https://assets9.lottiefiles.com/packages/lf20_sk5h1kfn.json")
+# -------------- Load Animation (local cache, refreshed in the background) --------------
+lottie_weather = load_lottie(LOTTIE_URLS["weather"])
 
 
 # -------------- Header Section with Animation --------------
@@ -126,3 +122,6 @@ with contact_cols[1]:
 
 with contact_cols[2]:
     st.markdown("**Kaggle**  \n[kaggle.com/rain-prediction](https://www.kaggle.com/code/mohamedmahmoud111/rain-prediction-porject)")
+
+# Prefetch what the other pages need, after this page has rendered
+warm_up()
@@ -0,0 +1 @@
+# Shared helpers for the SkyCast Streamlit pages.
@@ -0,0 +1,111 @@
+"""Local cache for the app's static assets (Lottie animations and CSS).
+
+Lottie JSON is served from an on-disk copy under dirs.asset_cache. A missing
+copy is fetched once with a short timeout. A copy older than LOTTIE_TTL is
+still served, and a background thread refreshes it, so page renders never
+wait on lottiefiles.com once the cache is warm.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from functools import lru_cache
+
+from utils.config import correct_path
+
+
+# Animations used across the pages
+LOTTIE_URLS = {
+    "weather": "https://assets9.lottiefiles.com/packages/lf20_sk5h1kfn.json",
+    "map": "https://assets3.lottiefiles.com/packages/lf20_jzviyhjn.json",
+    "weather_intro": "https://assets10.lottiefiles.com/packages/lf20_x62chJ.json",
+    "rainfall": "https://assets6.lottiefiles.com/packages/lf20_sk5h1kfn.json",
+}
+
+LOTTIE_TTL = 7 * 24 * 3600  # seconds before a cached animation is refreshed
+FETCH_TIMEOUT = 3
+RETRY_AFTER = 300  # seconds before a failed download is attempted again
+
+_failed = {}  # url -> time of the last failed download
+_refreshing = set()
+_refresh_lock = threading.Lock()
+
+
+def asset_path(url):
+    name = hashlib.sha1(url.encode()).hexdigest()
+    return os.path.join(correct_path("dirs", "asset_cache"), f"{name}.json")
+
+
+def fetch_lottie(url, path):
+    """Download url into path; returns the parsed JSON or None on failure."""
+    import requests  # only needed on a cache miss or refresh
+
+    if time.time() - _failed.get(url, float("-inf")) < RETRY_AFTER:
+        return None
+    try:
+        r = requests.get(url, timeout=FETCH_TIMEOUT)
+        r.raise_for_status()
+        data = r.json()
+    except (requests.exceptions.RequestException, ValueError):
+        _failed[url] = time.time()
+        return None
+    _failed.pop(url, None)
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+    return data
+
+
+def refresh_in_background(url, path):
+    with _refresh_lock:
+        if url in _refreshing:
+            return
+        _refreshing.add(url)
+
+    def run():
+        try:
+            fetch_lottie(url, path)
+        finally:
+            with _refresh_lock:
+                _refreshing.discard(url)
+
+    threading.Thread(target=run, name="lottie-refresh", daemon=True).start()
+
+
+@lru_cache(maxsize=64)
+def read_json(path, mtime_ns):
+    # Keyed on mtime so a refreshed file is re-read once
+    with open(path) as f:
+        return json.load(f)
+
+
+def load_lottie(url, ttl=LOTTIE_TTL):
+    """Lottie animation JSON for url from the local cache, or None if unavailable."""
+    path = asset_path(url)
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return fetch_lottie(url, path)
+
+    if time.time() - stat.st_mtime > ttl:
+        refresh_in_background(url, path)
+    try:
+        return read_json(path, stat.st_mtime_ns)
+    except (OSError, ValueError):
+        return fetch_lottie(url, path)
+
+
+@lru_cache(maxsize=8)
+def read_text(path, mtime_ns):
+    with open(path) as f:
+        return f.read()
+
+
+def load_css(name="styles_path"):
+    """Contents of a stylesheet from artifacts_paths, read once per file version."""
+    path = correct_path("artifacts_paths", name)
+    return read_text(path, os.stat(path).st_mtime_ns)
@@ -0,0 +1,319 @@
+"""Bulk historical backfill: score every station-day in a date range.
+
+The range is split into (station, year) units that run on a process pool.
+Each unit reads its months, builds features, scores them with one
+predict_proba call and writes one columnar partition:
+
+    <out>/<station>/<year>.npz   Date, Probability, RainTomorrow, Rainfall, Observed
+
+Observed is the next day's rain as the model's target defines it (Rainfall
+above training.RAIN_THRESHOLD mm), or -1 where the next day is missing. Partitions are written atomically, so an
+interrupted run is resumed by running the same command again. Memory is
+bounded by one unit per worker, whatever the length of the range; with the
+compiled backend (serving.backend, the default) the workers share one
+memory-mapped copy of the model.
+
+Months come from BoM through the on-disk fetch cache. BoM only serves about
+the last 14 months, so older years need --source: a local directory laid out
+like BoM's (<source>/YYYYMM/text/<station id>.YYYYMM.csv).
+
+Run from app_src/:
+
+    python -m utils.backfill --start 2025-01 --end 2025-12 --workers 4
+    python -m utils.backfill --stations Sydney Perth --start 2010-01 --end 2024-12 --source /data/bom
+"""
+import argparse
+import datetime
+import io
+import json
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+import requests
+
+from utils.bom import atomic_write, fetch_months, period, prepare_data
+from utils.cascade import Cascade, cascade_params
+from utils.config import correct_path
+from utils.features import feature_matrix
+from utils.fetcher import RATE_PER_HOST, Fetcher
+from utils.registry import ModelRegistry, serving_backend
+from utils.result_cache import file_sha1
+from utils.training import RAIN_THRESHOLD
+from utils.stations import location_id
+
+
+MANIFEST = "manifest.json"
+UNIT_MONTHS = 13  # most months a station-year reads: its own and the next one, for labels
+
+_worker = {}  # per-process state set by init_worker()
+
+
+def parse_month(value):
+    """(year, month) from 'YYYY-MM'."""
+    try:
+        date = datetime.datetime.strptime(str(value), "%Y-%m")
+    except ValueError:
+        raise ValueError(f"Invalid month: {value!r} (expected YYYY-MM)") from None
+    return date.year, date.month
+
+
+def plan_units(locations, start, end):
+    """(location, year, months) for every station-year touched by [start, end]."""
+    units = []
+    for location in locations:
+        for year in range(start[0], end[0] + 1):
+            first = start[1] if year == start[0] else 1
+            last = end[1] if year == end[0] else 12
+            units.append((location, year, list(range(first, last + 1))))
+    return units
+
+
+def partition_path(out_dir, location, year):
+    return os.path.join(out_dir, location, f"{year}.npz")
+
+
+def next_month(year, month):
+    return (year + 1, 1) if month == 12 else (year, month + 1)
+
+
+def is_missing(e):
+    # The month does not exist at the source; anything else is retried on the next run
+    if isinstance(e, FileNotFoundError):
+        return True
+    response = getattr(e, "response", None)
+    return isinstance(e, requests.exceptions.HTTPError) and response is not None and response.status_code == 404
+
+
+def read_local(source, keys):
+    """{key: CSV bytes or exception} for (location, year, month) keys from a BoM-style directory."""
+    contents = {}
+    for location, year, month in keys:
+        p = period(year, month)
+        try:
+            with open(os.path.join(source, p, "text", f"{location_id[location]}.{p}.csv"), "rb") as f:
+                contents[(location, year, month)] = f.read()
+        except OSError as e:
+            contents[(location, year, month)] = e
+    return contents
+
+
+def month_reader(source=None, processes=1):
+    """read(keys) -> {key: CSV bytes or exception}, from source or from BoM through the fetch cache."""
+    if source:
+        return lambda keys: read_local(source, keys)
+    # The per-host rate limit is shared out between the processes; threads beyond
+    # one unit's months, or beyond what a second of the rate allows, would only wait
+    rate = RATE_PER_HOST / processes
+    workers = min(UNIT_MONTHS, math.ceil(rate)) if rate else UNIT_MONTHS
+    fetcher = Fetcher(max_workers=workers, rate=rate)
+    return lambda keys: fetch_months(keys, fetcher=fetcher)
+
+
+def model_paths(model_path, band=None):
+    paths = {"xgboost": model_path}
+    if band:
+        paths["decision_tree"] = correct_path("artifacts_paths", "DT_model_path")
+    return paths
+
+
+def init_worker(model_path, backend, source, workers, band=None):
+    # With the compiled backend every worker maps the arrays backfill() wrote, one copy in memory
+    registry = ModelRegistry(model_paths(model_path, band), backend)
+    _worker["backend"] = registry.get("xgboost").scorer
+    if band:
+        _worker["backend"] = Cascade(registry.get("decision_tree").scorer, _worker["backend"], *band)
+    _worker["read"] = month_reader(source, workers)
+
+
+def score_unit(location, year, months, out_dir):
+    """Score one station-year and write its partition; returns a summary dict."""
+    started = time.perf_counter()
+    keys = [(location, year, month) for month in months]
+    # The following month only labels the unit's last day
+    label_key = (location, *next_month(year, months[-1]))
+    if datetime.date(*label_key[1:], 1) > datetime.date.today():
+        label_key = None
+    contents = _worker["read"](keys + [label_key] if label_key else keys)
+
+    frames, missing = [], []
+    for key, content in contents.items():
+        try:
+            if isinstance(content, Exception):
+                raise content
+            frames.append(prepare_data(content, location))
+        except Exception as e:
+            if key == label_key:
+                continue
+            if not (is_missing(e) or isinstance(e, ValueError)):
+                raise
+            missing.append((key[2], str(e)))
+
+    tree_rows = 0
+    columns = {
+        "Date": np.empty(0, dtype="datetime64[D]"),
+        "Probability": np.empty(0, dtype=np.float32),
+        "RainTomorrow": np.empty(0, dtype=np.int8),
+        "Rainfall": np.empty(0, dtype=np.float32),
+        "Observed": np.empty(0, dtype=np.int8),
+    }
+    if frames:
+        df = pd.concat(frames, ignore_index=True).drop_duplicates("Date").sort_values("Date", ignore_index=True)
+        dates = df["Date"].to_numpy(dtype="datetime64[D]")
+        rainfall = df["Rainfall"].to_numpy(dtype=np.float32, na_value=np.nan)
+        observed = np.full(len(df), -1, dtype=np.int8)
+        known = (np.diff(dates) == np.timedelta64(1, "D")) & ~np.isnan(rainfall[1:])
+        observed[:-1] = np.where(known, rainfall[1:] > RAIN_THRESHOLD, -1)
+
+        keep = ((df["Date"].dt.year == year) & df["Date"].dt.month.isin(months)).to_numpy()
+        counts = getattr(_worker["backend"], "counts", None)  # a Cascade's rows per stage
+        before = counts["tree"] if counts else 0
+        proba = _worker["backend"].predict_proba(feature_matrix(df[keep]))
+        tree_rows = counts["tree"] - before if counts else 0
+        columns.update({
+            "Date": dates[keep],
+            "Probability": proba[:, 1].astype(np.float32),
+            "RainTomorrow": proba.argmax(axis=1).astype(np.int8),
+            "Rainfall": rainfall[keep],
+            "Observed": observed[keep],
+        })
+
+    buffer = io.BytesIO()
+    np.savez_compressed(buffer, **columns)
+    atomic_write(partition_path(out_dir, location, year), buffer.getvalue())
+    return {"location": location, "year": year, "rows": len(columns["Date"]), "tree_rows": tree_rows,
+            "missing": missing, "seconds": time.perf_counter() - started}
+
+
+def check_manifest(out_dir, manifest):
+    # Partitions from another range or model must not be mixed into this run
+    path = os.path.join(out_dir, MANIFEST)
+    try:
+        with open(path) as f:
+            existing = json.load(f)
+    except FileNotFoundError:
+        atomic_write(path, json.dumps(manifest, indent=2).encode("utf-8"))
+        return
+    for key in ("start", "end", "model_sha1", "rain_threshold", "cascade"):
+        if existing.get(key) != manifest.get(key):
+            raise ValueError(f"{out_dir} holds a backfill with {key}={existing.get(key)!r}, "
+                             f"not {manifest.get(key)!r}; use another output directory")
+
+
+def backfill(locations, start, end, out_dir=None, workers=None, backend=None, source=None,
+             model_path=None, cascade=False, log=print):
+    """Score every station-day of locations between start and end ((year, month) pairs).
+
+    With cascade, clear-cut days are answered by the decision tree (utils.cascade,
+    band from params.yaml). Station-years already on disk are skipped. Returns a
+    summary dict.
+    """
+    unknown = [location for location in locations if location not in location_id]
+    if unknown:
+        raise ValueError(f"Unknown locations: {unknown}")
+    if start > end:
+        raise ValueError("start is after end")
+    out_dir = out_dir or correct_path("dirs", "backfill_dir")
+    model_path = model_path or correct_path("artifacts_paths", "xg_model_path")
+    workers = workers or os.cpu_count() or 1
+    backend = backend or serving_backend()
+    band = None
+    if cascade:
+        params = cascade_params()
+        band = [params["low"], params["high"]]
+    manifest = {
+        "start": "%04d-%02d" % start,
+        "end": "%04d-%02d" % end,
+        "model_sha1": file_sha1(model_path),
+        "rain_threshold": RAIN_THRESHOLD,
+    }
+    if band:
+        manifest["cascade"] = band
+    check_manifest(out_dir, manifest)
+
+    if backend == "compiled":
+        # Compile once here rather than in every worker
+        ModelRegistry({"xgboost": model_path}, backend).get("xgboost")
+
+    units = plan_units(locations, start, end)
+    todo = [unit for unit in units if not os.path.exists(partition_path(out_dir, unit[0], unit[1]))]
+    log(f"{len(units) - len(todo)} of {len(units)} station-years already done, {len(todo)} to go")
+
+    started = time.perf_counter()
+    rows, tree_rows, failed, missing = 0, 0, [], []
+    pool = ProcessPoolExecutor(min(workers, len(todo)) or 1, initializer=init_worker,
+                               initargs=(model_path, backend, source, workers, band))
+    try:
+        futures = {pool.submit(score_unit, *unit, out_dir): unit for unit in todo}
+        for done, future in enumerate(as_completed(futures), 1):
+            location, year, _ = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                failed.append((location, year, str(e)))
+                log(f"[{done}/{len(todo)}] {location} {year}: failed ({e})")
+                continue
+            rows += result["rows"]
+            tree_rows += result["tree_rows"]
+            missing.extend((location, year, month, error) for month, error in result["missing"])
+            log(f"[{done}/{len(todo)}] {location} {year}: {result['rows']} days in {result['seconds']:.2f}s")
+    finally:
+        # On Ctrl-C, queued units are dropped; finished partitions are kept for the next run
+        pool.shutdown(wait=True, cancel_futures=True)
+
+    seconds = time.perf_counter() - started
+    return {"units": len(units), "scored": len(todo) - len(failed), "rows": rows, "tree_rows": tree_rows,
+            "seconds": seconds, "failed": failed, "missing": missing}
+
+
+def load_results(out_dir=None, locations=None):
+    """All partitions in out_dir as one frame with a Location column."""
+    out_dir = out_dir or correct_path("dirs", "backfill_dir")
+    frames = []
+    for location in sorted(locations or os.listdir(out_dir)):
+        location_dir = os.path.join(out_dir, location)
+        if not os.path.isdir(location_dir):
+            continue
+        for name in sorted(os.listdir(location_dir)):
+            if not name.endswith(".npz"):
+                continue
+            with np.load(os.path.join(location_dir, name)) as part:
+                frame = pd.DataFrame({col: part[col] for col in part.files})
+            frame.insert(1, "Location", location)
+            frames.append(frame)
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score historical station-days in bulk.")
+    parser.add_argument("--stations", nargs="+", default=list(location_id), help="default: all")
+    parser.add_argument("--start", required=True, help="first month, YYYY-MM")
+    parser.add_argument("--end", required=True, help="last month, YYYY-MM")
+    parser.add_argument("--out", help="output directory (default: dirs.backfill_dir)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--backend", choices=["native", "compiled"], help="default: serving.backend")
+    parser.add_argument("--source", help="local directory in BoM's layout instead of downloading")
+    parser.add_argument("--cascade", action="store_true",
+                        help="answer clear-cut days with the decision tree (band from params.yaml)")
+    args = parser.parse_args()
+    try:
+        summary = backfill(args.stations, parse_month(args.start), parse_month(args.end), out_dir=args.out,
+                           workers=args.workers, backend=args.backend, source=args.source, cascade=args.cascade)
+    except KeyboardInterrupt:
+        raise SystemExit("Interrupted; run the same command again to resume")
+    print(f"{summary['rows']} station-days from {summary['scored']} station-years in "
+          f"{summary['seconds']:.1f}s ({summary['rows'] / max(summary['seconds'], 1e-9):.0f} days/s)")
+    if args.cascade:
+        print(f"{summary['tree_rows']} of {summary['rows']} station-days answered by the decision tree")
+    if summary["missing"]:
+        print(f"{len(summary['missing'])} station-months not available at the source")
+    if summary["failed"]:
+        print(f"{len(summary['failed'])} station-years failed and will be retried on the next run:")
+        for location, year, error in summary["failed"]:
+            print(f"  {location} {year}: {error}")
+        raise SystemExit(1)
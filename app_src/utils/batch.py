@@ -0,0 +1,71 @@
+import pandas as pd
+
+from utils.bom import fetch_months, prepare_data
+from utils.features import feature_matrix, window_features
+from utils.metrics import timed
+from utils.stations import location_id
+
+
+def month_range(start_date, end_date):
+    # (year, month) pairs covering [start_date, end_date]
+    year, month = start_date.year, start_date.month
+    while (year, month) <= (end_date.year, end_date.month):
+        yield year, month
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+
+@timed("batch.build_frame")
+def build_batch_frame(start_date, end_date, locations=None, store=None):
+    """Fetch and prepare every (location, month) in the range.
+
+    Returns one frame with a row per station-day plus a list of
+    (location, year, month, error) for the months that could not be loaded.
+    Prepared months are also appended to ``store`` when one is given.
+    """
+    locations = list(location_id) if locations is None else locations
+    keys = [(location, year, month)
+            for location in locations
+            for year, month in month_range(start_date, end_date)]
+
+    frames, failures = [], []
+    for (location, year, month), content in fetch_months(keys).items():
+        try:
+            if isinstance(content, Exception):
+                raise content
+            frames.append(prepare_data(content, location))
+        except Exception as e:
+            failures.append((location, year, month, str(e)))
+
+    if not frames:
+        return pd.DataFrame(), failures
+
+    df = pd.concat(frames, ignore_index=True)
+    if store is not None:
+        store.append(df)
+    in_range = (df['Date'] >= pd.Timestamp(start_date)) & (df['Date'] <= pd.Timestamp(end_date))
+    return df[in_range].reset_index(drop=True), failures
+
+
+def score_frame(backend, df):
+    """(model input rows, predict_proba output) for every row of df, in one call."""
+    X = feature_matrix(df)
+    return X, backend.predict_proba(X)
+
+
+@timed("batch.predict")
+def predict_batch(backend, df):
+    # One vectorized predict_proba call; the class label is taken from the same output
+    _, proba = score_frame(backend, df)
+    return pd.DataFrame({
+        'Date': df['Date'].dt.date,
+        'Location': df['Location'].astype(str),
+        'RainTomorrow': proba.argmax(axis=1),
+        'Probability': proba[:, 1],
+    })
+
+
+def month_timeline(backend, df):
+    """predict_batch() for prepared station-month rows, joined with their window features by date."""
+    windows = window_features(df)
+    windows = windows.assign(Date=windows['Date'].dt.date, Location=windows['Location'].astype(str))
+    return predict_batch(backend, df).merge(windows, on=['Location', 'Date'], how='left')
@@ -0,0 +1,226 @@
+import datetime
+import io
+import json
+import os
+import tempfile
+import time
+
+import pandas as pd
+
+from utils.config import correct_path
+from utils.features import NUMERIC_COLS, build_features
+from utils.fetcher import default_fetcher
+from utils.metrics import span, timed
+from utils.stations import location_id
+
+
+BOM_URL = "https://reg.bom.gov.au/climate/dwo/{period}/text/{station_id}.{period}.csv"
+
+# BoM column headers -> training column names
+COLUMN_NAMES = {
+    'Minimum temperature (°C)': 'MinTemp',
+    'Maximum temperature (°C)': 'MaxTemp',
+    'Rainfall (mm)': 'Rainfall',
+    'Evaporation (mm)': 'Evaporation',
+    'Sunshine (hours)': 'Sunshine',
+    'Direction of maximum wind gust ': 'WindGustDir',
+    'Speed of maximum wind gust (km/h)': 'WindGustSpeed',
+    '9am Temperature (°C)': 'Temp9am',
+    '9am relative humidity (%)': 'Humidity9am',
+    '9am cloud amount (oktas)': 'Cloud9am',
+    '9am wind direction': 'WindDir9am',
+    '9am wind speed (km/h)': 'WindSpeed9am',
+    '9am MSL pressure (hPa)': 'Pressure9am',
+    '3pm Temperature (°C)': 'Temp3pm',
+    '3pm relative humidity (%)': 'Humidity3pm',
+    '3pm cloud amount (oktas)': 'Cloud3pm',
+    '3pm wind direction': 'WindDir3pm',
+    '3pm wind speed (km/h)': 'WindSpeed3pm',
+    '3pm MSL pressure (hPa)': 'Pressure3pm',
+    'Location': 'Location',
+    'Date': 'Date'
+}
+
+# Explicit read dtypes for the BoM columns we keep
+BOM_DTYPES = {bom_col: ('float32' if name in NUMERIC_COLS else 'object')
+              for bom_col, name in COLUMN_NAMES.items() if name != 'Location'}
+
+# BoM reports a calm wind speed as text
+BOM_NA_VALUES = {bom_col: ['Calm'] for bom_col, name in COLUMN_NAMES.items() if name in NUMERIC_COLS}
+
+# Seconds a cached current-month file is served before it is revalidated
+CURRENT_MONTH_TTL = 60 * 60
+
+# BoM appends the last day's 3pm observations after the month ends
+CLOSE_GRACE = datetime.timedelta(days=2)
+
+
+def period(year, month):
+    return f"{int(year):04d}{int(month):02d}"
+
+
+def bom_url(location, year, month):
+    return BOM_URL.format(period=period(year, month), station_id=location_id[location])
+
+
+def fetched_path(location, year, month):
+    data_path = correct_path("dirs", "fetched_data")
+    return os.path.join(data_path, f"{location_id[location]}_{period(year, month)}.csv")
+
+
+def month_closed_at(year, month):
+    # UTC time after which a month's file no longer changes
+    year, month = int(year), int(month)
+    next_month = datetime.datetime(year + 1, 1, 1) if month == 12 else datetime.datetime(year, month + 1, 1)
+    return (next_month + CLOSE_GRACE).replace(tzinfo=datetime.timezone.utc).timestamp()
+
+
+def final_before(now=None):
+    # First day whose observations may still change; earlier days are final
+    now = datetime.datetime.now(datetime.timezone.utc) if now is None else now
+    return (now - CLOSE_GRACE).date()
+
+
+def day_is_final(date, now=None):
+    # A day's observations stop changing once the grace period has passed
+    return pd.Timestamp(date).date() < final_before(now)
+
+
+def read_meta(file_path):
+    try:
+        with open(file_path + ".json", "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def atomic_write(file_path, data):
+    # Write to a temp file in the same directory, then rename over the target
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(file_path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def read_cached(file_path):
+    with open(file_path, "rb") as f:
+        return f.read()
+
+
+def write_meta(file_path, meta):
+    atomic_write(file_path + ".json", json.dumps(meta).encode("utf-8"))
+
+
+def cache_status(file_path, year, month, now=None, ttl=CURRENT_MONTH_TTL):
+    """Return 'fresh', 'stale' or 'missing' for a cached month file.
+
+    A month fetched after it closed is final and is never fetched again;
+    an open month is fresh for ``ttl`` seconds and then revalidated.
+    """
+    now = time.time() if now is None else now
+    meta = read_meta(file_path)
+    if meta is None or not os.path.exists(file_path):
+        return "missing"
+    if meta["fetched_at"] >= month_closed_at(year, month):
+        return "fresh"
+    return "fresh" if now - meta["fetched_at"] < ttl else "stale"
+
+
+# fetch data
+@timed("bom.fetch")
+def fetch_data(location, year, month, timeout=10, ttl=CURRENT_MONTH_TTL, get=None):
+    """Download a station-month CSV through the on-disk cache and return its bytes."""
+    get = default_fetcher().get if get is None else get
+    file_path = fetched_path(location, year, month)
+    status = cache_status(file_path, year, month, ttl=ttl)
+    if status == "fresh":
+        return read_cached(file_path)
+
+    # Conditional request so an unchanged month costs a 304 and no body
+    meta = read_meta(file_path) if status == "stale" else None
+    headers = {}
+    if meta and meta.get("etag"):
+        headers["If-None-Match"] = meta["etag"]
+    if meta and meta.get("last_modified"):
+        headers["If-Modified-Since"] = meta["last_modified"]
+
+    fetched_at = time.time()
+    with span("bom.download"):
+        response = get(bom_url(location, year, month), headers=headers, timeout=timeout)
+    if response.status_code == 304 and meta:
+        meta["fetched_at"] = fetched_at
+        write_meta(file_path, meta)
+        return read_cached(file_path)
+    response.raise_for_status()
+
+    atomic_write(file_path, response.content)
+    write_meta(file_path, {
+        "url": response.url,
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+        "fetched_at": fetched_at,
+    })
+    return response.content
+
+
+def fetch_months(keys, fetcher=None, timeout=10, ttl=CURRENT_MONTH_TTL):
+    """Fetch many (location, year, month) keys concurrently.
+
+    Returns {key: CSV bytes or the exception raised for that key}.
+    """
+    fetcher = default_fetcher() if fetcher is None else fetcher
+    return fetcher.map(
+        lambda key: fetch_data(*key, timeout=timeout, ttl=ttl, get=fetcher.get), keys)
+
+
+def header_offset(content):
+    """Byte offset of the '"Date"' header row, skipping BoM's preamble.
+
+    Also accepts files whose preamble has already been stripped.
+    """
+    idx = content.find(b'"Date"')
+    if idx < 0:
+        raise ValueError("BoM header row not found")
+    return content.rfind(b'\n', 0, idx) + 1
+
+
+def read_bom_buffer(content, offset, dtype):
+    buffer = io.BytesIO(content)  # shares the bytes object, no copy
+    buffer.seek(offset)
+    return pd.read_csv(
+        buffer,
+        encoding='latin1',
+        on_bad_lines='warn',
+        usecols=lambda col: col in BOM_DTYPES,
+        dtype=dtype,
+        na_values=BOM_NA_VALUES,
+    )
+
+
+@timed("bom.parse_csv")
+def parse_bom_csv(content):
+    """Parse a BoM monthly CSV held in memory into a frame with training column names."""
+    offset = header_offset(content)
+    try:
+        df = read_bom_buffer(content, offset, BOM_DTYPES)
+    except ValueError:
+        # An unexpected token in a numeric column: read as text and coerce
+        df = read_bom_buffer(content, offset, object)
+        for bom_col, name in COLUMN_NAMES.items():
+            if name in NUMERIC_COLS and bom_col in df.columns:
+                df[bom_col] = pd.to_numeric(df[bom_col], errors='coerce')
+    df.rename(mapper=COLUMN_NAMES, axis=1, inplace=True)
+    df['Date'] = pd.to_datetime(df['Date'], format='%Y-%m-%d')
+    return df
+
+
+def prepare_data(content, location):
+    df = parse_bom_csv(content)
+    df['Location'] = location
+    return build_features(df)
@@ -0,0 +1,190 @@
+"""Two-stage scoring: the decision tree answers clear-cut rows, XGBoost the rest.
+
+The depth-2 tree (models/Decision_Tree.pkl) costs a couple of comparisons per
+row. Rows it scores outside the confidence band [low, high] (cascade section
+of params.yaml) take the tree's probability; rows inside the band, and rows
+missing a feature the tree splits on, go to XGBoost. The tree's leaf
+probabilities are its training-set rain rates, so the band is a calibrated
+cut on P(rain).
+
+A Cascade scores the feature_matrix() layout and returns (n, 2)
+probabilities like the backends in utils.inference, so it can stand in for
+one. The tree was trained (notebooks/Decision-Tree(Model).ipynb) on
+label-encoded raw columns plus weekday/hour/minute; those encodings are the
+same sorted codes feature_matrix() uses, and weekday/hour/minute are derived
+from the date columns. counts holds the rows each stage answered; with
+RAIN_METRICS set they are also exported as cascade.tree / cascade.xgboost.
+
+The report scores the held-out split training uses, with XGBoost alone and
+with the cascade (share of rows per stage, metric changes, model time).
+Run from app_src/:
+
+    python -m utils.cascade --data data/processed/weatherAUS
+    python -m utils.cascade --data data/processed/weatherAUS --sweep
+"""
+import argparse
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils.config import load_config
+from utils.features import FEATURE_COLS
+from utils.metrics import count, span
+
+
+# Tree inputs that are not model columns, computed from the date
+DERIVED_COLS = ('weekday', 'hour', 'minute')
+
+SWEEP_LOW = (0.0, 0.05, 0.1, 0.15, 0.2, 0.25, 0.3)
+SWEEP_HIGH = (0.7, 0.75, 0.8, 0.85, 0.9, 0.95, 1.0)
+
+
+def cascade_params():
+    return load_config("params")["cascade"]
+
+
+def confident(p, known, low, high):
+    # Rows the tree answers: outside the band and with every feature it splits on
+    return ((p < low) | (p > high)) & known
+
+
+class Cascade:
+
+    def __init__(self, tree, model, low=None, high=None):
+        params = cascade_params()
+        self.tree = tree
+        self.model = model
+        self.low = params["low"] if low is None else low
+        self.high = params["high"] if high is None else high
+        if not 0 <= self.low <= self.high <= 1:
+            raise ValueError(f"Invalid cascade band: [{self.low}, {self.high}]")
+
+        names = list(tree.feature_names_in_)
+        unknown = [name for name in names if name not in FEATURE_COLS and name not in DERIVED_COLS]
+        if unknown:
+            raise ValueError(f"Decision tree needs columns the model input does not have: {unknown}")
+        nodes = tree.tree_
+        # Only the columns the tree splits on are filled in; the rest are never read
+        self._used = [(j, names[j]) for j in np.unique(nodes.feature[nodes.feature >= 0])]
+        self._n_features = len(names)
+        self._required = [FEATURE_COLS.index(name) for _, name in self._used if name in FEATURE_COLS]
+        values = nodes.value[:, 0, :]
+        self._leaf_proba = (values[:, 1] / values.sum(axis=1)).astype(np.float32)
+        self.counts = {"tree": 0, "xgboost": 0}
+        self._lock = threading.Lock()
+
+    def tree_matrix(self, X):
+        """The tree's inputs for feature_matrix() rows."""
+        Xt = np.zeros((len(X), self._n_features), dtype=np.float32)
+        for j, name in self._used:
+            if name == 'weekday':
+                dates = pd.to_datetime(pd.DataFrame({
+                    col: X[:, FEATURE_COLS.index(col)].astype(np.int32) for col in ('year', 'month', 'day')}))
+                Xt[:, j] = dates.dt.weekday.to_numpy()
+            elif name in FEATURE_COLS:
+                Xt[:, j] = X[:, FEATURE_COLS.index(name)]
+            # hour and minute are always 0 for daily observations
+        return Xt
+
+    def tree_proba(self, X):
+        """The tree's P(rain) per row, and whether the row has every feature the tree splits on."""
+        p = self._leaf_proba[self.tree.tree_.apply(self.tree_matrix(X))]
+        # The tree was trained on median-filled data; missing values are left to XGBoost
+        known = ~np.isnan(X[:, self._required]).any(axis=1) if self._required else np.ones(len(X), bool)
+        return p, known
+
+    def predict_proba(self, X):
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        with span("cascade.tree"):
+            p, known = self.tree_proba(X)
+        proba = np.column_stack([1 - p, p])
+        rest = np.flatnonzero(~confident(p, known, self.low, self.high))
+        if len(rest):
+            with span("cascade.xgboost"):
+                proba[rest] = self.model.predict_proba(X[rest])
+        with self._lock:
+            self.counts["tree"] += len(X) - len(rest)
+            self.counts["xgboost"] += len(rest)
+        count("cascade.tree", len(X) - len(rest))
+        count("cascade.xgboost", len(rest))
+        return proba
+
+
+def load_cascade(registry=None, low=None, high=None):
+    """Cascade over the registry's current decision tree and XGBoost versions."""
+    from utils.registry import default_registry
+
+    registry = registry or default_registry()
+    return Cascade(registry.get("decision_tree").scorer, registry.get("xgboost").scorer, low, high)
+
+
+def band_report(y, p_model, p_tree, sure):
+    """Share of rows answered by the tree and metrics of the cascade vs XGBoost alone."""
+    from utils.training import evaluate
+
+    p_cascade = np.where(sure, p_tree, p_model)
+    alone, cascade = evaluate(y, p_model), evaluate(y, p_cascade)
+    return {
+        "tree_share": float(sure.mean()),
+        "agreement": float(np.mean((p_cascade >= 0.5) == (p_model >= 0.5))),
+        "xgboost": alone,
+        "cascade": cascade,
+        "cost": {key: cascade[key] - alone[key] for key in ("accuracy", "f1", "roc_auc", "aucpr")},
+    }
+
+
+def report(data_path=None, low=None, high=None, sweep=False, registry=None, log=print):
+    """Score the held-out split with XGBoost alone and with the cascade; returns the report dict."""
+    from utils.config import correct_path
+    from utils.training import cached_matrix, split_indices
+
+    training = load_config("params")["training"]
+    data_path = data_path or correct_path("data_paths", "xg_processed_data_path")
+    X, y, _ = cached_matrix(data_path, training["target"])
+    _, valid_idx = split_indices(len(y), training["test_size"], training["random_state"])
+    X, y = np.ascontiguousarray(X[valid_idx]), np.asarray(y[valid_idx])
+    cascade = load_cascade(registry, low, high)
+
+    started = time.perf_counter()
+    p_model = cascade.model.predict_proba(X)[:, 1]
+    model_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    cascade.predict_proba(X)
+    cascade_seconds = time.perf_counter() - started
+
+    p_tree, known = cascade.tree_proba(X)
+    result = band_report(y, p_model, p_tree, confident(p_tree, known, cascade.low, cascade.high))
+    result.update({"rows": len(y), "low": cascade.low, "high": cascade.high,
+                   "xgboost_seconds": model_seconds, "cascade_seconds": cascade_seconds})
+    log(f"{len(y)} held-out rows, band [{cascade.low}, {cascade.high}]: "
+        f"tree {result['tree_share']:.1%}, XGBoost {1 - result['tree_share']:.1%}")
+    log(f"model time {model_seconds * 1000:.1f} ms -> {cascade_seconds * 1000:.1f} ms")
+    log(f"{'':10}{'XGBoost':>10}{'cascade':>10}{'change':>10}")
+    for key, change in result["cost"].items():
+        log(f"{key:10}{result['xgboost'][key]:10.4f}{result['cascade'][key]:10.4f}{change:+10.4f}")
+
+    if sweep:
+        # Other bands, reusing both models' scores
+        result["sweep"] = []
+        log(f"\n{'low':>6}{'high':>6}{'tree':>8}{'accuracy':>10}{'f1':>9}{'roc_auc':>9}")
+        for sweep_low in SWEEP_LOW:
+            for sweep_high in SWEEP_HIGH:
+                band = band_report(y, p_model, p_tree, confident(p_tree, known, sweep_low, sweep_high))
+                result["sweep"].append({"low": sweep_low, "high": sweep_high, **band})
+                cost = band["cost"]
+                log(f"{sweep_low:6.2f}{sweep_high:6.2f}{band['tree_share']:8.1%}"
+                    f"{cost['accuracy']:+10.4f}{cost['f1']:+9.4f}{cost['roc_auc']:+9.4f}")
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report the decision tree / XGBoost cascade on held-out data.")
+    parser.add_argument("--data", help="training CSV or preprocess partition directory "
+                                       "(default: data_paths.xg_processed_data_path)")
+    parser.add_argument("--low", type=float, help="default: cascade.low")
+    parser.add_argument("--high", type=float, help="default: cascade.high")
+    parser.add_argument("--sweep", action="store_true", help="also report a grid of bands")
+    args = parser.parse_args()
+    report(args.data, args.low, args.high, args.sweep)
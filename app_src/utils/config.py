@@ -0,0 +1,21 @@
+import os
+from functools import lru_cache
+
+import yaml
+
+
+# Repository root (app_src/utils/ -> repo)
+ROOT_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+
+
+@lru_cache(maxsize=None)
+def load_config(name="paths"):
+    config_path = os.path.join(ROOT_DIR, "configs", f"{name}.yaml")
+    with open(config_path, "r") as file:
+        return yaml.safe_load(file)
+
+
+def correct_path(path_type, name):
+    path = load_config("paths")[path_type][name]
+    full_path = os.path.join(ROOT_DIR, path.replace("\\", "/"))
+    return os.path.normpath(full_path)
@@ -0,0 +1,217 @@
+"""Typed binary cache for the Dashboard dataset.
+
+The cleaned CSV is parsed once into one .npy file per column (strings as
+categorical codes, floats as float32, year/month/day as int16) plus a JSON
+manifest. Rows are stored sorted by (Location, year) so RowIndex can answer a
+sidebar selection with contiguous slices. Later loads memory-map only the
+requested columns, and the CSV is only re-parsed when its size/mtime change and
+its content hash differs.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from utils.config import correct_path
+from utils.metrics import timed
+
+
+# Columns the Dashboard's charts and filters use
+DASHBOARD_COLUMNS = [
+    'Location', 'year', 'month', 'Rainfall', 'MaxTemp', 'MinTemp', 'Sunshine',
+    'Humidity3pm', 'Latitude', 'Longitude', 'WindGustSpeed', 'WindGustDir',
+    'WindDir3pm', 'RainTomorrow'
+]
+
+INT16_COLS = ['year', 'month', 'day']
+SORT_COLS = ['Location', 'year']
+
+# Bump when the on-disk layout changes so older caches are rebuilt
+CACHE_VERSION = 2
+
+
+def file_hash(path, chunk_size=1 << 20):
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def source_signature(path):
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def compact_column(name, values):
+    """Return (array, manifest entry) for one column in its compact dtype."""
+    if name == 'Date':
+        dates = pd.to_datetime(values)
+        return dates.to_numpy(dtype='datetime64[ns]'), {"kind": "datetime"}
+    if name in INT16_COLS and pd.api.types.is_numeric_dtype(values) and values.notna().all():
+        return values.to_numpy(dtype=np.int16), {"kind": "numeric"}
+    if pd.api.types.is_float_dtype(values):
+        return values.to_numpy(dtype=np.float32), {"kind": "numeric"}
+    if pd.api.types.is_numeric_dtype(values) or pd.api.types.is_bool_dtype(values):
+        return values.to_numpy(), {"kind": "numeric"}
+    categorical = pd.Categorical(values)
+    codes = categorical.codes  # int8 for up to 127 categories
+    return codes, {"kind": "category", "categories": [str(c) for c in categorical.categories]}
+
+
+def build_cache(csv_path, cache_dir, digest=None):
+    """Parse the CSV and write the column files and manifest into cache_dir."""
+    df = pd.read_csv(csv_path)
+    sort_cols = [col for col in SORT_COLS if col in df.columns]
+    if sort_cols:
+        df = df.sort_values(sort_cols, kind="stable", ignore_index=True)
+    parent = os.path.dirname(os.path.abspath(cache_dir))
+    os.makedirs(parent, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(dir=parent, prefix=".tmp-")
+
+    columns = {}
+    for name in df.columns:
+        array, entry = compact_column(name, df[name])
+        np.save(os.path.join(tmp_dir, f"{len(columns)}.npy"), array)
+        columns[name] = {**entry, "file": f"{len(columns)}.npy"}
+
+    manifest = {
+        "version": CACHE_VERSION,
+        "source": source_signature(csv_path),
+        "sha1": digest or file_hash(csv_path),
+        "rows": len(df),
+        "columns": columns,
+    }
+    write_manifest(tmp_dir, manifest)
+
+    # Swap the new cache in; readers holding the old mmaps keep working
+    old_dir = None
+    if os.path.isdir(cache_dir):
+        old_dir = tempfile.mkdtemp(dir=parent, prefix=".old-")
+        os.rename(cache_dir, os.path.join(old_dir, "cache"))
+    os.rename(tmp_dir, cache_dir)
+    if old_dir:
+        shutil.rmtree(old_dir, ignore_errors=True)
+    return manifest
+
+
+def read_manifest(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, "manifest.json")) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_manifest(cache_dir, manifest):
+    tmp_path = os.path.join(cache_dir, "manifest.json.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, os.path.join(cache_dir, "manifest.json"))
+
+
+def ensure_cache(csv_path, cache_dir):
+    """Return an up-to-date manifest, re-parsing the CSV only if its content changed."""
+    manifest = read_manifest(cache_dir)
+    if manifest and manifest.get("version") != CACHE_VERSION:
+        manifest = None
+    signature = source_signature(csv_path)
+    if manifest and manifest["source"] == signature:
+        return manifest
+
+    # Touched but possibly unchanged: compare content before paying for a parse
+    digest = file_hash(csv_path)
+    if manifest and manifest["sha1"] == digest:
+        manifest["source"] = signature
+        write_manifest(cache_dir, manifest)
+        return manifest
+    return build_cache(csv_path, cache_dir, digest)
+
+
+def load_columns(cache_dir, manifest, columns=None):
+    columns = list(manifest["columns"]) if columns is None else columns
+    data = {}
+    for name in columns:
+        entry = manifest["columns"][name]
+        array = np.load(os.path.join(cache_dir, entry["file"]), mmap_mode="r")
+        if entry["kind"] == "category":
+            data[name] = pd.Categorical.from_codes(array, entry["categories"])
+        else:
+            data[name] = array
+    return pd.DataFrame(data)
+
+
+@timed("dashboard_data.load")
+def load_dashboard_data(columns=None, csv_path=None, cache_dir=None):
+    """Load the Dashboard dataset from the typed cache with only the given columns."""
+    csv_path = csv_path or correct_path("data_paths", "cleaned_dashboard_data")
+    cache_dir = cache_dir or correct_path("dirs", "dashboard_cache")
+    manifest = ensure_cache(csv_path, cache_dir)
+    if columns is not None:
+        columns = [col for col in columns if col in manifest["columns"]]
+    return load_columns(cache_dir, manifest, columns)
+
+
+class RowIndex:
+    """Row offsets of a frame sorted by (Location, year).
+
+    offsets[i, k] is the first row of locations[i] with year >= years[k], so the
+    rows for a location and year range are one contiguous slice.
+    """
+
+    def __init__(self, df):
+        location = pd.Categorical(df['Location'])
+        codes = location.codes.astype(np.int64)
+        year = df['year'].to_numpy().astype(np.int64)
+        first_year = int(year.min()) if len(year) else 0
+        span = int(year.max()) - first_year + 2 if len(year) else 1
+        key = codes * span + (year - first_year)
+        if np.any(np.diff(key) < 0):
+            raise ValueError("RowIndex needs rows sorted by (Location, year)")
+
+        # Option lists for the sidebar, computed once
+        present = np.unique(codes)
+        self.locations = [location.categories[code] for code in present]
+        self.years = [int(y) for y in np.unique(year)]
+
+        self.first_year = first_year
+        self.row = {loc: i for i, loc in enumerate(location.categories)}
+        grid = np.arange(len(location.categories))[:, None] * span + np.arange(span)[None, :]
+        self.offsets = np.searchsorted(key, grid, side="left")
+
+    def slices(self, locations, year_range):
+        """Non-empty row slices for the selected locations and inclusive year range."""
+        span = self.offsets.shape[1]
+        k0 = min(max(int(year_range[0]) - self.first_year, 0), span - 1)
+        k1 = min(max(int(year_range[1]) - self.first_year + 1, 0), span - 1)
+        result = []
+        for loc in locations:
+            i = self.row.get(loc)
+            if i is None:
+                continue
+            start, stop = self.offsets[i, k0], self.offsets[i, k1]
+            if stop > start:
+                result.append(slice(int(start), int(stop)))
+        return sorted(result, key=lambda s: s.start)
+
+    def count(self, locations, year_range):
+        return sum(s.stop - s.start for s in self.slices(locations, year_range))
+
+    def present(self, locations, year_range):
+        """Selected locations that have rows in the year range, in sorted order."""
+        selected = set(locations)
+        return [loc for loc in self.locations
+                if loc in selected and self.slices([loc], year_range)]
+
+    def select(self, df, locations, year_range):
+        """Rows for the selection; a single slice is returned as a view, not a copy."""
+        slices = self.slices(locations, year_range)
+        if not slices:
+            return df.iloc[0:0]
+        if len(slices) == 1:
+            return df.iloc[slices[0]]
+        return pd.concat([df.iloc[s] for s in slices], ignore_index=True)
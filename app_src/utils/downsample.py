@@ -0,0 +1,84 @@
+"""Server-side reduction of scatter plots before they are sent to the browser.
+
+density_grid() collapses points onto a fixed 2-D grid (one marker per occupied
+cell, with its count), and binned_lowess() fits the trendline on per-bin means.
+Both outputs are bounded by the grid size, not by the number of rows.
+"""
+import numpy as np
+import pandas as pd
+
+from utils.metrics import timed
+
+
+CELL = 0.5  # grid step, in the units of the plotted columns
+
+
+def valid_xy(df, x, y):
+    xs = df[x].to_numpy(dtype=np.float64, na_value=np.nan)
+    ys = df[y].to_numpy(dtype=np.float64, na_value=np.nan)
+    ok = ~(np.isnan(xs) | np.isnan(ys))
+    return xs[ok], ys[ok]
+
+
+def density_grid(df, x, y, cell=CELL, max_points=None):
+    """One row per occupied (x, y) grid cell: the mean point and how many rows it holds.
+
+    With max_points the cell size is doubled until at most that many cells are occupied.
+    """
+    xs, ys = valid_xy(df, x, y)
+    if not len(xs):
+        return pd.DataFrame(columns=[x, y, 'count'])
+    while True:
+        ix = np.floor(xs / cell).astype(np.int64)
+        iy = np.floor(ys / cell).astype(np.int64)
+        key = (ix - ix.min()) * (iy.max() - iy.min() + 1) + (iy - iy.min())
+        _, inverse, counts = np.unique(key, return_inverse=True, return_counts=True)
+        if max_points is None or len(counts) <= max_points:
+            break
+        cell *= 2
+    return pd.DataFrame({
+        x: np.bincount(inverse, weights=xs) / counts,
+        y: np.bincount(inverse, weights=ys) / counts,
+        'count': counts,
+    })
+
+
+def binned_lowess(df, x, y, cell=CELL, frac=2 / 3):
+    """LOWESS trendline of y on x fitted to per-bin means of x (bins of width cell)."""
+    from statsmodels.nonparametric.smoothers_lowess import lowess
+
+    xs, ys = valid_xy(df, x, y)
+    if len(xs) < 2:
+        return pd.DataFrame(columns=[x, y])
+    ix = np.floor(xs / cell).astype(np.int64)
+    _, inverse, counts = np.unique(ix, return_inverse=True, return_counts=True)
+    bx = np.bincount(inverse, weights=xs) / counts
+    by = np.bincount(inverse, weights=ys) / counts
+    if len(bx) < 3:
+        return pd.DataFrame({x: bx, y: by})
+    fit = lowess(by, bx, frac=frac)
+    return pd.DataFrame({x: fit[:, 0], y: fit[:, 1]})
+
+
+@timed("downsample.scatter_layers")
+def scatter_layers(frame, x, y, raw_points, by='Location'):
+    """Scatter points and LOWESS trendlines per group of frame.
+
+    Returns (points, trends, binned). Up to raw_points rows are plotted as is
+    (count 1). Beyond that, each group gets an equal share of raw_points as
+    density_grid() markers.
+    """
+    groups = frame.groupby(by, observed=True)
+    binned = len(frame) > raw_points
+    budget = max(raw_points // max(groups.ngroups, 1), 50)
+    points, trends = [], []
+    for key, rows in groups:
+        if binned:
+            pts = density_grid(rows, x, y, max_points=budget)
+        else:
+            pts = rows[[x, y]].dropna().assign(count=1)
+        points.append(pts.assign(**{by: key}))
+        trends.append(binned_lowess(rows, x, y).assign(**{by: key}))
+    points = pd.concat(points, ignore_index=True) if points else pd.DataFrame(columns=[x, y, 'count', by])
+    trends = pd.concat(trends, ignore_index=True) if trends else pd.DataFrame(columns=[x, y, by])
+    return points, trends, binned
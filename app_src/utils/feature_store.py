@@ -0,0 +1,195 @@
+"""Station-day feature store.
+
+Prepared feature rows are kept as memory-mapped NumPy columns partitioned by
+station and year:
+
+    <root>/<Location>/<year>/<column>.npy
+
+Every partition has one fixed slot per day of the year, so finding a
+(Location, date) row is an index computation rather than a search, and readers
+only map the columns and partitions they ask for.
+
+Only days BoM has finalised (bom.day_is_final) are stored: a stored row is
+served without refetching, so a provisional one would never be replaced.
+"""
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from utils.bom import final_before
+from utils.config import correct_path
+from utils.features import CATEGORIES, ENGINEERED_COLS, FEATURE_COLS, NUMERIC_COLS, SCHEMA
+from utils.metrics import timed
+
+
+SLOTS = 366
+MAX_OPEN_PARTITIONS = 4  # partitions kept mapped; each map holds a file descriptor per column
+
+# Stored columns; categoricals are kept as schema codes (-1 = missing)
+STORE_DTYPES = {
+    **{col: np.float32 for col in NUMERIC_COLS + ENGINEERED_COLS},
+    'RainToday': np.int8,
+    **{col: np.int8 for col in CATEGORIES if col != 'Location'},
+    'present': np.bool_,
+}
+
+FILL_VALUES = {np.float32: np.nan, np.int8: -1, np.bool_: False}
+
+
+def slot_of(dates):
+    # Zero-based day of year
+    return pd.DatetimeIndex(dates).dayofyear.to_numpy() - 1
+
+
+class FeatureStore:
+
+    def __init__(self, root=None):
+        self.root = root or correct_path("dirs", "feature_store")
+        self._maps = OrderedDict()  # (location, year) -> {column: memmap}, least recently used first
+        self._lock = threading.Lock()
+
+    def partition_dir(self, location, year):
+        return os.path.join(self.root, location, str(int(year)))
+
+    def partitions(self):
+        """(location, year) pairs present on disk."""
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(
+            (location, int(year))
+            for location in os.listdir(self.root)
+            if os.path.isdir(os.path.join(self.root, location))
+            for year in os.listdir(os.path.join(self.root, location))
+            if year.isdigit()
+        )
+
+    def _create_partition(self, location, year):
+        # Build in a temp dir and rename, so readers never see a half-made partition
+        final_dir = self.partition_dir(location, year)
+        os.makedirs(os.path.dirname(final_dir), exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(dir=os.path.dirname(final_dir), prefix=".tmp-")
+        for col, dtype in STORE_DTYPES.items():
+            column = np.lib.format.open_memmap(
+                os.path.join(tmp_dir, f"{col}.npy"), mode="w+", dtype=dtype, shape=(SLOTS,))
+            column[:] = FILL_VALUES[dtype]
+            column.flush()
+            del column
+        try:
+            os.rename(tmp_dir, final_dir)
+        except OSError:
+            shutil.rmtree(tmp_dir)  # another writer created it first
+
+    def _column(self, location, year, col, mode="r"):
+        if mode != "r":
+            return np.load(os.path.join(self.partition_dir(location, year), f"{col}.npy"), mmap_mode=mode)
+        key = (location, int(year))
+        with self._lock:
+            columns = self._maps.get(key)
+            if columns is None:
+                columns = self._maps[key] = {}
+                while len(self._maps) > MAX_OPEN_PARTITIONS:
+                    # Unmapping closes the partition's files; readers index copies out of the maps
+                    self._maps.popitem(last=False)
+            else:
+                self._maps.move_to_end(key)
+            if col not in columns:
+                path = os.path.join(self.partition_dir(location, year), f"{col}.npy")
+                columns[col] = np.load(path, mmap_mode="r")
+            return columns[col]
+
+    @timed("feature_store.append")
+    def append(self, df):
+        """Write rows from prepare_data() (Date + FEATURE_COLS), overwriting existing days.
+
+        Rows for days that are not final yet are skipped.
+        """
+        df = df[df['Date'] < pd.Timestamp(final_before())]
+        if df.empty:
+            return
+        years = df['Date'].dt.year
+        for (location, year), rows in df.groupby([df['Location'].astype(str), years], observed=True):
+            if not os.path.isdir(self.partition_dir(location, year)):
+                self._create_partition(location, year)
+            idx = slot_of(rows['Date'])
+            for col in STORE_DTYPES:
+                if col == 'present':
+                    continue
+                values = rows[col].cat.codes if col in CATEGORIES else rows[col]
+                column = self._column(location, year, col, mode="r+")
+                column[idx] = values.to_numpy(dtype=STORE_DTYPES[col])
+                column.flush()
+            # Mark rows present last so readers never pick up a partly written row
+            present = self._column(location, year, 'present', mode="r+")
+            present[idx] = True
+            present.flush()
+
+    def _frame(self, location, year, idx, columns):
+        dates = pd.Timestamp(year=int(year), month=1, day=1) + pd.to_timedelta(idx, unit="D")
+        data = {'Date': dates}
+        for col in columns:
+            if col == 'Location':
+                codes = np.full(len(idx), CATEGORIES['Location'].index(location), dtype=np.int8)
+                data[col] = pd.Categorical.from_codes(codes, SCHEMA[col].categories)
+            elif col in ('day', 'month', 'year'):
+                data[col] = getattr(dates, col).to_numpy(dtype=np.int16)
+            elif col in CATEGORIES:
+                data[col] = pd.Categorical.from_codes(
+                    self._column(location, year, col)[idx], SCHEMA[col].categories)
+            else:
+                data[col] = self._column(location, year, col)[idx]
+        return pd.DataFrame(data)
+
+    @timed("feature_store.lookup")
+    def lookup(self, location, date):
+        """Feature row for (location, date) as a one-row frame, or None if not stored."""
+        date = pd.Timestamp(date)
+        if location not in CATEGORIES['Location'] or not os.path.isdir(self.partition_dir(location, date.year)):
+            return None
+        idx = slot_of([date])
+        if not self._column(location, date.year, 'present')[idx[0]]:
+            return None
+        return self._frame(location, date.year, idx, FEATURE_COLS)
+
+    def vector(self, location, date):
+        """Model input row for (location, date) as in feature_matrix(), or None if not stored.
+
+        Reads the memory-mapped columns directly, without building a DataFrame.
+        """
+        date = pd.Timestamp(date)
+        if location not in CATEGORIES['Location'] or not os.path.isdir(self.partition_dir(location, date.year)):
+            return None
+        idx = date.dayofyear - 1
+        if not self._column(location, date.year, 'present')[idx]:
+            return None
+        x = np.empty(len(FEATURE_COLS), dtype=np.float32)
+        for i, col in enumerate(FEATURE_COLS):
+            if col == 'Location':
+                x[i] = CATEGORIES['Location'].index(location)
+            elif col in ('day', 'month', 'year'):
+                x[i] = getattr(date, col)
+            else:
+                x[i] = self._column(location, date.year, col)[idx]
+                if col in CATEGORIES and x[i] < 0:
+                    x[i] = np.nan
+        return x
+
+    def load(self, locations=None, years=None, columns=None):
+        """All stored rows for the given locations/years, with only the requested columns."""
+        columns = FEATURE_COLS if columns is None else columns
+        frames = []
+        for location, year in self.partitions():
+            if locations is not None and location not in locations:
+                continue
+            if years is not None and year not in years:
+                continue
+            idx = np.flatnonzero(self._column(location, year, 'present'))
+            if len(idx):
+                frames.append(self._frame(location, year, idx, columns))
+        if not frames:
+            return pd.DataFrame(columns=['Date'] + list(columns))
+        return pd.concat(frames, ignore_index=True)
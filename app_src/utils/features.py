@@ -0,0 +1,190 @@
+"""Feature schema and engineered features shared by training and serving.
+
+The notebooks and the app both build model inputs through this module, so the
+derived columns and the categorical codes are identical in both places.
+"""
+import numpy as np
+import pandas as pd
+
+from utils.metrics import timed
+
+
+# Categories seen in training (weatherAUS), in the sorted order pandas gave them
+LOCATIONS = ['Adelaide', 'Albany', 'Albury', 'AliceSprings', 'BadgerysCreek', 'Ballarat',
+             'Bendigo', 'Brisbane', 'Cairns', 'Canberra', 'Cobar', 'CoffsHarbour', 'Dartmoor',
+             'Darwin', 'GoldCoast', 'Hobart', 'Katherine', 'Launceston', 'Melbourne',
+             'MelbourneAirport', 'Mildura', 'Moree', 'MountGambier', 'MountGinini', 'Newcastle',
+             'Nhil', 'NorahHead', 'NorfolkIsland', 'Nuriootpa', 'PearceRAAF', 'Penrith', 'Perth',
+             'PerthAirport', 'Portland', 'Richmond', 'Sale', 'SalmonGums', 'Sydney',
+             'SydneyAirport', 'Townsville', 'Tuggeranong', 'Uluru', 'WaggaWagga', 'Walpole',
+             'Watsonia', 'Williamtown', 'Witchcliffe', 'Wollongong', 'Woomera']
+
+DIRECTIONS = ['E', 'ENE', 'ESE', 'N', 'NE', 'NNE', 'NNW', 'NW',
+              'S', 'SE', 'SSE', 'SSW', 'SW', 'W', 'WNW', 'WSW']
+
+CATEGORIES = {
+    'Location': LOCATIONS,
+    'WindGustDir': DIRECTIONS,
+    'WindDir9am': DIRECTIONS,
+    'WindDir3pm': DIRECTIONS,
+}
+
+# Measured columns, stacked into one float32 block
+NUMERIC_COLS = ['MinTemp', 'MaxTemp', 'Rainfall', 'Evaporation', 'Sunshine',
+                'WindGustSpeed', 'WindSpeed9am', 'WindSpeed3pm', 'Humidity9am',
+                'Humidity3pm', 'Pressure9am', 'Pressure3pm', 'Cloud9am',
+                'Cloud3pm', 'Temp9am', 'Temp3pm']
+
+ENGINEERED_COLS = ['TempDiff', 'WindSpeedAvg', 'HumidityDiff', 'PressureDiff',
+                   'CloudCoverAvg', 'WindGustDiff']
+
+# Model input columns, in training order
+FEATURE_COLS = ['Location', 'MinTemp', 'MaxTemp', 'Rainfall', 'Evaporation',
+                'Sunshine', 'WindGustDir', 'WindGustSpeed', 'WindDir9am', 'WindDir3pm',
+                'WindSpeed9am', 'WindSpeed3pm', 'Humidity9am', 'Humidity3pm',
+                'Pressure9am', 'Pressure3pm', 'Cloud9am', 'Cloud3pm', 'Temp9am',
+                'Temp3pm', 'RainToday', 'day', 'month', 'year', 'TempDiff',
+                'WindSpeedAvg', 'HumidityDiff', 'PressureDiff', 'CloudCoverAvg',
+                'WindGustDiff']
+
+SCHEMA = {
+    **{col: pd.CategoricalDtype(cats) for col, cats in CATEGORIES.items()},
+    **{col: 'float32' for col in NUMERIC_COLS + ENGINEERED_COLS},
+    'RainToday': 'int8',
+    'day': 'int16',
+    'month': 'int16',
+    'year': 'int16',
+}
+
+
+def numeric_block(df, cols=NUMERIC_COLS):
+    # One C-contiguous row per column, so every column op runs over contiguous memory
+    block = np.empty((len(cols), len(df)), dtype=np.float32)
+    for i, col in enumerate(cols):
+        block[i] = df[col].to_numpy(dtype=np.float32, na_value=np.nan)
+    return block
+
+
+def nanmean2(a, b):
+    # Row mean of two columns ignoring NaN, like DataFrame.mean(axis=1)
+    return np.where(np.isnan(a), b, np.where(np.isnan(b), a, (a + b) * np.float32(0.5)))
+
+
+def engineer(block):
+    """Compute ENGINEERED_COLS and RainToday from a numeric_block()."""
+    c = dict(zip(NUMERIC_COLS, block))
+    out = np.empty((len(ENGINEERED_COLS), block.shape[1]), dtype=np.float32)
+    np.subtract(c['MaxTemp'], c['MinTemp'], out=out[0])
+    out[1] = nanmean2(c['WindSpeed9am'], c['WindSpeed3pm'])
+    np.subtract(c['Humidity3pm'], c['Humidity9am'], out=out[2])
+    np.subtract(c['Pressure3pm'], c['Pressure9am'], out=out[3])
+    out[4] = nanmean2(c['Cloud9am'], c['Cloud3pm'])
+    np.subtract(c['WindGustSpeed'], out[1], out=out[5])
+    rain_today = (c['Rainfall'] > 0).astype(np.int8)  # NaN rainfall counts as no rain
+    return out, rain_today
+
+
+def add_features(df):
+    """Return a copy of df with the engineered columns added (used by the notebooks)."""
+    out, rain_today = engineer(numeric_block(df))
+    return df.assign(RainToday=rain_today, **dict(zip(ENGINEERED_COLS, out)))
+
+
+@timed("features.build")
+def build_features(raw):
+    """Build the model input frame from raw observations.
+
+    raw needs a datetime 'Date' column, 'Location', the wind direction columns
+    and NUMERIC_COLS. The result has 'Date' followed by FEATURE_COLS in SCHEMA dtypes.
+    """
+    block = numeric_block(raw)
+    out, rain_today = engineer(block)
+    dates = pd.DatetimeIndex(raw['Date'])
+
+    columns = dict(zip(NUMERIC_COLS, block))
+    columns.update(zip(ENGINEERED_COLS, out))
+    columns['RainToday'] = rain_today
+    columns['day'] = dates.day.to_numpy(dtype=np.int16)
+    columns['month'] = dates.month.to_numpy(dtype=np.int16)
+    columns['year'] = dates.year.to_numpy(dtype=np.int16)
+    for col, cats in CATEGORIES.items():
+        columns[col] = pd.Categorical(raw[col], categories=cats)
+
+    return pd.DataFrame({'Date': dates, **{col: columns[col] for col in FEATURE_COLS}})
+
+
+# Multi-day context over calendar days (not model inputs: the model was trained without them)
+WINDOW_DAYS = (3, 7)
+WINDOW_COLS = [name for days in WINDOW_DAYS for name in (f'Rainfall{days}d', f'Pressure3pmChange{days}d')]
+
+
+def window_features(df):
+    """Rainfall totals and 3pm pressure changes over the last 3 and 7 days.
+
+    Windows are taken over calendar dates per Location, not over rows, so a
+    missing BoM row never shifts a window: a total needs every day in its
+    window and a change needs the day it compares with, or it is NaN (as for
+    the first days of a fetched month). Returns Location, Date and WINDOW_COLS.
+    """
+    frame = (df[['Location', 'Date', 'Rainfall', 'Pressure3pm']]
+             .drop_duplicates(['Location', 'Date'])
+             .sort_values(['Location', 'Date'], ignore_index=True))
+    by_location = frame.set_index('Date').groupby('Location', observed=True, sort=False)
+    out = frame[['Location', 'Date']].copy()
+    for days in WINDOW_DAYS:
+        # Groups come out in frame order, so the results line up with it
+        window = by_location['Rainfall'].rolling(f'{days}D')
+        total, observed = window.sum().to_numpy(), window.count().to_numpy()
+        out[f'Rainfall{days}d'] = np.where(observed == days, total, np.nan).astype(np.float32)
+        earlier = frame[['Location', 'Date', 'Pressure3pm']].assign(Date=frame['Date'] + pd.Timedelta(days=days))
+        before = out[['Location', 'Date']].merge(earlier, on=['Location', 'Date'], how='left')['Pressure3pm']
+        out[f'Pressure3pmChange{days}d'] = (frame['Pressure3pm'] - before.to_numpy()).astype(np.float32)
+    return out[['Location', 'Date'] + WINDOW_COLS]
+
+
+def apply_schema(df):
+    """Select FEATURE_COLS and cast them to SCHEMA (unknown categories become NaN)."""
+    return df[FEATURE_COLS].astype(SCHEMA)
+
+
+def decode_row(x):
+    """{column: value} for one feature_matrix() row, with category codes mapped back to names."""
+    row = {}
+    for col, value in zip(FEATURE_COLS, x):
+        if col in CATEGORIES:
+            row[col] = None if np.isnan(value) else CATEGORIES[col][int(value)]
+        elif SCHEMA[col] != 'float32':
+            row[col] = int(value)
+        else:
+            row[col] = float(value)
+    return row
+
+
+def matrix_frame(X):
+    """Inverse of feature_matrix(): a FEATURE_COLS frame in SCHEMA dtypes."""
+    columns = {}
+    for i, col in enumerate(FEATURE_COLS):
+        if col in CATEGORIES:
+            codes = np.where(np.isnan(X[:, i]), -1, X[:, i]).astype(np.int16)
+            columns[col] = pd.Categorical.from_codes(codes, dtype=SCHEMA[col])
+        else:
+            columns[col] = X[:, i].astype(SCHEMA[col])
+    return pd.DataFrame(columns)
+
+
+def feature_types():
+    # XGBoost feature types for feature_matrix() columns
+    return ['c' if col in CATEGORIES else 'float' if SCHEMA[col] == 'float32' else 'int'
+            for col in FEATURE_COLS]
+
+
+def feature_matrix(df):
+    """Dense float32 matrix of FEATURE_COLS, categoricals as schema codes (NaN if unknown)."""
+    X = np.empty((len(df), len(FEATURE_COLS)), dtype=np.float32)
+    for i, col in enumerate(FEATURE_COLS):
+        if col in CATEGORIES:
+            codes = pd.Categorical(df[col], categories=CATEGORIES[col]).codes
+            X[:, i] = np.where(codes < 0, np.nan, codes)
+        else:
+            X[:, i] = df[col].to_numpy(dtype=np.float32, na_value=np.nan)
+    return X
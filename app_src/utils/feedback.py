@@ -0,0 +1,100 @@
+"""User feedback store.
+
+Feedback is appended to a SQLite database in WAL mode: each submission is one
+atomic INSERT, concurrent sessions serialise on SQLite's write lock instead of
+interleaving bytes in a shared CSV, and readers never block writers. Queries
+return plain Python values, so neither path needs pandas.
+"""
+import csv
+import datetime
+import os
+import sqlite3
+import threading
+
+from utils.config import correct_path
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS feedback (
+    id INTEGER PRIMARY KEY,
+    timestamp TEXT NOT NULL,
+    rating INTEGER NOT NULL CHECK (rating BETWEEN 1 AND 5),
+    feedback TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS feedback_timestamp ON feedback (timestamp);
+CREATE TABLE IF NOT EXISTS imports (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL
+);
+"""
+
+
+class FeedbackStore:
+
+    def __init__(self, path=None):
+        self.path = path or correct_path("data_paths", "feedback_db_path")
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._local = threading.local()
+        self._connect().executescript(SCHEMA)
+
+    def _connect(self):
+        # One connection per thread; Streamlit runs each session on its own thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def add(self, feedback, rating, timestamp=None):
+        """Append one submission."""
+        self.add_many([(timestamp, rating, feedback)])
+
+    def add_many(self, rows):
+        """Append (timestamp, rating, feedback) rows in a single transaction."""
+        now = datetime.datetime.now().isoformat()
+        rows = [(timestamp or now, int(rating), feedback or "") for timestamp, rating, feedback in rows]
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany("INSERT INTO feedback (timestamp, rating, feedback) VALUES (?, ?, ?)", rows)
+
+    def count(self):
+        return self._connect().execute("SELECT COUNT(*) FROM feedback").fetchone()[0]
+
+    def rating_histogram(self):
+        """{rating: count} for ratings 1-5."""
+        counts = dict(self._connect().execute(
+            "SELECT rating, COUNT(*) FROM feedback GROUP BY rating").fetchall())
+        return {rating: counts.get(rating, 0) for rating in range(1, 6)}
+
+    def average_rating(self):
+        return self._connect().execute("SELECT AVG(rating) FROM feedback").fetchone()[0]
+
+    def recent(self, limit=10, with_text=True):
+        """Latest submissions as (timestamp, rating, feedback), newest first."""
+        where = "WHERE feedback != ''" if with_text else ""
+        return self._connect().execute(
+            f"SELECT timestamp, rating, feedback FROM feedback {where} "
+            "ORDER BY timestamp DESC, id DESC LIMIT ?", (limit,)).fetchall()
+
+    def import_csv(self, path):
+        """Copy a legacy user_feedback.csv into the store; each file is imported once."""
+        if not os.path.isfile(path):
+            return 0
+        with open(path, newline="", encoding="utf-8") as f:
+            rows = [(row.get("timestamp"), row["rating"], row.get("feedback"))
+                    for row in csv.DictReader(f) if row.get("rating")]
+        now = datetime.datetime.now().isoformat()
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            # Claimed under the write lock, so of several processes importing at once only one copies the rows
+            claimed = conn.execute("INSERT OR IGNORE INTO imports (path, mtime_ns) VALUES (?, ?)",
+                                   (path, os.stat(path).st_mtime_ns)).rowcount
+            if not claimed:
+                return 0
+            conn.executemany("INSERT INTO feedback (timestamp, rating, feedback) VALUES (?, ?, ?)",
+                             [(timestamp or now, int(rating), feedback or "") for timestamp, rating, feedback in rows])
+        return len(rows)
@@ -0,0 +1,95 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+MAX_WORKERS = 16        # concurrent downloads
+RATE_PER_HOST = 10.0    # requests per second per host (0 disables the limit)
+BURST_PER_HOST = 10
+RETRIES = 3
+BACKOFF = 0.5           # seconds, doubled on every retry
+
+
+class RateLimiter:
+    """Token bucket per host, shared by all worker threads."""
+
+    def __init__(self, rate=RATE_PER_HOST, burst=BURST_PER_HOST):
+        self.rate = rate
+        self.burst = burst
+        self._lock = threading.Lock()
+        self._buckets = {}
+
+    def wait(self, host):
+        if not self.rate:
+            return
+        with self._lock:
+            now = time.monotonic()
+            tokens, last = self._buckets.get(host, (self.burst, now))
+            # Take a token now; a negative balance is the wait owed
+            tokens = min(self.burst, tokens + (now - last) * self.rate) - 1
+            self._buckets[host] = (tokens, now)
+        if tokens < 0:
+            time.sleep(-tokens / self.rate)
+
+
+def make_session(pool_size=MAX_WORKERS, retries=RETRIES, backoff=BACKOFF):
+    # Keep-alive connection pool sized to the worker count, with retry/backoff
+    # on connection errors and transient server responses
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=["GET"],
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+class Fetcher:
+    """Pooled HTTP client that runs many downloads on a bounded thread pool."""
+
+    def __init__(self, max_workers=MAX_WORKERS, rate=RATE_PER_HOST, burst=BURST_PER_HOST,
+                 retries=RETRIES, backoff=BACKOFF):
+        self.max_workers = max_workers
+        self.session = make_session(max_workers, retries, backoff)
+        self.limiter = RateLimiter(rate, burst)
+
+    def get(self, url, **kwargs):
+        self.limiter.wait(urlsplit(url).netloc)
+        return self.session.get(url, **kwargs)
+
+    def map(self, fn, items):
+        """Run fn(item) concurrently; returns {item: result or exception}."""
+        items = list(items)
+
+        def call(item):
+            try:
+                return fn(item)
+            except Exception as e:
+                return e
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            return dict(zip(items, pool.map(call, items)))
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def default_fetcher():
+    # One process-wide fetcher so every session shares the connection pool
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = Fetcher()
+        return _default
@@ -0,0 +1,57 @@
+"""Process-wide LRU cache of built Plotly figures.
+
+Figures are keyed on (chart, locations, year_range) and evicted least recently
+used first once their combined serialized size exceeds the memory cap, so the
+common filter combinations are served pre-built to every session. Builds are
+timed per chart as the figure.<chart> stage.
+"""
+import threading
+from collections import OrderedDict
+
+from utils.metrics import span
+
+
+MAX_BYTES = 64 * 1024 * 1024
+
+
+class FigureCache:
+
+    def __init__(self, max_bytes=MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._figures = OrderedDict()  # key -> (figure, size)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._figures)
+
+    def get(self, key, build):
+        """Return the cached figure for key, calling build() to make it on a miss."""
+        with self._lock:
+            if key in self._figures:
+                self._figures.move_to_end(key)
+                self.hits += 1
+                return self._figures[key][0]
+            self.misses += 1
+
+        # Build outside the lock so other sessions are not blocked
+        with span(f"figure.{key[0]}"):
+            figure = build()
+            size = len(figure.to_json())
+        with self._lock:
+            if key in self._figures:
+                self.bytes -= self._figures.pop(key)[1]
+            if size <= self.max_bytes:
+                self._figures[key] = (figure, size)
+                self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, evicted) = self._figures.popitem(last=False)
+                self.bytes -= evicted
+        return figure
+
+    def clear(self):
+        with self._lock:
+            self._figures.clear()
+            self.bytes = 0
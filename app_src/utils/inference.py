@@ -0,0 +1,167 @@
+"""Lean scoring backends for the XGBoost model.
+
+Both take the float32 matrix from features.feature_matrix() (categoricals as
+schema codes) and return sklearn-style (n, 2) probabilities.
+"""
+import json
+import os
+
+import numpy as np
+import xgboost as xgb
+
+from utils.features import FEATURE_COLS, feature_matrix
+
+
+def as_booster(model):
+    # Copy the bare booster out of the sklearn wrapper
+    booster = model.get_booster() if hasattr(model, "get_booster") else model
+    return xgb.Booster(model_file=bytearray(booster.save_raw("ubj")))
+
+
+def to_proba(p):
+    return np.column_stack([1 - p, p])
+
+
+class NativeBackend:
+    """XGBoost booster scored with inplace_predict (bit-identical to the pickle)."""
+
+    def __init__(self, model, nthread=1):
+        self.booster = as_booster(model)
+        # One thread avoids OpenMP start-up cost on single rows
+        if nthread:
+            self.booster.set_param({"nthread": nthread})
+
+    def predict_proba(self, X):
+        return to_proba(self.booster.inplace_predict(X, validate_features=False))
+
+
+class CompiledBackend:
+    """Tree ensemble flattened into NumPy arrays; no xgboost needed at scoring time.
+
+    All trees are walked together one level per step. Margins are identical to
+    XGBoost; probabilities can differ by one float32 ulp because NumPy's exp
+    is not libm's expf. save() writes the arrays as .npy files that load() can
+    memory-map, so several processes share one copy.
+    """
+
+    ARRAYS = ("roots", "left", "right", "feature", "threshold", "default_left", "leaf_value", "is_cat", "cat_right")
+
+    def __init__(self, model):
+        learner = json.loads(as_booster(model).save_raw("json"))["learner"]
+        objective = learner["objective"]["name"]
+        if objective != "binary:logistic":
+            raise ValueError(f"Unsupported objective: {objective}")
+
+        base_score = np.float32(learner["learner_model_param"]["base_score"].strip("[]"))
+        self.base_margin = -np.log(np.float32(1) / base_score - np.float32(1))
+
+        trees = learner["gradient_booster"]["model"]["trees"]
+        sizes = [len(tree["left_children"]) for tree in trees]
+        offsets = np.concatenate([[0], np.cumsum(sizes)])
+        n_nodes = offsets[-1]
+        n_cats = 1 + max((max(tree["categories"]) for tree in trees if tree["categories"]), default=0)
+
+        self.roots = offsets[:-1].astype(np.int32)
+        self.left = np.empty(n_nodes, dtype=np.int32)
+        self.right = np.empty(n_nodes, dtype=np.int32)
+        self.feature = np.empty(n_nodes, dtype=np.int32)
+        self.threshold = np.empty(n_nodes, dtype=np.float32)
+        self.default_left = np.empty(n_nodes, dtype=bool)
+        self.leaf_value = np.zeros(n_nodes, dtype=np.float32)
+        self.is_cat = np.zeros(n_nodes, dtype=bool)
+        self.cat_right = np.zeros((n_nodes, n_cats), dtype=bool)  # categories sent right
+        self.depth = 0
+
+        for tree, start, size in zip(trees, offsets, sizes):
+            nodes = slice(start, start + size)
+            left = np.asarray(tree["left_children"])
+            right = np.asarray(tree["right_children"])
+            condition = np.asarray(tree["split_conditions"], dtype=np.float32)
+            leaf = left == -1
+            ids = np.arange(size) + start
+            # Leaves point at themselves so extra steps are no-ops
+            self.left[nodes] = np.where(leaf, ids, left + start)
+            self.right[nodes] = np.where(leaf, ids, right + start)
+            self.feature[nodes] = np.where(leaf, 0, tree["split_indices"])
+            self.threshold[nodes] = condition
+            self.default_left[nodes] = np.asarray(tree["default_left"], dtype=bool)
+            self.leaf_value[nodes] = np.where(leaf, condition, 0)
+            for k, node in enumerate(tree["categories_nodes"]):
+                begin = tree["categories_segments"][k]
+                cats = tree["categories"][begin:begin + tree["categories_sizes"][k]]
+                self.is_cat[start + node] = True
+                self.cat_right[start + node, cats] = True
+
+            depth = np.zeros(size, dtype=np.int32)
+            for i in np.flatnonzero(~leaf):  # parents come before children
+                depth[left[i]] = depth[right[i]] = depth[i] + 1
+            self.depth = max(self.depth, int(depth.max()))
+
+    def save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        for name in self.ARRAYS:
+            np.save(os.path.join(directory, f"{name}.npy"), getattr(self, name))
+        with open(os.path.join(directory, "params.json"), "w") as f:
+            json.dump({"base_margin": float(self.base_margin), "depth": self.depth}, f)
+
+    @classmethod
+    def load(cls, directory, mmap_mode="r"):
+        backend = cls.__new__(cls)
+        for name in cls.ARRAYS:
+            setattr(backend, name, np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mmap_mode))
+        with open(os.path.join(directory, "params.json")) as f:
+            params = json.load(f)
+        backend.base_margin = np.float32(params["base_margin"])
+        backend.depth = params["depth"]
+        return backend
+
+    def predict_margin(self, X):
+        X = np.asarray(X, dtype=np.float32)
+        rows = np.arange(len(X))[:, None]
+        node = np.broadcast_to(self.roots, (len(X), len(self.roots))).copy()
+        max_cat = self.cat_right.shape[1] - 1
+        for _ in range(self.depth):
+            x = X[rows, self.feature[node]]
+            missing = np.isnan(x)
+            go_left = np.where(missing, self.default_left[node], x < self.threshold[node])
+            cat = self.is_cat[node] & ~missing
+            if cat.any():
+                code = np.clip(np.where(cat, x, 0), 0, max_cat).astype(np.intp)
+                go_left = np.where(cat, ~self.cat_right[node, code], go_left)
+            node = np.where(go_left, self.left[node], self.right[node])
+
+        # Accumulate trees in order, starting from the base margin, like XGBoost
+        leaves = np.concatenate(
+            [np.full((len(X), 1), self.base_margin, dtype=np.float32), self.leaf_value[node]], axis=1)
+        return np.cumsum(leaves, axis=1, dtype=np.float32)[:, -1]
+
+    def predict_proba(self, X):
+        margin = np.minimum(-self.predict_margin(X), np.float32(88.7))
+        p = np.float32(1) / (np.exp(margin.astype(np.float64)).astype(np.float32) + np.float32(1))
+        return to_proba(p)
+
+
+BACKENDS = {"native": NativeBackend, "compiled": CompiledBackend}
+
+# Largest |P(rain)| difference from the pickled model each backend may show
+PARITY_TOLERANCE = {"native": 0.0, "compiled": 1e-6}
+
+
+def load_backend(model, kind="native"):
+    return BACKENDS[kind](model)
+
+
+def parity_error(model, backend, df):
+    """Largest |P(rain)| difference between the pickled model and a backend on df."""
+    expected = model.predict_proba(df[FEATURE_COLS])[:, 1]
+    actual = backend.predict_proba(feature_matrix(df))[:, 1]
+    return float(np.max(np.abs(expected - actual))) if len(df) else 0.0
+
+
+def check_parity(model, backend, df, kind):
+    """Raise ValueError if backend (of kind) disagrees with the pickled model on df."""
+    error = parity_error(model, backend, df)
+    if error > PARITY_TOLERANCE[kind]:
+        raise ValueError(f"{kind} backend differs from the model by {error:.3g} "
+                         f"(tolerance {PARITY_TOLERANCE[kind]:g}) on {len(df)} rows")
+    return error
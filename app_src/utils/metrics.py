@@ -0,0 +1,251 @@
+"""Per-stage timings and cache counters for the Streamlit pages.
+
+Off unless the RAIN_METRICS environment variable is set when the app starts:
+
+    RAIN_METRICS=prometheus   serve the Prometheus text format on
+                              http://127.0.0.1:$RAIN_METRICS_PORT/metrics (default 9464)
+    RAIN_METRICS=log          write one JSON line per span and cache call to
+                              $RAIN_METRICS_LOG (default: stderr)
+    RAIN_METRICS=prometheus,log
+
+Stages are timed with span() blocks in the pages or timed() on utility
+functions, and count() adds up the rows a stage handled. The
+st.cache_data/st.cache_resource functions are decorated with cached() to
+count hits and misses. Objects that already count their own hits and misses
+(FigureCache, ResultCache) are exported with watch(). Every page calls
+start_exporter() first.
+
+When disabled, timed() and cached() return the function unchanged and span()
+returns a shared no-op context manager, so nothing is measured or stored.
+"""
+import bisect
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+MODES = {mode.strip() for mode in os.environ.get("RAIN_METRICS", "").lower().split(",")} - {"", "off", "0"}
+ENABLED = bool(MODES)
+PORT = int(os.environ.get("RAIN_METRICS_PORT", 9464))
+
+# Histogram buckets in seconds, from an in-memory lookup to a slow BoM download
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+logger = logging.getLogger("rain.metrics")
+
+_lock = threading.Lock()
+_stages = {}    # stage -> [bucket counts..., +Inf count, sum of seconds, errors]
+_calls = {}     # cached function -> calls
+_misses = {}    # cached function -> calls that ran the function
+_rows = {}      # stage -> rows handled
+_watched = {}   # cache name -> object with hits and misses
+_local = threading.local()
+_started = threading.Event()
+
+
+def record(stage, seconds, error=None):
+    """Add one observation of stage to the histogram (and the log)."""
+    with _lock:
+        counts = _stages.get(stage)
+        if counts is None:
+            counts = _stages[stage] = [0] * (len(BUCKETS) + 3)
+        counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        counts[-2] += seconds
+        if error is not None:
+            counts[-1] += 1
+    if "log" in MODES:
+        logger.info(json.dumps({"ts": round(time.time(), 3), "type": "span", "stage": stage,
+                                "seconds": round(seconds, 6), "error": error}))
+
+
+def count(stage, rows):
+    """Add rows to the number of rows stage has handled."""
+    if not ENABLED:
+        return
+    with _lock:
+        _rows[stage] = _rows.get(stage, 0) + rows
+
+
+class Span:
+
+    __slots__ = ("stage", "started")
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        record(self.stage, time.perf_counter() - self.started, exc_type.__name__ if exc_type else None)
+        return False
+
+
+class _NoSpan:
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+def span(stage):
+    """Context manager timing the block as stage."""
+    return Span(stage) if ENABLED else _NO_SPAN
+
+
+def timed(stage):
+    """Decorator timing every call of the function as stage."""
+    def wrap(fn):
+        if not ENABLED:
+            return fn
+
+        @functools.wraps(fn)
+        def call(*args, **kwargs):
+            with Span(stage):
+                return fn(*args, **kwargs)
+        return call
+    return wrap
+
+
+def cached(cache):
+    """Apply a Streamlit cache decorator and count its hits and misses.
+
+        @cached(st.cache_resource)
+        def load_model(): ...
+
+    A miss is a call that ran the function body; everything else was served
+    from the cache.
+    """
+    def wrap(fn):
+        if not ENABLED:
+            return cache(fn)
+        name = fn.__name__
+
+        @functools.wraps(fn)
+        def run(*args, **kwargs):
+            result = fn(*args, **kwargs)
+            # Set after the body so a nested cached call cannot reset it
+            _local.missed = True
+            return result
+
+        cached_fn = cache(run)
+
+        @functools.wraps(fn)
+        def call(*args, **kwargs):
+            _local.missed = False
+            result = cached_fn(*args, **kwargs)
+            missed = _local.missed
+            with _lock:
+                _calls[name] = _calls.get(name, 0) + 1
+                if missed:
+                    _misses[name] = _misses.get(name, 0) + 1
+            if "log" in MODES:
+                logger.info(json.dumps({"ts": round(time.time(), 3), "type": "cache", "cache": name,
+                                        "result": "miss" if missed else "hit"}))
+            return result
+
+        call.clear = cached_fn.clear
+        return call
+    return wrap
+
+
+def watch(name, obj):
+    """Export obj.hits and obj.misses as the counters of cache name."""
+    if ENABLED:
+        with _lock:
+            _watched[name] = obj
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def render():
+    """Everything recorded so far in the Prometheus text format."""
+    with _lock:
+        stages = {stage: list(counts) for stage, counts in _stages.items()}
+        caches = {name: (_calls[name] - _misses.get(name, 0), _misses.get(name, 0)) for name in _calls}
+        rows = dict(_rows)
+        watched = dict(_watched)
+    for name, obj in watched.items():
+        caches[name] = (obj.hits, obj.misses)
+
+    lines = ["# HELP rain_stage_seconds Time spent in each pipeline stage.",
+             "# TYPE rain_stage_seconds histogram"]
+    for stage, counts in sorted(stages.items()):
+        label = f'stage="{_label(stage)}"'
+        total = 0
+        for bound, count in zip(BUCKETS + ("+Inf",), counts):
+            total += count
+            lines.append(f'rain_stage_seconds_bucket{{{label},le="{bound}"}} {total}')
+        lines.append(f"rain_stage_seconds_sum{{{label}}} {counts[-2]:.6f}")
+        lines.append(f"rain_stage_seconds_count{{{label}}} {total}")
+
+    lines += ["# HELP rain_stage_errors_total Stage calls that raised.",
+              "# TYPE rain_stage_errors_total counter"]
+    for stage, counts in sorted(stages.items()):
+        lines.append(f'rain_stage_errors_total{{stage="{_label(stage)}"}} {counts[-1]}')
+
+    lines += ["# HELP rain_stage_rows_total Rows handled by each stage.",
+              "# TYPE rain_stage_rows_total counter"]
+    for stage, total in sorted(rows.items()):
+        lines.append(f'rain_stage_rows_total{{stage="{_label(stage)}"}} {total}')
+
+    lines += ["# HELP rain_cache_requests_total Cache lookups by result.",
+              "# TYPE rain_cache_requests_total counter"]
+    for name, (hits, misses) in sorted(caches.items()):
+        lines.append(f'rain_cache_requests_total{{cache="{_label(name)}",result="hit"}} {hits}')
+        lines.append(f'rain_cache_requests_total{{cache="{_label(name)}",result="miss"}} {misses}')
+    return "\n".join(lines) + "\n"
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        data = render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_exporter(host="127.0.0.1", port=PORT):
+    """Start the exporter once per process; later calls (and disabled metrics) are no-ops."""
+    if not ENABLED or _started.is_set():
+        return
+    _started.set()
+    if "log" in MODES and not logger.handlers:
+        path = os.environ.get("RAIN_METRICS_LOG")
+        handler = logging.FileHandler(path) if path else logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    if "prometheus" in MODES:
+        try:
+            server = ThreadingHTTPServer((host, port), MetricsHandler)
+        except OSError as e:
+            # Another app process already serves the port; keep running without the endpoint
+            logging.getLogger(__name__).warning("Metrics endpoint not started on port %s: %s", port, e)
+            return
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name="metrics-exporter", daemon=True).start()
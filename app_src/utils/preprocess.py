@@ -0,0 +1,189 @@
+"""Chunked preprocessing of weatherAUS.csv into year partitions.
+
+The raw CSV is read chunk_rows rows at a time. Each chunk is cleaned,
+encoded with the fixed training categories and given the engineered features
+by features.build_features() (the same code that builds serving rows), then
+written out as one columnar part file per year it touches:
+
+    <out>/year=YYYY/part-NNNNN.npz   Date, FEATURE_COLS, RainTomorrow (0/1)
+
+Categorical columns are stored as their schema codes (-1 if unknown);
+read_part() and read_partitions() return frames in SCHEMA dtypes.
+
+Every step only looks at the rows of its own chunk, so peak memory depends on
+chunk_rows and not on the size of the input. The one exception is dropping
+repeated (Location, Date) rows: the keys already written are kept across
+chunks (8 bytes per row), so a repeat is dropped wherever it falls and the
+first occurrence is kept, as a one-shot drop_duplicates() would. With
+--append, repeats are only dropped within the appended file. Missing values are kept as NaN,
+as they are at serving time; XGBoost handles them natively. A full run
+builds the partitions in a temporary directory and swaps it in when it is
+done. --append adds the parts of another file (more stations or years) next
+to the existing ones.
+
+Run from app_src/:
+
+    python -m utils.preprocess
+    python -m utils.preprocess --raw /data/weatherAUS_2030.csv --append
+"""
+import argparse
+import datetime
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils.config import correct_path
+from utils.features import CATEGORIES, FEATURE_COLS, NUMERIC_COLS, SCHEMA, build_features
+
+
+CHUNK_ROWS = 50_000
+TARGET = "RainTomorrow"
+
+RAW_DTYPES = {
+    'Date': 'object',
+    **{col: 'object' for col in CATEGORIES},
+    **{col: 'float32' for col in NUMERIC_COLS},
+    TARGET: 'object',
+}
+
+
+def label_vector(values):
+    # The target as 0/1; raw and older processed files hold 'No'/'Yes'
+    return values.replace({"No": 0, "Yes": 1}).to_numpy(dtype=np.float32, na_value=np.nan)
+
+
+def read_chunks(path, chunk_rows=CHUNK_ROWS):
+    return pd.read_csv(path, usecols=list(RAW_DTYPES), dtype=RAW_DTYPES, na_values=['NA'],
+                       on_bad_lines='warn', chunksize=chunk_rows)
+
+
+class SeenKeys:
+    """(Location, Date) keys of the rows written so far, as one sorted int64 array."""
+
+    def __init__(self):
+        self.location_ids = {}
+        self.keys = np.empty(0, dtype=np.int64)
+
+    def first_seen(self, raw):
+        """Mask of raw's rows whose key has not been seen; those keys are then recorded."""
+        locations = raw['Location'].fillna("")
+        for name in locations.unique():
+            self.location_ids.setdefault(name, len(self.location_ids))
+        days = raw['Date'].to_numpy(dtype='datetime64[D]').astype(np.int64) + 2 ** 31
+        keys = locations.map(self.location_ids).to_numpy(dtype=np.int64) * 2 ** 32 + days
+        new = ~np.isin(keys, self.keys)
+        self.keys = np.union1d(self.keys, keys[new])
+        return new
+
+
+def clean_chunk(raw, seen=None):
+    """Model input rows plus the 0/1 target for one chunk of raw observations.
+
+    Rows without a valid date or target are dropped, as are repeated
+    (Location, Date) rows, including repeats of keys in seen (a SeenKeys
+    shared by earlier chunks); unknown categories become NaN.
+    """
+    raw = raw.assign(Date=pd.to_datetime(raw['Date'], format='%Y-%m-%d', errors='coerce'))
+    label = label_vector(raw[TARGET])
+    keep = raw['Date'].notna().to_numpy() & ~np.isnan(label)
+    raw = raw[keep].assign(**{TARGET: label[keep]}).drop_duplicates(['Location', 'Date'])
+    if seen is not None:
+        raw = raw[seen.first_seen(raw)]
+    df = build_features(raw.reset_index(drop=True))
+    df[TARGET] = raw[TARGET].to_numpy().astype(np.int8)
+    return df
+
+
+def write_partitions(df, out_dir, name):
+    """Write df as out_dir/year=YYYY/<name>.npz, one file per year."""
+    for year, part in df.groupby(df['Date'].dt.year):
+        columns = {'Date': part['Date'].to_numpy(dtype='datetime64[D]')}
+        for col in FEATURE_COLS:
+            columns[col] = part[col].cat.codes.to_numpy() if col in CATEGORIES else part[col].to_numpy()
+        columns[TARGET] = part[TARGET].to_numpy()
+        year_dir = os.path.join(out_dir, f"year={year}")
+        os.makedirs(year_dir, exist_ok=True)
+        np.savez(os.path.join(year_dir, f"{name}.npz"), **columns)
+
+
+def partition_files(data_dir):
+    """Part files under data_dir in a stable order (year, then part name)."""
+    return sorted(os.path.join(root, name)
+                  for root, _, names in os.walk(data_dir)
+                  for name in names if name.endswith(".npz"))
+
+
+def read_part(path):
+    """One part file as a frame: Date, FEATURE_COLS in SCHEMA dtypes, RainTomorrow."""
+    with np.load(path) as part:
+        columns = {'Date': part['Date']}
+        for col in FEATURE_COLS:
+            columns[col] = (pd.Categorical.from_codes(part[col], dtype=SCHEMA[col])
+                            if col in CATEGORIES else part[col])
+        columns[TARGET] = part[TARGET]
+    return pd.DataFrame(columns)
+
+
+def read_partitions(data_dir=None, years=None):
+    """All parts under data_dir (default: dirs.processed_partitions) as one frame, optionally only some years."""
+    data_dir = data_dir or correct_path("dirs", "processed_partitions")
+    files = [path for path in partition_files(data_dir)
+             if years is None or int(os.path.basename(os.path.dirname(path))[len("year="):]) in years]
+    if not files:
+        return pd.DataFrame()
+    return pd.concat([read_part(path) for path in files], ignore_index=True)
+
+
+def preprocess(raw_path=None, out_dir=None, chunk_rows=CHUNK_ROWS, append=False, log=print):
+    """Stream raw_path into year partitions under out_dir; returns a summary dict."""
+    started = time.perf_counter()
+    raw_path = raw_path or correct_path("data_paths", "raw_data_path")
+    out_dir = out_dir or correct_path("dirs", "processed_partitions")
+    if append:
+        target_dir = out_dir
+        prefix = "part-" + datetime.datetime.now().strftime("%Y%m%d%H%M%S")
+    else:
+        target_dir = f"{out_dir}.tmp-{os.getpid()}"
+        prefix = "part"
+        shutil.rmtree(target_dir, ignore_errors=True)
+    os.makedirs(target_dir, exist_ok=True)
+
+    read = written = chunks = 0
+    seen = SeenKeys()
+    try:
+        for chunks, raw in enumerate(read_chunks(raw_path, chunk_rows), 1):
+            df = clean_chunk(raw, seen)
+            write_partitions(df, target_dir, f"{prefix}-{chunks - 1:05d}")
+            read += len(raw)
+            written += len(df)
+            log(f"chunk {chunks}: {len(raw)} rows read, {len(df)} written")
+    except BaseException:
+        if not append:
+            shutil.rmtree(target_dir, ignore_errors=True)
+        raise
+
+    if not append:
+        # Swap the finished partitions in; readers never see a half-written dataset
+        old_dir = f"{out_dir}.old-{os.getpid()}"
+        if os.path.exists(out_dir):
+            os.replace(out_dir, old_dir)
+        os.replace(target_dir, out_dir)
+        shutil.rmtree(old_dir, ignore_errors=True)
+
+    return {"chunks": chunks, "rows_read": read, "rows_written": written,
+            "seconds": time.perf_counter() - started, "out_dir": out_dir}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Preprocess weatherAUS.csv in chunks into year partitions.")
+    parser.add_argument("--raw", help="raw CSV (default: data_paths.raw_data_path)")
+    parser.add_argument("--out", help="partition directory (default: dirs.processed_partitions)")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--append", action="store_true", help="add to the existing partitions")
+    args = parser.parse_args()
+    summary = preprocess(args.raw, args.out, args.chunk_rows, args.append)
+    print(f"{summary['rows_written']} of {summary['rows_read']} rows in {summary['chunks']} chunks "
+          f"written to {summary['out_dir']} in {summary['seconds']:.1f}s")
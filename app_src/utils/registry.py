@@ -0,0 +1,241 @@
+"""Process-wide registry of the trained models.
+
+Every model in artifacts_paths (MODEL_KEYS) is loaded once per process, given
+warm-up predictions and shared by every session and page; startup.warm_up()
+loads them all after the first page render. get() returns the current
+ModelVersion without taking a lock.
+
+Model files are re-checked at most once per CHECK_INTERVAL. When one changes
+(training.save_model replaces it atomically), the new version is loaded and
+warmed up on a background thread while the old one keeps serving, then
+swapped in. If the new file cannot be loaded, the old version stays and the
+error is kept in errors. Callers that cache predictions key them on the
+ModelVersion.sha1 they scored with (result_cache.ResultCache), so a result
+is never filed under a model that did not make it.
+
+The backend comes from serving.backend in params.yaml (compiled by default).
+With compiled, the XGBoost trees are written once per model hash to
+dirs.model_cache and memory-mapped read-only, so any number of worker
+processes share one copy through the page cache. native keeps a Booster in
+every process, so memory grows with the worker count. A registry loaded
+before a fork is inherited by the children.
+
+models/Decision_Tree.pkl was pickled by scikit-learn < 1.3, whose tree nodes
+have no missing_go_to_left field and whose leaves hold class counts rather
+than fractions; load_artifact() upgrades them.
+"""
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from utils.config import correct_path, load_config
+from utils.features import FEATURE_COLS
+from utils.metrics import span
+from utils.result_cache import file_sha1
+
+
+# Registry name -> artifacts_paths key; names match the sections of params.yaml
+MODEL_KEYS = {"xgboost": "xg_model_path", "decision_tree": "DT_model_path"}
+CHECK_INTERVAL = 1.0    # seconds between model file stat() checks
+WARM_UP_ROWS = (1, 64)  # a single prediction and a batch
+
+# model is None when a compiled version was mapped from dirs.model_cache
+ModelVersion = namedtuple("ModelVersion", ["name", "path", "sha1", "model", "scorer", "loaded_at"])
+
+_compat_lock = threading.Lock()
+_registries = {}
+_registries_lock = threading.Lock()
+
+
+def serving_backend():
+    return load_config("params")["serving"]["backend"]
+
+
+def load_artifact(path):
+    """joblib.load, upgrading decision trees pickled by scikit-learn < 1.3."""
+    import joblib
+
+    try:
+        return joblib.load(path)
+    except ValueError as e:
+        if "node array from the pickle has an incompatible dtype" not in str(e):
+            raise
+
+    from sklearn.tree import _tree
+
+    class LegacyTree(_tree.Tree):
+        def __setstate__(self, state):
+            nodes = state["nodes"]
+            if nodes.dtype != _tree.NODE_DTYPE:
+                # Fields added since are zero: such trees never routed missing values
+                upgraded = np.zeros(nodes.shape, dtype=_tree.NODE_DTYPE)
+                for field in nodes.dtype.names:
+                    upgraded[field] = nodes[field]
+                state = {**state, "nodes": upgraded}
+                if self.max_n_classes > 1:
+                    # Classifier leaves held class counts before 1.4 and hold fractions now
+                    values = state["values"]
+                    totals = values.sum(axis=2, keepdims=True)
+                    state["values"] = np.divide(values, totals, out=np.zeros_like(values), where=totals > 0)
+            super().__setstate__(state)
+
+    # The pickle names sklearn.tree._tree.Tree, so swap the subclass in while it loads
+    with _compat_lock:
+        original = _tree.Tree
+        _tree.Tree = LegacyTree
+        try:
+            return joblib.load(path)
+        finally:
+            _tree.Tree = original
+
+
+def model_cache_dir(sha1):
+    return os.path.join(correct_path("dirs", "model_cache"), sha1)
+
+
+def mapped_backend(model, sha1):
+    """CompiledBackend memory-mapped from dirs.model_cache/<sha1>, written there on first use."""
+    from utils.inference import CompiledBackend
+
+    cache_dir = model_cache_dir(sha1)
+    if not os.path.isdir(cache_dir):
+        parent = os.path.dirname(cache_dir)
+        os.makedirs(parent, exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(dir=parent, prefix=".tmp-")
+        CompiledBackend(model).save(tmp_dir)
+        try:
+            os.rename(tmp_dir, cache_dir)
+        except OSError:
+            # Another process wrote the same model first
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+    return CompiledBackend.load(cache_dir)
+
+
+def build_scorer(model, sha1, backend=None):
+    """What predict_proba is called on: a lean backend for XGBoost, the estimator otherwise."""
+    if not hasattr(model, "get_booster"):
+        return model
+    backend = backend or serving_backend()
+    if backend == "compiled":
+        return mapped_backend(model, sha1)
+    from utils.inference import load_backend
+
+    return load_backend(model, backend)
+
+
+def warm_up(scorer):
+    # Pays for first-call allocations and lazy initialisation before a user does
+    names = getattr(scorer, "feature_names_in_", None)
+    for rows in WARM_UP_ROWS:
+        if names is not None:
+            X = pd.DataFrame(np.zeros((rows, len(names))), columns=names)
+        else:
+            X = np.full((rows, len(FEATURE_COLS)), np.nan, dtype=np.float32)
+        scorer.predict_proba(X)
+
+
+class ModelRegistry:
+
+    def __init__(self, paths=None, backend=None):
+        self.paths = paths or {name: correct_path("artifacts_paths", key) for name, key in MODEL_KEYS.items()}
+        self.backend = backend or serving_backend()
+        self.errors = {}       # name -> why the last load failed
+        self._versions = {}    # name -> ModelVersion
+        self._signatures = {}  # name -> (size, mtime) of the file behind the version
+        self._checked_at = {}
+        self._swapping = set()
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+
+    def _load(self, name, stat):
+        path = self.paths[name]
+        with span("registry.load"):
+            sha1 = file_sha1(path)
+            if self.backend == "compiled" and os.path.isdir(model_cache_dir(sha1)):
+                # Compiled before, here or in another process: map it without unpickling the model
+                from utils.inference import CompiledBackend
+
+                model, scorer = None, CompiledBackend.load(model_cache_dir(sha1))
+            else:
+                model = load_artifact(path)
+                scorer = build_scorer(model, sha1, self.backend)
+        with span("registry.warm_up"):
+            warm_up(scorer)
+        version = ModelVersion(name, path, sha1, model, scorer, time.time())
+        with self._lock:
+            self._versions[name] = version
+            self._signatures[name] = (stat.st_size, stat.st_mtime_ns)
+            self._checked_at[name] = time.monotonic()
+            self.errors.pop(name, None)
+        return version
+
+    def load(self, names=None):
+        """Load and warm up every model (or names) not loaded yet; failures go to errors."""
+        for name in names or self.paths:
+            try:
+                self.get(name)
+            except Exception as e:
+                self.errors[name] = str(e)
+        return self
+
+    def get(self, name="xgboost"):
+        """Current ModelVersion of name, loading it first if this process has none yet."""
+        version = self._versions.get(name)
+        if version is None:
+            # Concurrent first requests wait for one load
+            with self._load_lock:
+                version = self._versions.get(name)
+                if version is None:
+                    version = self._load(name, os.stat(self.paths[name]))
+            return version
+        self._check(name)
+        return version
+
+    def _check(self, name):
+        now = time.monotonic()
+        with self._lock:
+            if name in self._swapping or now - self._checked_at.get(name, 0) < CHECK_INTERVAL:
+                return
+            self._checked_at[name] = now
+        try:
+            stat = os.stat(self.paths[name])
+        except FileNotFoundError:
+            return  # mid-replace or removed; keep serving what we have
+        if (stat.st_size, stat.st_mtime_ns) == self._signatures.get(name):
+            return
+        with self._lock:
+            if name in self._swapping:
+                return
+            self._swapping.add(name)
+        threading.Thread(target=self._swap, args=(name, stat), name=f"model-swap-{name}", daemon=True).start()
+
+    def _swap(self, name, stat):
+        try:
+            self._load(name, stat)
+        except Exception as e:
+            # Keep the old version; the same file is not retried until it changes again
+            with self._lock:
+                self.errors[name] = str(e)
+                self._signatures[name] = (stat.st_size, stat.st_mtime_ns)
+        finally:
+            with self._lock:
+                self._swapping.discard(name)
+
+    def versions(self):
+        """{name: ModelVersion} of everything loaded so far."""
+        return dict(self._versions)
+
+
+def default_registry(backend=None):
+    # One registry per process and backend, shared by every session and page
+    backend = backend or serving_backend()
+    with _registries_lock:
+        if backend not in _registries:
+            _registries[backend] = ModelRegistry(backend=backend)
+        return _registries[backend]
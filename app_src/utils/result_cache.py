@@ -0,0 +1,75 @@
+"""In-memory cache of prediction results.
+
+Entries are keyed on (location, date) and tagged with the sha1 of the model
+version that made the prediction (registry.ModelVersion.sha1); the caller
+passes the sha1 of the version it scores with, so a result is only returned
+to a caller using the same model. Storing a result from a different model
+empties the cache. Days BoM has finalised are cached until evicted (LRU,
+max_entries). Days that can still be revised expire after
+bom.CURRENT_MONTH_TTL.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from utils.bom import CURRENT_MONTH_TTL, day_is_final
+
+
+MAX_ENTRIES = 100_000
+
+CachedResult = namedtuple("CachedResult", ["rain_tomorrow", "probability", "features"])
+
+
+def file_sha1(path, chunk_size=1 << 20):
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ResultCache:
+
+    def __init__(self, max_entries=MAX_ENTRIES, ttl=CURRENT_MONTH_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.model_sha1 = None     # model of the stored entries
+        self._entries = OrderedDict()  # (location, date) -> (model sha1, expires_at or None, CachedResult)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, location, date, model_sha1):
+        """CachedResult for (location, date) made by model model_sha1, or None."""
+        with self._lock:
+            entry = self._entries.get((location, date))
+            if entry is None or entry[0] != model_sha1 or (entry[1] is not None and entry[1] < time.monotonic()):
+                self.misses += 1
+                return None
+            self._entries.move_to_end((location, date))
+            self.hits += 1
+            return entry[2]
+
+    def put(self, location, date, model_sha1, proba, features):
+        """Store predict_proba output (2,) of model model_sha1 and its input row; returns the CachedResult."""
+        result = CachedResult(int(proba.argmax()), float(proba[1]), features.copy())
+        expires_at = None if day_is_final(date) else time.monotonic() + self.ttl
+        with self._lock:
+            if model_sha1 != self.model_sha1:
+                # A new model: results of the old one are not served again
+                self._entries.clear()
+                self.model_sha1 = model_sha1
+            if self.max_entries:
+                self._entries[(location, date)] = (model_sha1, expires_at, result)
+                self._entries.move_to_end((location, date))
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
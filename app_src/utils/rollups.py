@@ -0,0 +1,239 @@
+"""Pre-aggregated rollup cube for the Dashboard charts.
+
+Daily rows are reduced once to per-(Location, year, month) sums, counts,
+min/max and wind-direction tallies, plus per-(Location, year) histograms used
+as quantile sketches. Every chart query then sums a small slice of the cube
+instead of rescanning the raw rows.
+"""
+import numpy as np
+import pandas as pd
+
+from utils.metrics import timed
+
+
+VALUE_COLS = ['Rainfall', 'MaxTemp', 'MinTemp', 'Sunshine', 'Humidity3pm', 'WindGustSpeed']
+MAX_BINS = 4096
+
+COMPASS = ['N', 'NNE', 'NE', 'ENE', 'E', 'ESE', 'SE', 'SSE',
+           'S', 'SSW', 'SW', 'WSW', 'W', 'WNW', 'NW', 'NNW']
+
+
+def categories_of(values):
+    values = pd.Series(values)
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values.cat
+    return values.astype('category').cat
+
+
+def grid_of(x, max_bins=MAX_BINS):
+    """(low, bin width, bins) for a histogram of x.
+
+    BoM values are recorded to 1 or 0.1 units, so when the range allows it the
+    bins sit on that grid and every bin holds a single value (exact quantiles).
+    """
+    if not len(x):
+        return 0.0, 1.0, 1
+    lo, hi = float(x.min()), float(x.max())
+    for step in (1.0, 0.1):
+        if np.allclose(x / step, np.round(x / step), atol=1e-3) and (hi - lo) / step < max_bins:
+            return lo, step, int(round((hi - lo) / step)) + 1
+    return lo, (hi - lo) / max_bins or 1.0, max_bins
+
+
+def hist_quantiles(counts, centers, qs):
+    """Quantiles (pandas 'linear' interpolation) of data summarised as a histogram."""
+    n = counts.sum()
+    if n == 0:
+        return np.full(len(qs), np.nan)
+    cumulative = np.cumsum(counts)
+    result = []
+    for q in qs:
+        h = (n - 1) * q
+        lo, hi = int(np.floor(h)), int(np.ceil(h))
+        x_lo = centers[np.searchsorted(cumulative, lo, side='right')]
+        x_hi = centers[np.searchsorted(cumulative, hi, side='right')]
+        result.append(x_lo + (h - lo) * (x_hi - x_lo))
+    return np.array(result)
+
+
+class RollupCube:
+
+    @timed("rollups.build")
+    def __init__(self, df, value_cols=VALUE_COLS, max_bins=MAX_BINS):
+        self.value_cols = [col for col in value_cols if col in df.columns]
+        location = categories_of(df['Location'])
+        self.locations = list(location.categories)
+        self.loc_index = {loc: i for i, loc in enumerate(self.locations)}
+        self.years = np.arange(int(df['year'].min()), int(df['year'].max()) + 1)
+        n_loc, n_year = len(self.locations), len(self.years)
+
+        loc = location.codes.to_numpy().astype(np.intp)
+        year = df['year'].to_numpy().astype(np.intp) - self.years[0]
+        month = df['month'].to_numpy().astype(np.intp) - 1
+        valid = loc >= 0
+        cell = ((loc * n_year + year) * 12 + month)[valid]
+        year_cell = (loc * n_year + year)[valid]
+        shape = (n_loc, n_year, 12)
+
+        self.count, self.sum, self.sumsq, self.min, self.max = {}, {}, {}, {}, {}
+        self.hist, self.centers = {}, {}
+        for col in self.value_cols:
+            x = df[col].to_numpy(dtype=np.float64, na_value=np.nan)[valid]
+            ok = ~np.isnan(x)
+            size = n_loc * n_year * 12
+            self.count[col] = np.bincount(cell[ok], minlength=size).reshape(shape)
+            self.sum[col] = np.bincount(cell[ok], weights=x[ok], minlength=size).reshape(shape)
+            self.sumsq[col] = np.bincount(cell[ok], weights=x[ok] ** 2, minlength=size).reshape(shape)
+            grouped = pd.Series(x[ok]).groupby(cell[ok])
+            lows = np.full(size, np.nan)
+            highs = np.full(size, np.nan)
+            lows[grouped.min().index] = grouped.min().to_numpy()
+            highs[grouped.max().index] = grouped.max().to_numpy()
+            self.min[col] = lows.reshape(shape)
+            self.max[col] = highs.reshape(shape)
+
+            # Histogram per (Location, year) as a quantile sketch; a year has at most 366 rows
+            lo, width, bins = grid_of(x[ok], max_bins)
+            b = np.clip(np.round((x[ok] - lo) / width).astype(np.intp), 0, bins - 1)
+            self.hist[col] = np.bincount(year_cell[ok] * bins + b, minlength=n_loc * n_year * bins) \
+                .reshape(n_loc, n_year, bins).astype(np.uint16)
+            self.centers[col] = lo + np.arange(bins) * width
+
+        # Wind tallies: gust speed by gust direction, 3pm direction vs RainTomorrow
+        self.gust_dirs = self.gust_sum = self.dir3pm = self.rain_labels = self.dir_rain = None
+        if {'WindGustDir', 'WindGustSpeed'}.issubset(df.columns):
+            gust_dir = categories_of(df['WindGustDir'])
+            self.gust_dirs = list(gust_dir.categories)
+            d = gust_dir.codes.to_numpy().astype(np.intp)[valid]
+            x = df['WindGustSpeed'].to_numpy(dtype=np.float64, na_value=np.nan)[valid]
+            ok = (d >= 0) & ~np.isnan(x)
+            n_dir = len(self.gust_dirs)
+            self.gust_sum = np.bincount(cell[ok] * n_dir + d[ok], weights=x[ok],
+                                        minlength=n_loc * n_year * 12 * n_dir).reshape(shape + (n_dir,))
+        if {'WindDir3pm', 'RainTomorrow'}.issubset(df.columns):
+            dir3pm = categories_of(df['WindDir3pm'])
+            rain = categories_of(df['RainTomorrow'])
+            self.dir3pm, self.rain_labels = list(dir3pm.categories), list(rain.categories)
+            d = dir3pm.codes.to_numpy().astype(np.intp)[valid]
+            r = rain.codes.to_numpy().astype(np.intp)[valid]
+            ok = (d >= 0) & (r >= 0)
+            n_dir, n_rain = len(self.dir3pm), len(self.rain_labels)
+            self.dir_rain = np.bincount((cell[ok] * n_dir + d[ok]) * n_rain + r[ok],
+                                        minlength=n_loc * n_year * 12 * n_dir * n_rain) \
+                .reshape(shape + (n_dir, n_rain))
+
+        # Station coordinates (constant per location)
+        self.coords = None
+        if {'Latitude', 'Longitude'}.issubset(df.columns):
+            coords = df.dropna(subset=['Latitude', 'Longitude']) \
+                .groupby(df['Location'].astype(str), observed=True)[['Latitude', 'Longitude']].first()
+            self.coords = coords
+
+    def _select(self, locations, year_range):
+        """Location indices and a year slice for a sidebar selection."""
+        idx = [self.loc_index[loc] for loc in locations if loc in self.loc_index]
+        y0 = max(int(year_range[0]) - self.years[0], 0)
+        y1 = min(int(year_range[1]) - self.years[0], len(self.years) - 1)
+        # A range wholly before the first year would make y1 negative, which slices from the end
+        return idx, slice(y0, max(y1 + 1, y0))
+
+    def row_count(self, locations, year_range):
+        idx, years = self._select(locations, year_range)
+        col = self.value_cols[0]
+        return int(self.count[col][idx, years].sum()) if idx else 0
+
+    @timed("rollups.location_means")
+    def location_means(self, locations, year_range, cols=None):
+        """Mean of each column per location (the map and bar charts)."""
+        cols = self.value_cols if cols is None else cols
+        idx, years = self._select(locations, year_range)
+        data = {'Location': [self.locations[i] for i in idx]}
+        for col in cols:
+            total = self.sum[col][idx, years].sum(axis=(1, 2))
+            count = self.count[col][idx, years].sum(axis=(1, 2))
+            with np.errstate(invalid='ignore', divide='ignore'):
+                data[col] = total / count
+        out = pd.DataFrame(data)
+        if self.coords is not None:
+            out = out.join(self.coords, on='Location')
+        return out[out[cols].notna().any(axis=1)].reset_index(drop=True)
+
+    @timed("rollups.monthly_means")
+    def monthly_means(self, locations, year_range, col='Rainfall'):
+        """Mean of col per (month, Location) over the selected years."""
+        idx, years = self._select(locations, year_range)
+        total = self.sum[col][idx, years].sum(axis=1)
+        count = self.count[col][idx, years].sum(axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = total / count
+        out = pd.DataFrame({
+            'month': np.tile(np.arange(1, 13), len(idx)),
+            'Location': np.repeat([self.locations[i] for i in idx], 12),
+            col: means.ravel(),
+        })
+        return out.dropna(subset=[col]).sort_values(['month', 'Location'], ignore_index=True)
+
+    @timed("rollups.box_stats")
+    def box_stats(self, locations, year_range, col='MaxTemp'):
+        """Box-plot statistics per location from the histogram sketch and exact min/max."""
+        idx, years = self._select(locations, year_range)
+        rows = []
+        for i in idx:
+            counts = self.hist[col][i, years].sum(axis=0)
+            if counts.sum() == 0:
+                continue
+            q1, median, q3 = hist_quantiles(counts, self.centers[col], [0.25, 0.5, 0.75])
+            low = np.nanmin(self.min[col][i, years])
+            high = np.nanmax(self.max[col][i, years])
+            iqr = q3 - q1
+            rows.append({'Location': self.locations[i], 'q1': q1, 'median': median, 'q3': q3,
+                         'lowerfence': max(low, q1 - 1.5 * iqr),
+                         'upperfence': min(high, q3 + 1.5 * iqr)})
+        return pd.DataFrame(rows, columns=['Location', 'q1', 'median', 'q3', 'lowerfence', 'upperfence'])
+
+    @timed("rollups.gust_direction_sums")
+    def gust_direction_sums(self, locations, year_range):
+        """Summed gust speed per (Location, WindGustDir), in compass order."""
+        idx, years = self._select(locations, year_range)
+        totals = self.gust_sum[idx, years].sum(axis=(1, 2))
+        out = pd.DataFrame({
+            'Location': np.repeat([self.locations[i] for i in idx], len(self.gust_dirs)),
+            'WindGustDir': np.tile(self.gust_dirs, len(idx)),
+            'WindGustSpeed': totals.ravel(),
+        })
+        order = {d: i for i, d in enumerate(COMPASS)}
+        out = out[out['WindGustSpeed'] > 0]
+        return out.sort_values('WindGustDir', key=lambda s: s.map(order), kind='stable', ignore_index=True)
+
+    @timed("rollups.direction_rain_counts")
+    def direction_rain_counts(self, locations, year_range):
+        """Row counts per (WindDir3pm, RainTomorrow)."""
+        idx, years = self._select(locations, year_range)
+        totals = self.dir_rain[idx, years].sum(axis=(0, 1, 2))
+        out = pd.DataFrame({
+            'WindDir3pm': np.repeat(self.dir3pm, len(self.rain_labels)),
+            'RainTomorrow': np.tile(self.rain_labels, len(self.dir3pm)),
+            'count': totals.ravel(),
+        })
+        return out[out['count'] > 0].reset_index(drop=True)
+
+    @timed("rollups.describe")
+    def describe(self, locations, year_range, cols=None):
+        """DataFrame.describe() equivalent; quartiles come from the histogram sketch."""
+        cols = self.value_cols if cols is None else cols
+        idx, years = self._select(locations, year_range)
+        stats = {}
+        for col in cols:
+            n = self.count[col][idx, years].sum()
+            total = self.sum[col][idx, years].sum()
+            sumsq = self.sumsq[col][idx, years].sum()
+            mean = total / n if n else np.nan
+            std = np.sqrt(max(sumsq - total * mean, 0) / (n - 1)) if n > 1 else np.nan
+            q = hist_quantiles(self.hist[col][idx, years].sum(axis=(0, 1)), self.centers[col], [0.25, 0.5, 0.75]) \
+                if idx else [np.nan] * 3
+            lows = self.min[col][idx, years]
+            highs = self.max[col][idx, years]
+            stats[col] = [n, mean, std,
+                          np.nanmin(lows) if n else np.nan, *q,
+                          np.nanmax(highs) if n else np.nan]
+        return pd.DataFrame(stats, index=['count', 'mean', 'std', 'min', '25%', '50%', '75%', 'max'])
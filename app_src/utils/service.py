@@ -0,0 +1,351 @@
+"""Headless prediction service.
+
+PredictionService runs the Predict page's fetch -> prepare -> score pipeline
+without Streamlit. The model comes from the process-wide registry (loaded and
+warmed up once, swapped when the file changes), and concurrent single requests
+are coalesced by a MicroBatcher into one predict_proba call per batch. Every
+request has a deadline, and a bounded queue rejects work (Overloaded) instead
+of letting latency grow without limit.
+
+Python API:
+
+    service = PredictionService()
+    service.predict("Sydney", "2025-06-01")
+
+HTTP endpoint (run from app_src/):
+
+    python -m utils.service --port 8000
+
+    GET  /health
+    GET  /predict?location=Sydney&date=2025-06-01
+    POST /predict   {"requests": [{"location": "Sydney", "date": "2025-06-01"}, ...]}
+"""
+import argparse
+import datetime
+import json
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import requests
+
+from utils.bom import day_is_final, fetch_data, prepare_data
+from utils.feature_store import FeatureStore
+from utils.features import feature_matrix
+from utils.registry import default_registry, serving_backend
+from utils.result_cache import ResultCache
+from utils.stations import location_id
+
+
+MAX_BATCH = 256         # rows per predict_proba call
+MAX_WAIT = 0.002        # seconds the batcher waits for more rows after the first
+MAX_QUEUE = 4096        # queued rows before new requests are rejected
+REQUEST_TIMEOUT = 15.0  # seconds, end to end
+FETCH_TIMEOUT = 10.0    # seconds per BoM request
+MONTH_TTL = 60.0        # seconds a prepared station-month is reused in memory
+MAX_MONTHS = 512        # prepared station-months kept in memory
+MONTH_LOCKS = 64        # striped locks for station-month loads
+MAX_INFLIGHT = 512      # concurrent HTTP requests before answering 503
+MAX_CACHED_RESULTS = 100_000
+
+
+class Overloaded(RuntimeError):
+    """The service queue is full; the caller should retry later."""
+
+
+class MicroBatcher:
+    """Collects rows submitted from many threads and scores them together.
+
+    A single worker takes the first queued row, gathers whatever else arrives
+    within max_wait (up to max_batch rows) and makes one score() call, which
+    returns the (n, 2) probabilities and the sha1 of the model that made them.
+    """
+
+    def __init__(self, score, max_batch=MAX_BATCH, max_wait=MAX_WAIT, max_queue=MAX_QUEUE):
+        self.score = score
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._closed = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    def qsize(self):
+        return self._queue.qsize()
+
+    def submit(self, row):
+        """Queue one feature row; the Future resolves to its (2,) probabilities and the model sha1."""
+        if self._closed.is_set():
+            raise RuntimeError("MicroBatcher is closed")
+        future = Future()
+        try:
+            self._queue.put_nowait((row, future))
+        except queue.Full:
+            raise Overloaded(f"{self._queue.maxsize} requests already queued") from None
+        return future
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not self._closed.is_set():
+            batch = [(row, future) for row, future in self._collect()
+                     if row is not None and future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            try:
+                proba, model_sha1 = self.score(np.stack([row for row, _ in batch]))
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+            else:
+                for (_, future), p in zip(batch, proba):
+                    future.set_result((p, model_sha1))
+
+    def close(self):
+        self._closed.set()
+        self._queue.put((None, None))  # wake the worker
+        self._thread.join()
+
+
+def parse_date(value):
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    try:
+        return datetime.date.fromisoformat(str(value))
+    except ValueError:
+        raise ValueError(f"Invalid date: {value!r} (expected YYYY-MM-DD)") from None
+
+
+class PredictionService:
+
+    def __init__(self, model=None, backend=None, store=None, cache=None, max_batch=MAX_BATCH,
+                 max_wait=MAX_WAIT, max_queue=MAX_QUEUE, timeout=REQUEST_TIMEOUT):
+        from utils.inference import load_backend
+
+        model_from_file = model is None
+        if model_from_file:
+            # Score with the registry's current version, so a retrained model is picked up live
+            registry = default_registry(backend)
+            registry.get("xgboost")
+            self._current_sha1 = lambda: registry.get("xgboost").sha1
+
+            def score(X):
+                # Results are cached under the version that scored them, not the newest file
+                version = registry.get("xgboost")
+                return version.scorer.predict_proba(X), version.sha1
+        else:
+            scorer = load_backend(model, backend or serving_backend())
+            self._current_sha1 = lambda: None
+            score = lambda X: (scorer.predict_proba(X), None)
+        self.store = FeatureStore() if store is None else store
+        if cache is None:
+            # Results are keyed on the registry version's hash, so only cache when the model came from it
+            cache = ResultCache(max_entries=MAX_CACHED_RESULTS if model_from_file else 0)
+        self.cache = cache
+        self.timeout = timeout
+        self.batcher = MicroBatcher(score, max_batch, max_wait, max_queue)
+        self._months = OrderedDict()  # (location, year, month) -> (loaded_at, {date: row})
+        self._month_locks = [threading.Lock() for _ in range(MONTH_LOCKS)]
+        self._lock = threading.Lock()
+
+    def close(self):
+        self.batcher.close()
+
+    def _month_rows(self, location, year, month, timeout):
+        key = (location, year, month)
+        # One download/parse per station-month however many requests want it; a fixed set
+        # of locks, so months that were ever requested leave nothing behind
+        with self._month_locks[hash(key) % MONTH_LOCKS]:
+            with self._lock:
+                cached = self._months.get(key)
+            if cached and time.monotonic() - cached[0] < MONTH_TTL:
+                return cached[1]
+            content = fetch_data(location, year, month, timeout=timeout)
+            frame = prepare_data(content, location)
+            self.store.append(frame)
+            rows = dict(zip(frame['Date'].dt.date, feature_matrix(frame)))
+            with self._lock:
+                self._months[key] = (time.monotonic(), rows)
+                self._months.move_to_end(key)
+                while len(self._months) > MAX_MONTHS:
+                    self._months.popitem(last=False)
+            return rows
+
+    def features(self, location, date, timeout=FETCH_TIMEOUT):
+        """Model input row (as in feature_matrix()) for a station-day."""
+        if location not in location_id:
+            raise ValueError(f"Unknown location: {location!r}")
+        date = parse_date(date)
+        if day_is_final(date):
+            # The store only takes final days (FeatureStore.append), so a stored row is never provisional
+            x = self.store.vector(location, date)
+            if x is not None:
+                return x
+        x = self._month_rows(location, date.year, date.month, timeout).get(date)
+        if x is None:
+            raise LookupError(f"No observations for {location} on {date.isoformat()}")
+        return x
+
+    def predict(self, location, date, timeout=None):
+        """Forecast for one station-day as a dict; raises on bad input, no data or timeout."""
+        return self.predict_many([(location, date)], timeout=timeout, raise_errors=True)[0]
+
+    def predict_many(self, items, timeout=None, raise_errors=False):
+        """Forecasts for (location, date) pairs; failed items carry an 'error' entry."""
+        deadline = time.monotonic() + (timeout or self.timeout)
+        pending = []  # (location, date, features or cached result, future or error)
+        for location, date in items:
+            try:
+                date = parse_date(date)
+                cached = self.cache.get(location, date, self._current_sha1())
+                if cached is not None:
+                    pending.append((location, date, cached, None))
+                    continue
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError("Request deadline exceeded")
+                x = self.features(location, date, timeout=min(remaining, FETCH_TIMEOUT))
+                pending.append((location, date, x, self.batcher.submit(x)))
+            except Exception as e:
+                if raise_errors:
+                    raise
+                pending.append((location, date, None, e))
+
+        results = []
+        for location, date, x, future in pending:
+            try:
+                if isinstance(future, Exception):
+                    raise future
+                if future is None:
+                    result = x
+                else:
+                    try:
+                        proba, model_sha1 = future.result(timeout=max(deadline - time.monotonic(), 0))
+                    except TimeoutError:
+                        future.cancel()
+                        raise TimeoutError("Request deadline exceeded") from None
+                    result = self.cache.put(location, date, model_sha1, proba, x)
+                results.append({
+                    "location": location,
+                    "date": date.isoformat(),
+                    "rain_tomorrow": result.rain_tomorrow,
+                    "probability": result.probability,
+                })
+            except Exception as e:
+                if raise_errors:
+                    raise
+                results.append({"location": location, "date": str(date), "error": str(e),
+                                "status": error_status(e)})
+        return results
+
+
+def error_status(e):
+    # HTTP status for an exception raised by PredictionService
+    if isinstance(e, ValueError):
+        return 400
+    if isinstance(e, LookupError):
+        return 404
+    if isinstance(e, Overloaded):
+        return 503
+    if isinstance(e, TimeoutError):
+        return 504
+    if isinstance(e, requests.exceptions.RequestException):
+        return 502
+    return 500
+
+
+class PredictionHandler(BaseHTTPRequestHandler):
+    service = None
+    inflight = threading.BoundedSemaphore(MAX_INFLIGHT)
+
+    def _send(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        if status == 503:
+            self.send_header("Retry-After", "1")
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _handle(self, work):
+        if not self.inflight.acquire(blocking=False):
+            return self._send(503, {"error": "Too many concurrent requests"})
+        try:
+            status, body = work()
+        except Exception as e:
+            status, body = error_status(e), {"error": str(e)}
+        finally:
+            self.inflight.release()
+        self._send(status, body)
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == "/health":
+            return self._send(200, {"status": "ok", "queued": self.service.batcher.qsize()})
+        if url.path != "/predict":
+            return self._send(404, {"error": "Not found"})
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        self._handle(lambda: (200, self.service.predict(
+            params.get("location"), params.get("date"), timeout=float(params.get("timeout", 0)) or None)))
+
+    def do_POST(self):
+        if urlsplit(self.path).path != "/predict":
+            return self._send(404, {"error": "Not found"})
+
+        def work():
+            try:
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                items = [(item["location"], item["date"]) for item in body["requests"]]
+            except (ValueError, KeyError, TypeError):
+                raise ValueError('Expected {"requests": [{"location": ..., "date": ...}, ...]}') from None
+            return 200, {"results": self.service.predict_many(items, timeout=body.get("timeout"))}
+
+        self._handle(work)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(host="127.0.0.1", port=8000, **kwargs):
+    PredictionHandler.service = PredictionService(**kwargs)
+    server = ThreadingHTTPServer((host, port), PredictionHandler)
+    server.daemon_threads = True
+    print(f"Serving predictions on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        PredictionHandler.service.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve rain predictions over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--backend", choices=["native", "compiled"], help="default: serving.backend")
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH)
+    parser.add_argument("--max-wait-ms", type=float, default=MAX_WAIT * 1000)
+    parser.add_argument("--max-queue", type=int, default=MAX_QUEUE)
+    parser.add_argument("--timeout", type=float, default=REQUEST_TIMEOUT)
+    args = parser.parse_args()
+    serve(args.host, args.port, backend=args.backend, max_batch=args.max_batch,
+          max_wait=args.max_wait_ms / 1000, max_queue=args.max_queue, timeout=args.timeout)
@@ -0,0 +1,37 @@
+"""Once-per-process warm-up run after a page has rendered.
+
+Pages call warm_up() as their last statement. The first call starts a daemon
+thread that loads and warms up every model in the registry, fills the Lottie
+cache and imports the heavy modules other pages need, so neither the first
+prediction nor navigating to another page pays for it; later calls are no-ops.
+"""
+import importlib
+import threading
+
+from utils.assets import LOTTIE_URLS, load_lottie
+
+
+# Imported lazily by the pages that need them (Dashboard charts, model scoring)
+HEAVY_MODULES = ['pandas', 'plotly.express', 'joblib', 'xgboost', 'utils.inference']
+
+_started = threading.Event()
+
+
+def _warm():
+    from utils.registry import default_registry
+
+    default_registry().load()
+    for url in LOTTIE_URLS.values():
+        load_lottie(url)
+    for name in HEAVY_MODULES:
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            pass
+
+
+def warm_up():
+    if _started.is_set():
+        return
+    _started.set()
+    threading.Thread(target=_warm, name="app-warm-up", daemon=True).start()
@@ -0,0 +1,51 @@
+# BoM daily weather observation product IDs for each training location
+location_id = {
+    "Albury": "IDCJDW2002",
+    "BadgerysCreek": "IDCJDW2126",
+    "Cobar": "IDCJDW2050",
+    "CoffsHarbour": "IDCJDW2080",
+    "Moree": "IDCJDW2084",
+    "Newcastle": "IDCJDW2097",
+    "NorahHead": "IDCJDW2096",
+    "NorfolkIsland": "IDCJDW8002",
+    "Penrith": "IDCJDW2127",
+    "Richmond": "IDCJDW2128",
+    "Sydney": "IDCJDW2129",
+    "SydneyAirport": "IDCJDW2130",
+    "WaggaWagga": "IDCJDW2139",
+    "Williamtown": "IDCJDW2140",
+    "Wollongong": "IDCJDW2141",
+    "Canberra": "IDCJDW2801",
+    "Tuggeranong": "IDCJDW2802",
+    "Ballarat": "IDCJDW3033",
+    "Bendigo": "IDCJDW3008",
+    "Sale": "IDCJDW3035",
+    "MelbourneAirport": "IDCJDW3036",
+    "Melbourne": "IDCJDW3037",
+    "Mildura": "IDCJDW3038",
+    "Nhil": "IDCJDW3039",
+    "Portland": "IDCJDW3040",
+    "Watsonia": "IDCJDW3041",
+    "Dartmoor": "IDCJDW3042",
+    "Brisbane": "IDCJDW4019",
+    "Cairns": "IDCJDW4020",
+    "GoldCoast": "IDCJDW4021",
+    "Townsville": "IDCJDW4022",
+    "Adelaide": "IDCJDW5081",
+    "MountGambier": "IDCJDW5003",
+    "Nuriootpa": "IDCJDW5004",
+    "Woomera": "IDCJDW5005",
+    "Albany": "IDCJDW6111",
+    "Witchcliffe": "IDCJDW6112",
+    "PearceRAAF": "IDCJDW6113",
+    "PerthAirport": "IDCJDW6114",
+    "Perth": "IDCJDW6115",
+    "SalmonGums": "IDCJDW6116",
+    "Walpole": "IDCJDW6117",
+    "Hobart": "IDCJDW7021",
+    "Launceston": "IDCJDW7025",
+    "AliceSprings": "IDCJDW8019",
+    "Darwin": "IDCJDW8014",
+    "Katherine": "IDCJDW8021",
+    "Uluru": "IDCJDW8022"
+}
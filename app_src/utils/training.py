@@ -0,0 +1,437 @@
+"""Config-driven XGBoost training.
+
+Hyperparameters and the search space come from configs/params.yaml. Search
+trials run in parallel on a process pool, and the best one is refit into the
+model artifact, with a metrics file beside it.
+
+The training CSV is parsed once. Its feature matrix is cached as .npy files
+keyed on the file's sha1, so later runs and every worker process (through
+mmap) start from the cached arrays. Each worker builds its QuantileDMatrix
+pair once and reuses it for every trial it runs. Each trial stops once the
+validation metric has not improved for early_stopping_rounds.
+
+update() is the monthly refresh. It continues boosting the current model on
+the last few BoM months (xgboost.incremental.window_months) and validates both
+models on the newest month. The number of new rounds is picked by early
+stopping on the last training month, so the newest month plays no part in
+fitting the candidate. The candidate replaces the model only if it scores
+better, and the replaced model is kept as <model>.previous.pkl.
+
+Run from app_src/:
+
+    python -m utils.training
+    python -m utils.training --data ../data/processed/xg_weatherAUS_processed.csv --trials 80 --workers 4
+    python -m utils.training --update 2026-09
+"""
+import argparse
+import datetime
+import hashlib
+import json
+import multiprocessing
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+from utils.bom import atomic_write, prepare_data
+from utils.config import correct_path, load_config
+from utils.features import FEATURE_COLS, apply_schema, feature_matrix, feature_types, matrix_frame
+from utils.preprocess import label_vector, partition_files, read_part
+from utils.result_cache import file_sha1
+from utils.stations import location_id
+
+
+# Metrics where larger is better (XGBoost picks the same direction for early stopping)
+MAXIMIZE = {"auc", "aucpr", "map", "ndcg", "pre"}
+
+# weatherAUS marks RainToday/RainTomorrow 'Yes' for more than 1 mm of rain
+RAIN_THRESHOLD = 1.0
+
+# sklearn-only arguments that xgb.train() does not take
+SKLEARN_ONLY = {"n_estimators", "enable_categorical"}
+
+_worker = {}  # per-process state set by init_worker()
+
+
+def metrics_path(model_path):
+    return os.path.splitext(model_path)[0] + ".metrics.json"
+
+
+def previous_path(model_path):
+    return os.path.splitext(model_path)[0] + ".previous.pkl"
+
+
+def read_metrics(model_path):
+    try:
+        with open(metrics_path(model_path)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def data_key(data_path):
+    # sha1 of a training CSV, or of every part file's name and sha1 for a partition directory
+    if not os.path.isdir(data_path):
+        return file_sha1(data_path)
+    digest = hashlib.sha1()
+    for path in partition_files(data_path):
+        digest.update(f"{os.path.relpath(path, data_path)}:{file_sha1(path)}\n".encode())
+    return digest.hexdigest()
+
+
+def read_matrix(path, target):
+    df = read_part(path) if path.endswith(".npz") else pd.read_csv(path)
+    y = label_vector(df[target])
+    known = ~np.isnan(y)
+    return feature_matrix(apply_schema(df[known])), y[known]
+
+
+def cached_matrix(data_path, target, cache_dir=None):
+    """(X, y) for a training CSV or a directory of preprocess partitions.
+
+    The arrays are memory-mapped from the .npy cache, which is built on first use.
+    A directory is read one part file at a time.
+    """
+    cache_dir = cache_dir or correct_path("dirs", "training_cache")
+    key = data_key(data_path)
+    paths = {name: os.path.join(cache_dir, f"{key}.{name}.npy") for name in ("X", "y")}
+    if not all(os.path.exists(path) for path in paths.values()):
+        files = partition_files(data_path) if os.path.isdir(data_path) else [data_path]
+        if not files:
+            raise FileNotFoundError(f"No part files under {data_path}")
+        parts = [read_matrix(path, target) for path in files]
+        arrays = {"X": np.concatenate([X for X, _ in parts]), "y": np.concatenate([y for _, y in parts])}
+        del parts
+        os.makedirs(cache_dir, exist_ok=True)
+        for name, path in paths.items():
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                np.save(f, arrays[name])
+            os.replace(tmp_path, path)
+    return np.load(paths["X"], mmap_mode="r"), np.load(paths["y"], mmap_mode="r"), key
+
+
+def split_indices(n, test_size, random_state):
+    # Same shuffle as the notebook's train_test_split on the full frame
+    from sklearn.model_selection import train_test_split
+
+    return train_test_split(np.arange(n), test_size=test_size, random_state=random_state)
+
+
+def booster_params(hparams):
+    params = {key: value for key, value in hparams.items() if key not in SKLEARN_ONLY}
+    params["objective"] = "binary:logistic"
+    return params
+
+
+def sample_trials(hparams, space, n_trials, seed):
+    """n_trials hyperparameter sets: hparams first, then uniform draws from space.
+
+    A range with integer bounds is sampled as integers.
+    """
+    rng = np.random.default_rng(seed)
+    trials = [dict(hparams)]
+    for _ in range(n_trials - 1):
+        params = dict(hparams)
+        for key, (low, high) in space.items():
+            if isinstance(low, int) and isinstance(high, int):
+                params[key] = int(rng.integers(low, high + 1))
+            else:
+                params[key] = float(rng.uniform(low, high))
+        trials.append(params)
+    return trials
+
+
+def init_worker(data_path, target, cache_dir, train_idx, valid_idx, max_bin, nthread):
+    X, y, _ = cached_matrix(data_path, target, cache_dir)
+    types = feature_types()
+    dtrain = xgb.QuantileDMatrix(X[train_idx], y[train_idx], feature_names=FEATURE_COLS,
+                                 feature_types=types, enable_categorical=True, max_bin=max_bin)
+    dvalid = xgb.QuantileDMatrix(X[valid_idx], y[valid_idx], feature_names=FEATURE_COLS,
+                                 feature_types=types, enable_categorical=True, ref=dtrain)
+    _worker.update(dtrain=dtrain, dvalid=dvalid, nthread=nthread)
+
+
+def run_trial(number, hparams, metric, max_rounds, early_stopping_rounds, seed):
+    started = time.perf_counter()
+    params = {**booster_params(hparams), "eval_metric": metric, "nthread": _worker["nthread"], "seed": seed}
+    booster = xgb.train(params, _worker["dtrain"], num_boost_round=max_rounds,
+                        evals=[(_worker["dvalid"], "valid")],
+                        early_stopping_rounds=early_stopping_rounds, verbose_eval=False)
+    return {"trial": number, "params": hparams, "score": float(booster.best_score),
+            "rounds": booster.best_iteration + 1, "seconds": time.perf_counter() - started}
+
+
+def evaluate(y, proba, threshold=0.5):
+    """Validation metrics for P(rain) scores against 0/1 labels."""
+    from sklearn.metrics import (accuracy_score, average_precision_score, confusion_matrix,
+                                 f1_score, precision_score, recall_score, roc_auc_score)
+
+    pred = (proba >= threshold).astype(int)
+    tn, fp, fn, tp = confusion_matrix(y, pred, labels=[0, 1]).ravel()
+    return {
+        "threshold": threshold,
+        "accuracy": float(accuracy_score(y, pred)),
+        "precision": float(precision_score(y, pred, zero_division=0)),
+        "recall": float(recall_score(y, pred, zero_division=0)),
+        "f1": float(f1_score(y, pred, zero_division=0)),
+        "roc_auc": float(roc_auc_score(y, proba)),
+        "aucpr": float(average_precision_score(y, proba)),
+        "confusion": {"tn": int(tn), "fp": int(fp), "fn": int(fn), "tp": int(tp)},
+    }
+
+
+def save_model(model, path):
+    import joblib
+
+    # Pages and the result cache watch this file, so it is replaced in one rename
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    joblib.dump(model, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def train(data_path=None, out_path=None, n_trials=None, workers=None, cache_dir=None, log=print):
+    """Search, refit and save the XGBoost model; returns the metrics dict."""
+    started = time.perf_counter()
+    params = load_config("params")
+    settings, xgb_config = params["training"], params["xgboost"]
+    search = xgb_config["search"]
+    data_path = data_path or correct_path("data_paths", "xg_processed_data_path")
+    out_path = out_path or correct_path("artifacts_paths", "xg_model_path")
+    n_trials = n_trials or search["n_trials"]
+    seed = settings["random_state"]
+
+    X, y, data_sha1 = cached_matrix(data_path, settings["target"], cache_dir)
+    # As in the notebook, the held-out split is used for early stopping and for the reported metrics
+    train_idx, valid_idx = split_indices(len(y), settings["test_size"], seed)
+    log(f"{len(y)} rows ({len(train_idx)} train, {len(valid_idx)} validation) "
+        f"loaded in {time.perf_counter() - started:.1f}s")
+
+    cpus = os.cpu_count() or 1
+    workers = min(workers or cpus, n_trials)
+    trials = sample_trials(xgb_config["hparams"], search["space"], n_trials, search["seed"])
+    metric = search["metric"]
+    results = []
+    # spawn: forked children can deadlock on an OpenMP pool inherited from the parent
+    with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=init_worker,
+                             initargs=(data_path, settings["target"], cache_dir, train_idx, valid_idx,
+                                       settings["max_bin"], max(1, cpus // workers))) as pool:
+        futures = [pool.submit(run_trial, number, hparams, metric, search["max_rounds"],
+                               search["early_stopping_rounds"], seed)
+                   for number, hparams in enumerate(trials)]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            log(f"[{len(results)}/{n_trials}] trial {result['trial']}: {metric}={result['score']:.4f} "
+                f"after {result['rounds']} rounds ({result['seconds']:.1f}s)")
+
+    results.sort(key=lambda r: r["trial"])
+    pick = max if metric in MAXIMIZE else min
+    best = pick(results, key=lambda r: r["score"])
+    log(f"Best: trial {best['trial']} with {metric}={best['score']:.4f}")
+
+    hparams = {**best["params"], "n_estimators": best["rounds"], "enable_categorical": True}
+    model = xgb.XGBClassifier(**hparams, max_bin=settings["max_bin"], random_state=seed, n_jobs=cpus)
+    model.fit(matrix_frame(X[train_idx]), y[train_idx])
+    proba = model.predict_proba(matrix_frame(X[valid_idx]))[:, 1]
+
+    metrics = {
+        "trained_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        "xgboost_version": xgb.__version__,
+        "data": {"path": data_path, "sha1": data_sha1, "rows": len(y),
+                 "train_rows": len(train_idx), "validation_rows": len(valid_idx)},
+        "hparams": hparams,
+        "validation": evaluate(y[valid_idx], proba),
+        "search": {"metric": metric, "seed": search["seed"], "best_trial": best["trial"], "trials": results},
+        "seconds": time.perf_counter() - started,
+    }
+    save_model(model, out_path)
+    atomic_write(metrics_path(out_path), json.dumps(metrics, indent=2).encode("utf-8"))
+    log(f"Saved {out_path} in {metrics['seconds']:.1f}s total")
+    return metrics
+
+
+def shift_month(year, month, months):
+    index = year * 12 + month - 1 + months
+    return index // 12, index % 12 + 1
+
+
+def month_frame(start, end, locations=None, source=None):
+    """Labelled feature rows for every station-day from start to end ((year, month) pairs).
+
+    RainTomorrow is taken from the next day's rainfall. Days whose next day
+    has not been observed are dropped.
+    """
+    from utils.backfill import is_missing, month_reader
+
+    locations = list(location_id) if locations is None else locations
+    months = [shift_month(*start, i) for i in range((end[0] - start[0]) * 12 + end[1] - start[1] + 2)]
+    contents = month_reader(source)([(location, *ym) for location in locations for ym in months])
+    frames = []
+    for (location, year, month), content in contents.items():
+        if isinstance(content, Exception):
+            # The month after end only labels end's last day and may not exist yet
+            if is_missing(content):
+                continue
+            raise content
+        frames.append(prepare_data(content, location))
+    if not frames:
+        raise LookupError(f"No observations from {start[0]}-{start[1]:02d} to {end[0]}-{end[1]:02d}")
+
+    df = pd.concat(frames, ignore_index=True).drop_duplicates(["Location", "Date"])
+    df = df.sort_values(["Location", "Date"], ignore_index=True)
+    locations = df["Location"].to_numpy()
+    rainfall = df["Rainfall"].to_numpy(dtype=np.float32, na_value=np.nan)
+    follows = ((locations[1:] == locations[:-1])
+               & (np.diff(df["Date"].to_numpy(dtype="datetime64[D]")) == np.timedelta64(1, "D"))
+               & ~np.isnan(rainfall[1:]))
+    label = np.full(len(df), np.nan, dtype=np.float32)
+    label[:-1] = np.where(follows, rainfall[1:] > RAIN_THRESHOLD, np.nan)
+    df["RainTomorrow"] = label
+
+    period = df["Date"].dt.year * 100 + df["Date"].dt.month
+    keep = ~np.isnan(label) & (period >= start[0] * 100 + start[1]) & (period <= end[0] * 100 + end[1])
+    return df[keep].reset_index(drop=True)
+
+
+def score(metric, y, proba):
+    # The search metric computed the same way for both models
+    from sklearn.metrics import average_precision_score, log_loss, roc_auc_score
+
+    if metric == "aucpr":
+        return float(average_precision_score(y, proba))
+    if metric == "auc":
+        return float(roc_auc_score(y, proba))
+    if metric == "logloss":
+        return float(log_loss(y, proba, labels=[0, 1]))
+    if metric == "error":
+        return float(np.mean((proba >= 0.5) != y))
+    raise ValueError(f"Unsupported metric for updates: {metric}")
+
+
+def update(month, window=None, model_path=None, out_path=None, source=None, log=print):
+    """Warm-start the model on the window months before month, validated on month.
+
+    The last window month picks the number of rounds by early stopping; the
+    candidate is then refit on the whole window. It is saved to out_path
+    (default: over the model) only if it beats the current model on month.
+    Returns the update record, which is appended to the metrics file when the
+    candidate is promoted.
+    """
+    import joblib
+
+    started = time.perf_counter()
+    params = load_config("params")
+    config = params["xgboost"]["incremental"]
+    metric = params["xgboost"]["search"]["metric"]
+    window = window or config["window_months"]
+    model_path = model_path or correct_path("artifacts_paths", "xg_model_path")
+    out_path = out_path or model_path
+
+    if window < 2:
+        raise ValueError("window must be at least 2 months: one to train on and one for early stopping")
+    first, last = shift_month(*month, -window), shift_month(*month, -1)
+    df = month_frame(first, month, source=source)
+    newest = ((df["Date"].dt.year == month[0]) & (df["Date"].dt.month == month[1])).to_numpy()
+    stopping = ((df["Date"].dt.year == last[0]) & (df["Date"].dt.month == last[1])).to_numpy()
+    if not newest.any() or not stopping.any() or (newest | stopping).all():
+        raise LookupError(f"Need labelled days in {month[0]}-{month[1]:02d} and in the {window} months before it")
+    train_rows = ~newest
+    X_valid, y_valid = apply_schema(df[newest]), df.loc[newest, "RainTomorrow"].to_numpy()
+    log(f"{train_rows.sum()} training days ({first[0]}-{first[1]:02d} to {last[0]}-{last[1]:02d}, "
+        f"{stopping.sum()} of them for early stopping), {len(y_valid)} validation days")
+
+    current = joblib.load(model_path)
+    base_rounds = current.get_booster().num_boosted_rounds()
+
+    def fit(rows, n_estimators, eval_rows=None, early_stopping_rounds=None):
+        model = xgb.XGBClassifier(**{**current.get_params(), "n_estimators": n_estimators,
+                                     "learning_rate": config["eta"], "eval_metric": metric,
+                                     "early_stopping_rounds": early_stopping_rounds,
+                                     "n_jobs": os.cpu_count()})
+        eval_set = None
+        if eval_rows is not None:
+            eval_set = [(apply_schema(df[eval_rows]), df.loc[eval_rows, "RainTomorrow"].to_numpy())]
+        model.fit(apply_schema(df[rows]), df.loc[rows, "RainTomorrow"].to_numpy(), eval_set=eval_set,
+                  xgb_model=current.get_booster(), verbose=False)
+        return model
+
+    def gain(new, old):
+        return new - old if metric in MAXIMIZE else old - new
+
+    # Early stopping on the last training month picks the number of rounds; they are then refit on
+    # the whole window, so the newest month only judges the candidate and the booster holds no
+    # trees past the best iteration
+    probe = fit(train_rows & ~stopping, config["max_rounds"], stopping, config["early_stopping_rounds"])
+    # best_iteration always lands past the base rounds, so whether boosting helped at all is
+    # judged against the current model on the stopping month
+    X_stop, y_stop = apply_schema(df[stopping]), df.loc[stopping, "RainTomorrow"].to_numpy()
+    improved = gain(score(metric, y_stop, probe.predict_proba(X_stop)[:, 1]),
+                    score(metric, y_stop, current.predict_proba(X_stop)[:, 1])) > 0
+    added = probe.best_iteration + 1 - base_rounds if improved else 0
+    candidate = fit(train_rows, added) if added > 0 else None
+
+    current_score = score(metric, y_valid, current.predict_proba(X_valid)[:, 1])
+    candidate_score = score(metric, y_valid, candidate.predict_proba(X_valid)[:, 1]) if candidate else None
+    improvement = gain(candidate_score, current_score) if candidate else None
+    promoted = improvement is not None and improvement > config["min_improvement"]
+
+    record = {
+        "updated_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        "validation_month": f"{month[0]}-{month[1]:02d}",
+        "train_months": [f"{first[0]}-{first[1]:02d}", f"{last[0]}-{last[1]:02d}"],
+        "train_rows": int(train_rows.sum()),
+        "stopping_month": f"{last[0]}-{last[1]:02d}",
+        "validation_rows": len(y_valid),
+        "base_rounds": base_rounds,
+        "rounds_added": max(added, 0),
+        "metric": metric,
+        "current_score": current_score,
+        "candidate_score": candidate_score,
+        "promoted": promoted,
+        "seconds": time.perf_counter() - started,
+    }
+    if promoted:
+        # The metrics file describes the deployed model, so it only changes with it
+        metrics = read_metrics(model_path)
+        metrics.setdefault("updates", []).append(record)
+        if out_path == model_path:
+            shutil.copyfile(model_path, previous_path(model_path))
+        metrics["hparams"] = {**metrics.get("hparams", {}), "n_estimators": base_rounds + added}
+        metrics["validation"] = evaluate(y_valid, candidate.predict_proba(X_valid)[:, 1])
+        save_model(candidate, out_path)
+        atomic_write(metrics_path(out_path), json.dumps(metrics, indent=2).encode("utf-8"))
+
+    if promoted:
+        log(f"Promoted: {metric} {current_score:.4f} -> {candidate_score:.4f} with {added} new rounds")
+    else:
+        log(f"Kept the current model: {metric} {current_score:.4f}"
+            + (f", candidate {candidate_score:.4f}" if candidate else ", no round improved it"))
+    return record
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the XGBoost model from configs/params.yaml.")
+    parser.add_argument("--data", help="training CSV or preprocess partition directory "
+                                       "(default: data_paths.xg_processed_data_path)")
+    parser.add_argument("--out", help="model artifact (default: artifacts_paths.xg_model_path)")
+    parser.add_argument("--trials", type=int, help="search trials (default: xgboost.search.n_trials)")
+    parser.add_argument("--workers", type=int, help="trial processes (default: one per core)")
+    parser.add_argument("--update", metavar="YYYY-MM", help="warm-start the current model, validated on this month")
+    parser.add_argument("--window", type=int, help="months before --update to train on "
+                                                   "(default: xgboost.incremental.window_months)")
+    parser.add_argument("--source", help="with --update: local directory in BoM's layout instead of downloading")
+    args = parser.parse_args()
+    if args.update:
+        from utils.backfill import parse_month
+
+        update(parse_month(args.update), args.window, out_path=args.out, source=args.source)
+    else:
+        metrics = train(args.data, args.out, args.trials, args.workers)
+        print(json.dumps(metrics["validation"], indent=2))
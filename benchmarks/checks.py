@@ -0,0 +1,243 @@
+"""Offline correctness checks for the Predict path and the backfill.
+
+Every check runs against the seeded synthetic inputs of benchmarks/pipeline.py
+in a scratch directory; nothing touches the network or the repo's data/
+directory; BoM itself is replaced by a local HTTP stand-in. A check passes
+when it returns and fails when it raises.
+
+    python benchmarks/checks.py                       # run every check
+    python benchmarks/checks.py --checks inference    # names or prefixes
+
+The exit status is 1 when any check fails.
+"""
+import argparse
+import datetime
+import hashlib
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import traceback
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from pipeline import MONTHS, batch_frame, bom_month_csv, load_model, prepare_workdir, read_fixture, use_workdir
+
+
+CHECKS = {}  # name -> function(workdir) returning a one-line summary
+
+
+def check(name):
+    def register(fn):
+        CHECKS[name] = fn
+        return fn
+    return register
+
+
+@check("inference.parity")
+def inference_parity(workdir):
+    # Both backends against the pickled model's predict_proba on every fixture station-month
+    from utils.inference import check_parity, load_backend
+
+    model = load_model()
+    df = batch_frame(workdir)
+    errors = {kind: check_parity(model, load_backend(model, kind), df, kind) for kind in ("native", "compiled")}
+    return f"{len(df)} rows over {len(MONTHS)} months, " + ", ".join(
+        f"{kind} max |dP| {error:.3g}" for kind, error in errors.items())
+
+
+class BomStandIn:
+    """Local HTTP server in place of BoM's DWO host.
+
+    Serves a synthetic month for any station-month URL with an ETag, answers
+    a matching If-None-Match with 304, and fails the next fail_next requests
+    with 503. Every request's path and conditional headers are kept.
+    """
+
+    def __init__(self):
+        stand_in = self
+        self.version = 0
+        self.fail_next = 0
+        self.requests = []
+        self._lock = threading.Lock()
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stand_in.handle(self)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_port}/climate/dwo/{{period}}/text/{{station_id}}.{{period}}.csv"
+
+    def content(self, path):
+        # The same bytes for a path until version changes
+        seed = int(hashlib.sha1(f"{path}:{self.version}".encode()).hexdigest()[:8], 16)
+        period = path.split("/")[3]
+        return bom_month_csv("Sydney", int(period[:4]), int(period[4:]), np.random.default_rng(seed))
+
+    def handle(self, request):
+        with self._lock:
+            self.requests.append((request.path, request.headers.get("If-None-Match")))
+            failing = self.fail_next > 0
+            self.fail_next -= failing
+        if failing:
+            request.send_error(503)
+            return
+        content = self.content(request.path)
+        etag = f'"{hashlib.sha1(content).hexdigest()}"'
+        if request.headers.get("If-None-Match") == etag:
+            request.send_response(304)
+            request.send_header("ETag", etag)
+            request.end_headers()
+            return
+        request.send_response(200)
+        request.send_header("ETag", etag)
+        request.send_header("Content-Length", str(len(content)))
+        request.end_headers()
+        request.wfile.write(content)
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@check("bom.fetch_cache")
+def bom_fetch_cache(workdir):
+    # fetch_data's on-disk cache against a local stand-in: closed months, revalidation, retries
+    import utils.bom as bom
+    from utils.fetcher import Fetcher
+
+    stand_in = BomStandIn()
+    original_url = bom.BOM_URL
+    bom.BOM_URL = stand_in.url
+    get = Fetcher(rate=0, backoff=0.01).get
+    try:
+        # A closed month is downloaded once and then always read from disk
+        first = bom.fetch_data("Sydney", 2024, 12, get=get)
+        again = bom.fetch_data("Sydney", 2024, 12, get=get)
+        assert first == again and len(stand_in.requests) == 1, stand_in.requests
+
+        # The current month is revalidated once its TTL has passed; unchanged costs a 304
+        today = datetime.date.today()
+        current = bom.fetch_data("Sydney", today.year, today.month, get=get)
+        assert bom.fetch_data("Sydney", today.year, today.month, get=get) == current
+        assert len(stand_in.requests) == 2, stand_in.requests
+        assert bom.fetch_data("Sydney", today.year, today.month, ttl=0, get=get) == current
+        path, etag = stand_in.requests[-1]
+        assert len(stand_in.requests) == 3 and etag, stand_in.requests
+
+        # A changed file replaces the cached copy
+        stand_in.version += 1
+        changed = bom.fetch_data("Sydney", today.year, today.month, ttl=0, get=get)
+        assert changed != current and changed == stand_in.content(path)
+        assert bom.read_cached(bom.fetched_path("Sydney", today.year, today.month)) == changed
+
+        # Transient 503s are retried by the session
+        stand_in.fail_next = 2
+        before = len(stand_in.requests)
+        assert bom.fetch_data("Sydney", 2024, 11, get=get)
+        assert len(stand_in.requests) - before == 3, stand_in.requests[before:]
+    finally:
+        bom.BOM_URL = original_url
+        stand_in.close()
+    return f"{len(stand_in.requests)} requests: closed month cached, 304 revalidation, change picked up, 2 retries"
+
+
+@check("backfill.fixture")
+def backfill_fixture(workdir):
+    # The backfill CLI's pipeline on a BoM-style fixture directory: scores, labels, resume, manifest
+    import pandas as pd
+    from utils.backfill import backfill, load_results, partition_path
+    from utils.bom import period, prepare_data
+    from utils.features import feature_matrix
+    from utils.inference import load_backend
+    from utils.stations import location_id
+    from utils.training import RAIN_THRESHOLD
+
+    locations = ["Sydney", "Perth"]
+    source, out_dir = os.path.join(workdir, "source"), os.path.join(workdir, "backfill")
+    for location in locations:
+        for year, month in MONTHS:
+            text_dir = os.path.join(source, period(year, month), "text")
+            os.makedirs(text_dir, exist_ok=True)
+            with open(os.path.join(text_dir, f"{location_id[location]}.{period(year, month)}.csv"), "wb") as f:
+                f.write(read_fixture(workdir, location, year, month))
+    start, end = MONTHS[0], MONTHS[-1]
+    quiet = lambda *args: None
+
+    summary = backfill(locations, start, end, out_dir, workers=2, source=source, log=quiet)
+    assert summary["scored"] == len(locations) and not summary["failed"], summary
+
+    # Same scores as the model on the prepared months; labels from the next day's rain
+    expected = pd.concat([prepare_data(read_fixture(workdir, location, *ym), location)
+                          for location in locations for ym in MONTHS], ignore_index=True)
+    backend = load_backend(load_model(), "native")
+    expected["Probability"] = backend.predict_proba(feature_matrix(expected))[:, 1]
+    following = expected.groupby("Location", observed=True)["Rainfall"].shift(-1)
+    expected["Observed"] = np.where(following.isna(), -1, following > RAIN_THRESHOLD).astype(np.int8)
+    results = load_results(out_dir, locations)
+    assert len(results) == len(expected) == summary["rows"], (len(results), len(expected))
+    merged = results.merge(expected.assign(Location=expected["Location"].astype(str)),
+                           on=["Location", "Date"], suffixes=("", "_expected"))
+    assert len(merged) == len(expected)
+    assert np.abs(merged["Probability"] - merged["Probability_expected"]).max() == 0
+    assert (merged["Observed"] == merged["Observed_expected"]).all()
+
+    # A rerun only scores what is missing
+    kept = partition_path(out_dir, locations[0], start[0])
+    kept_mtime = os.stat(kept).st_mtime_ns
+    os.remove(partition_path(out_dir, locations[1], start[0]))
+    resumed = backfill(locations, start, end, out_dir, workers=2, source=source, log=quiet)
+    assert resumed["scored"] == 1 and os.stat(kept).st_mtime_ns == kept_mtime, resumed
+    assert len(load_results(out_dir, locations)) == len(expected)
+
+    # Another range is refused rather than mixed into the same directory
+    try:
+        backfill(locations, start, start, out_dir, workers=1, source=source, log=quiet)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("a different range was accepted into an existing backfill")
+    return f"{len(results)} station-days over {len(locations)} stations, resumed 1 of {summary['units']} units"
+
+
+def select_checks(patterns):
+    if not patterns:
+        return list(CHECKS)
+    names = [name for name in CHECKS if any(name == p or name.startswith(p + ".") for p in patterns)]
+    if not names:
+        raise SystemExit(f"No checks match {patterns}; choose from {list(CHECKS)}")
+    return names
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--checks", nargs="+", help="check names or prefixes (default: all)")
+    args = parser.parse_args()
+
+    failed = []
+    for name in select_checks(args.checks):
+        workdir = tempfile.mkdtemp(prefix="rain-check-")
+        try:
+            prepare_workdir(workdir)
+            use_workdir(workdir)
+            print(f"PASS {name}: {CHECKS[name](workdir)}")
+        except Exception:
+            failed.append(name)
+            print(f"FAIL {name}:\n{traceback.format_exc()}")
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    if failed:
+        print(f"{len(failed)} check(s) failed: {', '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,551 @@
+"""Offline latency benchmarks for the Predict and Dashboard paths.
+
+Every stage runs in its own interpreter against seeded synthetic inputs: a
+BoM month file per station (handed to fetch_data from memory, or from a
+pre-filled fetch cache) and a Dashboard CSV. Nothing touches the network or
+the repo's data/ directory. Each stage reports p50/p95/p99 latency, rows/s
+at p50 and the interpreter's peak RSS, and is compared with a stored baseline.
+A stage runs in --rounds fresh interpreters and the round with the best p50
+is kept, which filters out noise from other processes.
+
+    python benchmarks/pipeline.py                     # compare with benchmarks/baseline.json
+    python benchmarks/pipeline.py --save-baseline     # record this machine's numbers
+    python benchmarks/pipeline.py --stages predict dashboard.cube_build --repeat 200
+
+The exit status is 1 when a stage's p50 latency or peak RSS is more than
+--threshold (default 25%) above the baseline, and more than a small absolute
+margin (--min-delta-ms, --min-delta-mb). Timings are machine specific,
+so record the baseline on the machine that runs the comparison.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+
+ROOT_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+APP_DIR = os.path.join(ROOT_DIR, "app_src")
+BASELINE_PATH = os.path.join(ROOT_DIR, "benchmarks", "baseline.json")
+sys.path.insert(0, APP_DIR)
+
+SEED = 0
+MONTHS = [(2025, 1), (2025, 2), (2025, 3)]  # closed months, so cached copies never expire
+DASHBOARD_YEARS = range(2008, 2021)
+SELECTED = ["Sydney", "Melbourne", "Brisbane"]  # the Dashboard's default view
+YEAR_RANGE = (2015, 2020)
+DIRECTIONS = ["N", "NNE", "NE", "ENE", "E", "ESE", "SE", "SSE", "S", "SSW", "SW", "WSW", "W", "WNW", "NW", "NNW"]
+
+STAGES = {}  # name -> (setup, default repeat)
+
+
+def stage(name, repeat=200):
+    def register(setup):
+        STAGES[name] = (setup, repeat)
+        return setup
+    return register
+
+
+# Synthetic inputs
+
+def bom_month_csv(location, year, month, rng):
+    """A station-month in BoM's DWO CSV layout (latin-1, preamble, leading empty column)."""
+    from utils.bom import COLUMN_NAMES
+
+    headers = [col for col in COLUMN_NAMES if col not in ("Location", "Date")]
+    headers.insert(headers.index("9am Temperature (°C)"), "Time of maximum wind gust")
+    lines = [f'"Daily Weather Observations for {location}"', '"Prepared at 13:03 UTC"',
+             '"Copyright Bureau of Meteorology"', "",
+             "," + ",".join(['"Date"'] + [f'"{col}"' for col in headers])]
+    days = (datetime.date(year + month // 12, month % 12 + 1, 1) - datetime.date(year, month, 1)).days
+    for day in range(1, days + 1):
+        low = rng.normal(12, 5)
+        values = {
+            "Minimum temperature (°C)": f"{low:.1f}",
+            "Maximum temperature (°C)": f"{low + rng.uniform(4, 14):.1f}",
+            "Rainfall (mm)": "0" if rng.random() < 0.6 else f"{rng.exponential(5):.1f}",
+            "Evaporation (mm)": "" if rng.random() < 0.2 else f"{rng.uniform(0, 10):.1f}",
+            "Sunshine (hours)": f"{rng.uniform(0, 12):.1f}",
+            "Direction of maximum wind gust ": rng.choice(DIRECTIONS),
+            "Speed of maximum wind gust (km/h)": str(rng.integers(20, 90)),
+            "Time of maximum wind gust": "13:45",
+            "9am Temperature (°C)": f"{low + 4:.1f}",
+            "9am relative humidity (%)": str(rng.integers(30, 100)),
+            "9am cloud amount (oktas)": str(rng.integers(0, 9)),
+            "9am wind direction": rng.choice(DIRECTIONS),
+            "9am wind speed (km/h)": "Calm" if rng.random() < 0.05 else str(rng.integers(2, 35)),
+            "9am MSL pressure (hPa)": f"{rng.normal(1015, 7):.1f}",
+            "3pm Temperature (°C)": f"{low + 8:.1f}",
+            "3pm relative humidity (%)": str(rng.integers(15, 95)),
+            "3pm cloud amount (oktas)": str(rng.integers(0, 9)),
+            "3pm wind direction": rng.choice(DIRECTIONS),
+            "3pm wind speed (km/h)": str(rng.integers(2, 40)),
+            "3pm MSL pressure (hPa)": f"{rng.normal(1013, 7):.1f}",
+        }
+        lines.append(f",{year}-{month:02d}-{day:02d}," + ",".join(values[col] for col in headers))
+    return ("\r\n".join(lines) + "\r\n").encode("latin-1")
+
+
+def write_dashboard_csv(path, rng):
+    import pandas as pd
+    from utils.features import LOCATIONS, NUMERIC_COLS
+
+    dates = pd.date_range(f"{DASHBOARD_YEARS[0]}-01-01", f"{DASHBOARD_YEARS[-1]}-12-31")
+    frames = []
+    for location in LOCATIONS:
+        n = len(dates)
+        df = pd.DataFrame({"Date": dates.strftime("%Y-%m-%d"), "Location": location})
+        for col in NUMERIC_COLS:
+            df[col] = np.round(rng.normal(20, 8, n), 1)
+        df["Rainfall"] = np.where(rng.random(n) < 0.6, 0.0, np.round(rng.exponential(5, n), 1))
+        df.loc[rng.random(n) < 0.05, "Sunshine"] = np.nan
+        for col in ["WindGustDir", "WindDir9am", "WindDir3pm"]:
+            df[col] = rng.choice(DIRECTIONS, n)
+        df["RainToday"] = np.where(df["Rainfall"] > 1, "Yes", "No")
+        df["RainTomorrow"] = np.roll(df["RainToday"].to_numpy(), -1)
+        df["year"], df["month"], df["day"] = dates.year, dates.month, dates.day
+        df["Latitude"], df["Longitude"] = rng.uniform(-43, -12), rng.uniform(114, 153)
+        frames.append(df)
+    pd.concat(frames, ignore_index=True).to_csv(path, index=False)
+
+
+def prepare_workdir(workdir):
+    """Write the synthetic inputs and a pre-filled fetch cache into workdir."""
+    from utils.bom import period
+    from utils.stations import location_id
+
+    rng = np.random.default_rng(SEED)
+    fetched_at = time.time()
+    for location, station_id in location_id.items():
+        for year, month in MONTHS:
+            content = bom_month_csv(location, year, month, rng)
+            os.makedirs(os.path.join(workdir, "bom"), exist_ok=True)
+            with open(os.path.join(workdir, "bom", f"{station_id}.{period(year, month)}.csv"), "wb") as f:
+                f.write(content)
+            cached = os.path.join(workdir, "fetched", f"{station_id}_{period(year, month)}.csv")
+            os.makedirs(os.path.dirname(cached), exist_ok=True)
+            with open(cached, "wb") as f:
+                f.write(content)
+            with open(cached + ".json", "w") as f:
+                json.dump({"url": None, "etag": None, "last_modified": None, "fetched_at": fetched_at}, f)
+    write_dashboard_csv(os.path.join(workdir, "dashboard.csv"), rng)
+
+
+def use_workdir(workdir):
+    # Point every configured path the stages touch at the scratch directory
+    from utils.config import load_config
+
+    paths = load_config("paths")
+    paths["dirs"]["fetched_data"] = os.path.join(workdir, "fetched")
+    paths["dirs"]["feature_store"] = os.path.join(workdir, "features")
+    paths["dirs"]["dashboard_cache"] = os.path.join(workdir, "dashboard_cache")
+    paths["data_paths"]["cleaned_dashboard_data"] = os.path.join(workdir, "dashboard.csv")
+
+
+def read_fixture(workdir, location, year, month):
+    from utils.bom import period
+    from utils.stations import location_id
+
+    with open(os.path.join(workdir, "bom", f"{location_id[location]}.{period(year, month)}.csv"), "rb") as f:
+        return f.read()
+
+
+def load_model():
+    import joblib
+    from utils.config import correct_path
+
+    return joblib.load(correct_path("artifacts_paths", "xg_model_path"))
+
+
+def batch_frame(workdir):
+    import pandas as pd
+    from utils.bom import prepare_data
+    from utils.stations import location_id
+
+    return pd.concat([prepare_data(read_fixture(workdir, location, *ym), location)
+                      for location in location_id for ym in MONTHS], ignore_index=True)
+
+
+# Predict path
+
+class FakeResponse:
+    def __init__(self, url, content):
+        self.url, self.content = url, content
+        self.status_code, self.headers = 200, {}
+
+    def raise_for_status(self):
+        pass
+
+
+@stage("predict.fetch_cold", repeat=100)
+def fetch_cold(workdir):
+    from utils.bom import fetch_data, fetched_path
+
+    content = read_fixture(workdir, "Sydney", 2025, 1)
+    path = fetched_path("Sydney", 2025, 1)
+
+    def before():
+        for p in (path, path + ".json"):
+            if os.path.exists(p):
+                os.remove(p)
+
+    run = lambda: fetch_data("Sydney", 2025, 1, get=lambda url, **kwargs: FakeResponse(url, content))
+    return run, 31, before
+
+
+@stage("predict.fetch_cached")
+def fetch_cached(workdir):
+    from utils.bom import fetch_data
+
+    return lambda: fetch_data("Sydney", 2025, 1), 31
+
+
+@stage("predict.parse_csv")
+def parse_csv(workdir):
+    from utils.bom import parse_bom_csv
+
+    content = read_fixture(workdir, "Sydney", 2025, 1)
+    return lambda: parse_bom_csv(content), 31
+
+
+@stage("predict.prepare_data")
+def prepare(workdir):
+    from utils.bom import prepare_data
+
+    content = read_fixture(workdir, "Sydney", 2025, 1)
+    return lambda: prepare_data(content, "Sydney"), 31
+
+
+@stage("predict.model_load", repeat=20)
+def model_load(workdir):
+    return load_model, 1
+
+
+@stage("predict.backend_native", repeat=20)
+def backend_native(workdir):
+    from utils.inference import load_backend
+
+    model = load_model()
+    return lambda: load_backend(model, "native"), 1
+
+
+@stage("predict.backend_compiled", repeat=20)
+def backend_compiled(workdir):
+    from utils.inference import load_backend
+
+    model = load_model()
+    return lambda: load_backend(model, "compiled"), 1
+
+
+@stage("predict.single_sklearn")
+def single_sklearn(workdir):
+    from utils.bom import prepare_data
+    from utils.features import apply_schema
+
+    model = load_model()
+    row = prepare_data(read_fixture(workdir, "Sydney", 2025, 1), "Sydney").iloc[[14]]
+    return lambda: model.predict_proba(apply_schema(row)), 1
+
+
+@stage("predict.single_native", repeat=1000)
+def single_native(workdir):
+    from utils.features import feature_matrix
+    from utils.inference import load_backend
+
+    backend = load_backend(load_model(), "native")
+    x = feature_matrix(batch_frame(workdir).iloc[[14]])
+    return lambda: backend.predict_proba(x), 1
+
+
+@stage("predict.single_compiled", repeat=1000)
+def single_compiled(workdir):
+    from utils.features import feature_matrix
+    from utils.inference import load_backend
+
+    backend = load_backend(load_model(), "compiled")
+    x = feature_matrix(batch_frame(workdir).iloc[[14]])
+    return lambda: backend.predict_proba(x), 1
+
+
+@stage("predict.batch_sklearn", repeat=20)
+def batch_sklearn(workdir):
+    from utils.features import apply_schema
+
+    model = load_model()
+    df = apply_schema(batch_frame(workdir))
+    return lambda: model.predict_proba(df), len(df)
+
+
+@stage("predict.batch_native", repeat=50)
+def batch_native(workdir):
+    from utils.features import feature_matrix
+    from utils.inference import load_backend
+
+    backend = load_backend(load_model(), "native")
+    X = feature_matrix(batch_frame(workdir))
+    return lambda: backend.predict_proba(X), len(X)
+
+
+@stage("predict.batch_compiled", repeat=50)
+def batch_compiled(workdir):
+    from utils.features import feature_matrix
+    from utils.inference import load_backend
+
+    backend = load_backend(load_model(), "compiled")
+    X = feature_matrix(batch_frame(workdir))
+    return lambda: backend.predict_proba(X), len(X)
+
+
+@stage("predict.service", repeat=500)
+def service(workdir):
+    from utils.result_cache import ResultCache
+    from utils.service import PredictionService
+
+    # No result cache, so every call is scored
+    svc = PredictionService(model=load_model(), cache=ResultCache(max_entries=0))
+    dates = [datetime.date(2025, 1, day) for day in range(1, 31)]
+    calls = iter(range(1 << 30))
+    return lambda: svc.predict("Sydney", dates[next(calls) % len(dates)]), 1
+
+
+# Dashboard path
+
+def dashboard_frame():
+    from utils.dashboard_data import DASHBOARD_COLUMNS, load_dashboard_data
+
+    return load_dashboard_data(DASHBOARD_COLUMNS)
+
+
+@stage("dashboard.cache_build", repeat=5)
+def cache_build(workdir):
+    from utils.dashboard_data import build_cache
+
+    csv_path = os.path.join(workdir, "dashboard.csv")
+    cache_dir = os.path.join(workdir, "cache_build")
+    rows = sum(1 for _ in open(csv_path)) - 1
+
+    def before():
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        os.makedirs(cache_dir)
+
+    return lambda: build_cache(csv_path, cache_dir), rows, before
+
+
+@stage("dashboard.load_data", repeat=50)
+def load_data(workdir):
+    df = dashboard_frame()
+    return dashboard_frame, len(df)
+
+
+@stage("dashboard.row_index", repeat=50)
+def row_index(workdir):
+    from utils.dashboard_data import RowIndex
+
+    df = dashboard_frame()
+    return lambda: RowIndex(df), len(df)
+
+
+@stage("dashboard.filter", repeat=1000)
+def filter_rows(workdir):
+    from utils.dashboard_data import RowIndex
+
+    df = dashboard_frame()
+    index = RowIndex(df)
+    return lambda: index.select(df, SELECTED, YEAR_RANGE), index.count(SELECTED, YEAR_RANGE)
+
+
+@stage("dashboard.cube_build", repeat=5)
+def cube_build(workdir):
+    from utils.rollups import RollupCube
+
+    df = dashboard_frame()
+    return lambda: RollupCube(df), len(df)
+
+
+def cube_stage(query):
+    def setup(workdir):
+        from utils.dashboard_data import RowIndex
+        from utils.rollups import RollupCube
+
+        df = dashboard_frame()
+        cube = RollupCube(df)
+        return lambda: query(cube), RowIndex(df).count(SELECTED, YEAR_RANGE)
+    return setup
+
+
+# One stage per Dashboard chart, with the page's arguments
+stage("dashboard.map")(cube_stage(lambda cube: cube.location_means(
+    SELECTED, YEAR_RANGE, ["Rainfall", "MaxTemp", "MinTemp", "Sunshine", "Humidity3pm"])))
+stage("dashboard.bar")(cube_stage(lambda cube: cube.location_means(SELECTED, YEAR_RANGE, ["Rainfall"])))
+stage("dashboard.line")(cube_stage(lambda cube: cube.monthly_means(SELECTED, YEAR_RANGE, "Rainfall")))
+stage("dashboard.box")(cube_stage(lambda cube: cube.box_stats(SELECTED, YEAR_RANGE, "MaxTemp")))
+stage("dashboard.polar")(cube_stage(lambda cube: cube.gust_direction_sums(SELECTED, YEAR_RANGE)))
+stage("dashboard.histogram")(cube_stage(lambda cube: cube.direction_rain_counts(SELECTED, YEAR_RANGE)))
+stage("dashboard.describe")(cube_stage(lambda cube: cube.describe(SELECTED, YEAR_RANGE)))
+
+
+@stage("dashboard.scatter", repeat=50)
+def scatter(workdir):
+    from utils.dashboard_data import RowIndex
+    from utils.downsample import scatter_layers
+
+    df = dashboard_frame()
+    index = RowIndex(df)
+    # SCATTER_RAW_POINTS in pages/1_Dashboard.py
+    run = lambda: scatter_layers(index.select(df, SELECTED, YEAR_RANGE), "MaxTemp", "MinTemp", 5000)
+    return run, index.count(SELECTED, YEAR_RANGE)
+
+
+# Runner
+
+def peak_rss_mb():
+    # VmHWM restarts at exec; ru_maxrss can carry over the parent's peak from fork
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_stage(name, workdir, repeat):
+    """Time one stage in this interpreter; returns its result dict."""
+    use_workdir(workdir)
+    setup, default_repeat = STAGES[name]
+    run, rows, *hooks = setup(workdir)
+    before = hooks[0] if hooks else None
+    repeat = repeat or default_repeat
+
+    if before:
+        before()
+    run()  # warm-up: first-call imports and caches are not part of the timing
+    times = []
+    for _ in range(repeat):
+        if before:
+            before()
+        started = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - started)
+
+    p50, p95, p99 = np.percentile(times, [50, 95, 99])
+    return {
+        "repeat": repeat,
+        "rows": rows,
+        "p50_ms": p50 * 1e3,
+        "p95_ms": p95 * 1e3,
+        "p99_ms": p99 * 1e3,
+        "rows_per_s": rows / p50 if p50 else None,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def run_child(name, workdir, repeat):
+    # Fresh interpreter per stage, so peak RSS belongs to that stage alone
+    cmd = [sys.executable, "-W", "ignore", os.path.abspath(__file__), "--child", name, "--workdir", workdir]
+    if repeat:
+        cmd += ["--repeat", str(repeat)]
+    proc = subprocess.run(cmd, cwd=ROOT_DIR, capture_output=True, text=True)
+    lines = [line for line in proc.stdout.splitlines() if line.startswith("{")]
+    if proc.returncode != 0 or not lines:
+        raise RuntimeError(f"{name} failed:\n{proc.stderr[-2000:]}")
+    return json.loads(lines[-1])
+
+
+def select_stages(patterns):
+    if not patterns:
+        return list(STAGES)
+    names = [name for name in STAGES if any(name == p or name.startswith(p + ".") for p in patterns)]
+    if not names:
+        raise SystemExit(f"No stages match {patterns}; choose from {list(STAGES)}")
+    return names
+
+
+def compare(results, baseline, threshold, min_delta):
+    """Print the results next to the baseline; returns the names of regressed stages.
+
+    A stage regresses when p50 or peak RSS grows by more than threshold (a
+    fraction) and by more than min_delta[key] in absolute terms.
+    """
+    regressed = []
+    print(f"{'stage':26} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'rows/s':>11} {'RSS MB':>7}  vs baseline")
+    for name, r in results.items():
+        base = baseline.get(name)
+        notes = []
+        if base:
+            for key, label in (("p50_ms", "p50"), ("peak_rss_mb", "RSS")):
+                change = r[key] / base[key] - 1 if base[key] else 0.0
+                notes.append(f"{label} {change:+.0%}")
+                if change > threshold and r[key] - base[key] > min_delta[key]:
+                    notes[-1] += " REGRESSION"
+                    regressed.append(name)
+        rows_per_s = f"{r['rows_per_s']:11.0f}" if r["rows_per_s"] else f"{'-':>11}"
+        print(f"{name:26} {r['p50_ms']:9.3f} {r['p95_ms']:9.3f} {r['p99_ms']:9.3f} {rows_per_s} "
+              f"{r['peak_rss_mb']:7.0f}  {', '.join(notes) or 'no baseline'}")
+    return sorted(set(regressed))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stages", nargs="+", help="stage names or prefixes (default: all)")
+    parser.add_argument("--repeat", type=int, help="timed calls per stage (default: per stage)")
+    parser.add_argument("--rounds", type=int, default=3, help="fresh interpreters per stage; the best p50 is kept")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown, as a fraction")
+    parser.add_argument("--min-delta-ms", type=float, default=0.1,
+                        help="p50 changes smaller than this are never regressions (timer noise)")
+    parser.add_argument("--min-delta-mb", type=float, default=5.0,
+                        help="peak RSS changes smaller than this are never regressions")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_stage(args.child, args.workdir, args.repeat)))
+        return
+
+    names = select_stages(args.stages)
+    workdir = tempfile.mkdtemp(prefix="rain-bench-")
+    try:
+        prepare_workdir(workdir)
+        results = {}
+        for name in names:
+            # Best of several interpreters, so a noisy neighbour does not read as a regression
+            rounds = [run_child(name, workdir, args.repeat) for _ in range(args.rounds)]
+            results[name] = min(rounds, key=lambda r: r["p50_ms"])
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    try:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["stages"]
+    except FileNotFoundError:
+        baseline = {}
+    regressed = compare(results, baseline, args.threshold,
+                        {"p50_ms": args.min_delta_ms, "peak_rss_mb": args.min_delta_mb})
+
+    if args.save_baseline:
+        stages = {**baseline, **results}
+        with open(args.baseline, "w") as f:
+            json.dump({"machine": {"python": platform.python_version(), "platform": platform.platform(),
+                                   "cpus": os.cpu_count()},
+                       "stages": stages}, f, indent=2)
+            f.write("\n")
+        print(f"Baseline written to {args.baseline}")
+    elif regressed:
+        print(f"{len(regressed)} stage(s) regressed by more than {args.threshold:.0%}: {', '.join(regressed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Page startup benchmark.
+
+Renders each Streamlit page once in a fresh interpreter (so nothing is already
+imported or cached) and reports the time to the first complete render, plus the
+slowest imports recorded by ``python -X importtime``.
+
+    python benchmarks/startup.py
+    python benchmarks/startup.py --runs 5 --pages Home.py pages/2_Predict.py
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+
+ROOT_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+APP_DIR = os.path.join(ROOT_DIR, "app_src")
+MARKER = "-- page start --"
+PAGES = ["Home.py", "pages/1_Dashboard.py", "pages/2_Predict.py", "pages/3_About.py"]
+
+# Runs inside the child interpreter
+CHILD = """
+import json, sys, time
+t0 = time.perf_counter()
+sys.path.insert(0, {app_dir!r})
+from streamlit.testing.v1 import AppTest
+sys.stderr.write("{marker}\\n")
+t1 = time.perf_counter()
+at = AppTest.from_file({script!r}, default_timeout=300)
+at.run()
+t2 = time.perf_counter()
+print(json.dumps({{"harness": t1 - t0, "render": t2 - t1,
+                   "exceptions": [str(e.value) for e in at.exception]}}))
+"""
+
+
+def parse_importtime(stderr, top):
+    # Lines look like: "import time:   self [us] | cumulative | imported package",
+    # with nested imports indented under their parent
+    roots = []
+    lines = stderr.splitlines()
+    for line in lines[lines.index(MARKER) + 1:] if MARKER in lines else lines:
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Only top-level entries: nested imports are already in their parent's cumulative time
+        if not name[1:].startswith(" "):
+            roots.append((int(cumulative), name.strip()))
+    return sorted(roots, reverse=True)[:top]
+
+
+def run_page(page, top):
+    script = os.path.join(APP_DIR, page)
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CHILD.format(app_dir=APP_DIR, script=script, marker=MARKER)],
+        cwd=ROOT_DIR, capture_output=True, text=True,
+    )
+    lines = [line for line in proc.stdout.splitlines() if line.startswith("{")]
+    if proc.returncode != 0 or not lines:
+        raise RuntimeError(f"{page} failed:\n{proc.stderr[-2000:]}")
+    result = json.loads(lines[-1])
+    result["imports"] = parse_importtime(proc.stderr, top)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", nargs="+", default=PAGES)
+    parser.add_argument("--runs", type=int, default=3, help="fresh interpreters per page")
+    parser.add_argument("--top", type=int, default=5, help="slowest imports to list per page")
+    args = parser.parse_args()
+
+    for page in args.pages:
+        results = [run_page(page, args.top) for _ in range(args.runs)]
+        renders = [r["render"] for r in results]
+        print(f"{page}: first render median {statistics.median(renders):.3f}s "
+              f"(min {min(renders):.3f}s, max {max(renders):.3f}s, {args.runs} runs)")
+        if results[-1]["exceptions"]:
+            print(f"  exceptions: {results[-1]['exceptions']}")
+        for us, name in results[-1]["imports"]:
+            print(f"  {us / 1e6:7.3f}s  import {name}")
+
+
+if __name__ == "__main__":
+    main()